@@ -1,4 +1,5 @@
 import click
+import json
 import uvicorn
 
 from urllib.parse import urlparse
@@ -23,6 +24,8 @@ def server(config, host, port):
         host=host, 
         port=int(port), 
         proxy_headers=True,
+        # running streams do not end by themselves, hence they're cancelled after this time
+        timeout_graceful_shutdown=10,
         forwarded_allow_ips=[
             '172.17.0.1',
             '127.0.0.1'
@@ -33,8 +36,81 @@ def server(config, host, port):
 @click.argument('config', default='/app/config/config.yaml')
 @click.option('--mqtt', '-m', help='MQTT connection and topic URI')
 @click.option('--client', '-c', default='vdv736gtfsrt', help='Client-ID for connecting to the MQTT broker')
-def mqtt(config, mqtt, client):
+@click.option('--keepalive', '-k', default=None, type=int, help='Interval in seconds to publish unchanged alerts again')
+@click.option('--qos', '-q', default=1, type=click.IntRange(0, 2), help='QoS level for publishing alerts')
+@click.option('--inflight', '-i', default=20, type=click.IntRange(1), help='Maximum number of unconfirmed messages')
+def mqtt(config, mqtt, client, keepalive, qos, inflight):
 
+    mqtt_host, mqtt_port, mqtt_username, mqtt_password, mqtt_topic = _parse_mqtt_uri(mqtt)
+
+    publisher = GtfsRealtimePublisher(config, mqtt_host, mqtt_port, mqtt_username, mqtt_password, mqtt_topic, client, 300, keepalive, qos, inflight)
+    publisher.run()
+
+@cli.command()
+@click.argument('config')
+@click.argument('deliveries', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--mqtt', '-m', help='MQTT connection and topic URI')
+@click.option('--client', '-c', default='vdv736gtfsrt', help='Client-ID for connecting to the MQTT broker')
+@click.option('--qos', '-q', default=1, type=click.IntRange(0, 2), help='QoS level for publishing alerts')
+@click.option('--inflight', '-i', default=20, type=click.IntRange(1), help='Maximum number of unconfirmed messages')
+def replay(config, deliveries, mqtt, client, qos, inflight):
+
+    mqtt_host, mqtt_port, mqtt_username, mqtt_password, mqtt_topic = _parse_mqtt_uri(mqtt)
+
+    publisher = GtfsRealtimePublisher(config, mqtt_host, mqtt_port, mqtt_username, mqtt_password, mqtt_topic, client, 300, None, qos, inflight)
+
+    # recorded deliveries are parsed while publishing, hence their size is not limited by the available memory
+    try:
+        for delivery in deliveries:
+            publisher.process_delivery_stream(delivery)
+    finally:
+        publisher.close()
+
+@cli.command()
+@click.argument('config', default='/app/config/config.yaml')
+@click.option('--samples', '-s', default='./tests/data/xml', help='Directory containing the sample situations')
+@click.option('--situations', '-n', default=10000, type=click.IntRange(1), help='Number of synthetic situations')
+@click.option('--iterations', '-r', default=3, type=click.IntRange(1), help='Number of measured runs of each benchmark')
+@click.option('--requests', default=2000, type=click.IntRange(1), help='Number of requests of the endpoint load test')
+@click.option('--concurrency', default=16, type=click.IntRange(1), help='Number of concurrent requests of the endpoint load test')
+@click.option('--workers', '-w', default=None, type=click.IntRange(1), help='Number of conversion workers to compare with converting in process, defaults to the number of CPUs')
+@click.option('--broker', '-b', default=None, help='MQTT broker in format host:port for the publisher benchmark, the stand-in of the tests is used if not set')
+@click.option('--output', '-o', default=None, help='Filename for the JSON results, printed if not set')
+def bench(config, samples, situations, iterations, requests, concurrency, workers, broker, output):
+    from vdv736gtfsrt.benchmark import Benchmark
+
+    broker_stand_in = None
+    if broker is not None:
+        broker_host, broker_port = broker.split(':')
+        mqtt_broker = (broker_host, int(broker_port))
+    else:
+        # the stand-in is not part of the package and only available from within the repository
+        try:
+            from tests.broker import MqttBrokerStandIn
+
+            broker_stand_in = MqttBrokerStandIn(record_messages=False)
+            mqtt_broker = ('127.0.0.1', broker_stand_in.port)
+        except ImportError:
+            click.echo('No MQTT broker available, skipping the publisher benchmark', err=True)
+            mqtt_broker = None
+
+    benchmark = Benchmark(config, samples, situations, iterations, requests, concurrency, num_workers=workers, mqtt_broker=mqtt_broker)
+
+    try:
+        results = benchmark.run()
+    finally:
+        if broker_stand_in is not None:
+            broker_stand_in.stop()
+
+    results['version'] = version
+
+    if output is not None:
+        with open(output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+    else:
+        click.echo(json.dumps(results, indent=4))
+
+def _parse_mqtt_uri(mqtt: str) -> tuple:
     mqtt_uri = urlparse(mqtt)
     mqtt_params = mqtt_uri.netloc.split('@')
     mqtt_topic = mqtt_uri.path
@@ -46,8 +122,7 @@ def mqtt(config, mqtt, client):
         mqtt_username, mqtt_password = mqtt_params[0].split(':')
         mqtt_host, mqtt_port = mqtt_params[1].split(':')
 
-    publisher = GtfsRealtimePublisher(config, mqtt_host, mqtt_port, mqtt_username, mqtt_password, mqtt_topic, client, 300)
-    publisher.run()
+    return mqtt_host, mqtt_port, mqtt_username, mqtt_password, mqtt_topic
 
 
 if __name__ == '__main__':
@@ -1,10 +1,11 @@
 from abc import ABC, abstractmethod
 
+from google.transit import gtfs_realtime_pb2
 from vdv736.model import PublicTransportSituation
 
 
 class BaseAdapter(ABC):
 
     @abstractmethod
-    def convert(self, public_transport_situation: PublicTransportSituation) -> tuple[dict, bool]:
+    def convert(self, public_transport_situation: PublicTransportSituation, feed_entity: gtfs_realtime_pb2.FeedEntity|None = None) -> tuple[dict|gtfs_realtime_pb2.FeedEntity, bool]:
         pass
\ No newline at end of file
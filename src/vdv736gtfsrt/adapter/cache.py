@@ -0,0 +1,259 @@
+import hashlib
+import logging
+import multiprocessing
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from google.transit import gtfs_realtime_pb2
+from lxml.etree import tostring
+from lxml.objectify import fromstring
+from typing import Iterable
+from vdv736.model import PublicTransportSituation
+
+from vdv736gtfsrt.adapter.base import BaseAdapter
+from vdv736gtfsrt.adapter.paths import compile_path, get_value
+from vdv736gtfsrt.gtfsrt import serialize_feed_entity
+from vdv736gtfsrt.metrics import GtfsRealtimeMetrics
+
+_situation_number = compile_path('SituationNumber')
+_version = compile_path('Version')
+_versioned_at_time = compile_path('VersionedAtTime')
+_progress = compile_path('Progress')
+
+# adapter instance of each worker process, see _initialize_worker
+_worker_adapter: BaseAdapter|None = None
+
+def _initialize_worker(adapter_type: type, config: dict) -> None:
+    global _worker_adapter
+    _worker_adapter = adapter_type(config)
+
+def _convert_serialized_situation(serialized_situation: bytes) -> tuple[bytes|None, bool, tuple[str, str]|None, float]:
+    # exceptions are returned instead of raised, so that a single invalid situation does not abort the whole batch
+    start = time.perf_counter()
+    try:
+        alert, is_closing = _worker_adapter.convert(fromstring(serialized_situation), gtfs_realtime_pb2.FeedEntity())
+        _handle_closing_situation(alert, is_closing)
+
+        return alert.SerializeToString(), is_closing, None, time.perf_counter() - start
+    except Exception as ex:
+        return None, False, (type(ex).__name__, str(ex)), time.perf_counter() - start
+
+def _handle_closing_situation(alert: gtfs_realtime_pb2.FeedEntity|None, is_closing: bool) -> None:
+    if alert is not None and is_closing:
+        # set effect to NO_EFFECT and delete end timestamps of active periods in order to make consuming systems
+        # to show up the final message without affecting the trip planning system
+        # see #26 for more information
+        alert.alert.effect = gtfs_realtime_pb2.Alert.NO_EFFECT
+        for active_period in alert.alert.active_period:
+            active_period.ClearField('end')
+
+class _ConversionEntry:
+
+    __slots__ = ('key', 'alert', 'is_closing', 'serialized')
+
+    def __init__(self, key: tuple, alert: gtfs_realtime_pb2.FeedEntity, is_closing: bool) -> None:
+        self.key = key
+        self.alert = alert
+        self.is_closing = is_closing
+        self.serialized: bytes|None = None
+
+class ConversionCache:
+
+    # smaller batches of changed situations are converted in the calling process, as
+    # serializing and sending them to the worker processes would take longer than converting them
+    min_parallel_conversions: int = 64
+
+    def __init__(self, adapter: BaseAdapter, config: dict|None = None, num_workers: int = 0, metrics: GtfsRealtimeMetrics|None = None) -> None:
+        self._adapter = adapter
+        self._entries: dict[str, _ConversionEntry] = dict()
+
+        self._logger = logging.getLogger()
+
+        # metrics children are resolved once, so that recording a value is a single list update
+        self._metrics = metrics if metrics is not None else GtfsRealtimeMetrics()
+        self._conversion_duration = self._metrics.conversion_duration.labels(type(adapter).__name__)
+        self._cache_hits = self._metrics.conversion_cache_requests.labels('hit')
+        self._cache_misses = self._metrics.conversion_cache_requests.labels('miss')
+        self._entity_serialization_duration = self._metrics.serialization_duration.labels('entity')
+
+        # worker processes create their own adapter instance out of the adapter type and config
+        self._config = config
+        self._num_workers = num_workers
+        self._executor: ProcessPoolExecutor|None = None
+
+        if self._num_workers > 0:
+            self._executor = self._create_executor()
+
+    def convert(self, public_transport_situation: PublicTransportSituation) -> tuple[gtfs_realtime_pb2.FeedEntity, bool]:
+        situation_id = get_value(public_transport_situation, _situation_number)
+        situation_key = self._create_key(public_transport_situation)
+
+        # return previous conversion if the situation has not changed
+        entry = self._entries.get(situation_id)
+        if entry is not None and entry.key == situation_key:
+            self._cache_hits.inc()
+            return entry.alert, entry.is_closing
+
+        self._cache_misses.inc()
+
+        conversion = self._convert_local(public_transport_situation)
+        if isinstance(conversion, Exception):
+            raise conversion
+        
+        alert, is_closing = conversion
+
+        # results are shared between all callers, hence they must not be modified afterwards
+        self._entries[situation_id] = _ConversionEntry(situation_key, alert, is_closing)
+
+        return alert, is_closing
+    
+    def convert_all(self, public_transport_situations: list[PublicTransportSituation]) -> list[tuple[gtfs_realtime_pb2.FeedEntity, bool]|Exception]:
+        # results are in the same order like the situations, failed conversions are 
+        # returned as exception in order to let the caller handle each situation separately
+        results: list[tuple[gtfs_realtime_pb2.FeedEntity, bool]|Exception|None] = [None] * len(public_transport_situations)
+        
+        misses = list()
+        for index, public_transport_situation in enumerate(public_transport_situations):
+            try:
+                situation_id = get_value(public_transport_situation, _situation_number)
+                situation_key = self._create_key(public_transport_situation)
+            except Exception as ex:
+                results[index] = ex
+                continue
+
+            entry = self._entries.get(situation_id)
+            if entry is not None and entry.key == situation_key:
+                results[index] = (entry.alert, entry.is_closing)
+            else:
+                misses.append((index, situation_id, situation_key, public_transport_situation))
+
+        self._cache_hits.inc(len(public_transport_situations) - len(misses))
+        self._cache_misses.inc(len(misses))
+
+        conversions = self.convert_uncached([m[3] for m in misses])
+
+        for (index, situation_id, situation_key, _), conversion in zip(misses, conversions):
+            if not isinstance(conversion, Exception):
+                alert, is_closing = conversion
+                self._entries[situation_id] = _ConversionEntry(situation_key, alert, is_closing)
+
+            results[index] = conversion
+
+        return results
+
+    def convert_uncached(self, public_transport_situations: list[PublicTransportSituation], parallel: bool|None = None) -> list[tuple[gtfs_realtime_pb2.FeedEntity, bool]|Exception]:
+        # converts without looking up or storing the results, the worker processes are used for batches 
+        # of at least min_parallel_conversions situations unless parallel is set explicitly
+        if parallel is None:
+            parallel = len(public_transport_situations) >= self.min_parallel_conversions
+
+        if parallel and self._executor is not None:
+            return self._convert_parallel(public_transport_situations)
+        
+        return [self._convert_local(s) for s in public_transport_situations]
+
+    def serialized(self, situation_id: str) -> bytes:
+        # the converted entity is encoded only once, as long as the situation has not changed
+        entry = self._entries[situation_id]
+        if entry.serialized is None:
+            start = time.perf_counter()
+            entry.serialized = serialize_feed_entity(entry.alert)
+            self._entity_serialization_duration.observe(time.perf_counter() - start)
+
+        return entry.serialized
+
+    def restore(self, public_transport_situation: PublicTransportSituation, serialized_entity: bytes, is_closing: bool) -> gtfs_realtime_pb2.FeedEntity:
+        # conversions of an earlier run are restored without converting the situation again,
+        # serialized entities are framed as field of a FeedMessage, see serialize_feed_entity
+        situation_id = get_value(public_transport_situation, _situation_number)
+        alert = gtfs_realtime_pb2.FeedMessage.FromString(serialized_entity).entity[0]
+
+        entry = _ConversionEntry(self._create_key(public_transport_situation), alert, is_closing)
+        entry.serialized = serialized_entity
+
+        self._entries[situation_id] = entry
+
+        return alert
+
+    def evict(self, situation_id: str) -> None:
+        if situation_id in self._entries:
+            del self._entries[situation_id]
+
+    def retain(self, situation_ids: Iterable[str]) -> None:
+        situation_ids = set(situation_ids)
+        for situation_id in [id for id in self._entries.keys() if id not in situation_ids]:
+            del self._entries[situation_id]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # the subscriber, webserver and MQTT client run threads, so worker processes must not be forked
+        return ProcessPoolExecutor(
+            max_workers=self._num_workers, 
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_initialize_worker,
+            initargs=(type(self._adapter), self._config)
+        )
+    
+    def _convert_local(self, public_transport_situation: PublicTransportSituation) -> tuple[gtfs_realtime_pb2.FeedEntity, bool]|Exception:
+        start = time.perf_counter()
+        try:
+            alert, is_closing = self._adapter.convert(public_transport_situation, gtfs_realtime_pb2.FeedEntity())
+            _handle_closing_situation(alert, is_closing)
+
+            return alert, is_closing
+        except Exception as ex:
+            self._metrics.conversion_errors.labels(type(ex).__name__).inc()
+            return ex
+        finally:
+            self._conversion_duration.observe(time.perf_counter() - start)
+    
+    def _convert_parallel(self, public_transport_situations: list[PublicTransportSituation]) -> list[tuple[gtfs_realtime_pb2.FeedEntity, bool]|Exception]:
+        serialized_situations = [tostring(s) for s in public_transport_situations]
+
+        # send situations in larger chunks to reduce the IPC overhead, but keep all workers busy
+        chunksize = max(1, len(serialized_situations) // (self._num_workers * 4))
+
+        try:
+            results = list(self._executor.map(_convert_serialized_situation, serialized_situations, chunksize=chunksize))
+        except BrokenProcessPool as ex:
+            self._logger.error(f"Conversion worker terminated unexpectedly, converting {len(public_transport_situations)} situations locally: {ex}")
+
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+
+            return [self._convert_local(s) for s in public_transport_situations]
+
+        conversions = list()
+        for serialized_alert, is_closing, error, duration in results:
+            self._conversion_duration.observe(duration)
+
+            if error is not None:
+                error_type, error_message = error
+                self._metrics.conversion_errors.labels(error_type).inc()
+
+                conversions.append(RuntimeError(f"{error_type}: {error_message}"))
+            else:
+                conversions.append((gtfs_realtime_pb2.FeedEntity.FromString(serialized_alert), is_closing))
+
+        return conversions
+
+    def _create_key(self, public_transport_situation: PublicTransportSituation) -> tuple:
+        version = get_value(public_transport_situation, _version)
+        versioned_at_time = get_value(public_transport_situation, _versioned_at_time)
+
+        # some publishers change the progress of a situation without increasing its version,
+        # see #26 for handling closing situations
+        progress = get_value(public_transport_situation, _progress)
+
+        if version is None and versioned_at_time is None:
+            return (progress, hashlib.sha1(tostring(public_transport_situation)).hexdigest())
+
+        return (progress, version, versioned_at_time)
@@ -0,0 +1,27 @@
+from lxml.objectify import ObjectPath, ObjectifiedElement
+
+def compile_path(path: str) -> ObjectPath:
+    # the leading dot makes the path relative to the element it is applied to,
+    # child elements inherit its namespace, hence the path works with and without SIRI namespace
+    return ObjectPath(f".{path}")
+
+def get_elements(obj: ObjectifiedElement|None, path: ObjectPath) -> ObjectifiedElement|tuple:
+    if obj is None:
+        return tuple()
+
+    # iterating the first element yields all siblings with the same tag
+    element = path(obj, None)
+    return element if element is not None else tuple()
+
+def get_element(obj: ObjectifiedElement|None, path: ObjectPath) -> ObjectifiedElement|None:
+    if obj is None:
+        return None
+
+    return path(obj, None)
+
+def get_value(obj: ObjectifiedElement|None, path: ObjectPath, default=None) -> str|None:
+    element = get_element(obj, path)
+    if element is None:
+        return default
+
+    return element.text
@@ -1,80 +1,156 @@
-from vdv736.sirixml import get_elements as sirixml_get_elements
-from vdv736.sirixml import get_value as sirixml_get_value
-from vdv736.sirixml import get_attribute as sirixml_get_attribute
-from vdv736.sirixml import exists as sirixml_exists
+from google.transit import gtfs_realtime_pb2
+from types import MappingProxyType
 from vdv736.model import PublicTransportSituation
 
 from vdv736gtfsrt.adapter.base import BaseAdapter
+from vdv736gtfsrt.adapter.paths import compile_path, get_element, get_elements, get_value
 from vdv736gtfsrt.vdvdef import causes, conditions, effect_priorities
 from vdv736gtfsrt.gtfsrt import create_url, create_translated_string, iso2unix
 
+# all paths are compiled once instead of resolving the dotted path strings for every situation
+_situation_number = compile_path('SituationNumber')
+_alert_cause = compile_path('AlertCause')
+_progress = compile_path('Progress')
+_summary = compile_path('Summary')
+_detail = compile_path('Detail')
+_validity_period = compile_path('ValidityPeriod')
+_start_time = compile_path('StartTime')
+_end_time = compile_path('EndTime')
+_consequences = compile_path('Consequences')
+_consequence = compile_path('Consequence')
+_condition = compile_path('Condition')
+_affects = compile_path('Affects')
+_networks = compile_path('Networks')
+_affected_network = compile_path('AffectedNetwork')
+_affected_line = compile_path('AffectedLine')
+_line_ref = compile_path('LineRef')
+_direction_ref = compile_path('Direction.DirectionRef')
+_stop_places = compile_path('StopPlaces')
+_affected_stop_place = compile_path('AffectedStopPlace')
+_stop_place_ref = compile_path('StopPlaceRef')
+_stop_points = compile_path('StopPoints')
+_affected_stop_point = compile_path('AffectedStopPoint')
+_stop_point_ref = compile_path('StopPointRef')
+_lines_affected_line = compile_path('Lines.AffectedLine')
+_operators = compile_path('Operators')
+_operator_ref = compile_path('OperatorRef')
+
+_xml_lang = '{http://www.w3.org/XML/1998/namespace}lang'
+
 class VdvStandardAdapter(BaseAdapter):
 
     def __init__(self, config: dict) -> None:
         self._config = config
 
-    def convert(self, public_transport_situation: PublicTransportSituation) -> tuple[dict, bool]:
-        entity_id = sirixml_get_value(public_transport_situation, 'SituationNumber')
+        # lookup tables are created once per adapter and must not be changed afterwards,
+        # operators can extend or override the default mappings in the adapter config
+        adapter_config = self._config['app']['adapter']
+
+        # validity periods without timezone are local time of the configured timezone
+        self._timezone = self._config['app'].get('timezone', 'UTC')
+
+        self._causes = MappingProxyType(self._create_lookup_table(
+            self._create_cause_map(), 
+            adapter_config.get('causes'), 
+            gtfs_realtime_pb2.Alert.Cause.keys()
+        ))
+
+        self._conditions = MappingProxyType(self._create_lookup_table(
+            self._create_condition_map(), 
+            adapter_config.get('conditions'), 
+            gtfs_realtime_pb2.Alert.Effect.keys()
+        ))
+
+        priorities = adapter_config.get('effect_priorities') or effect_priorities
+        for effect in priorities:
+            if effect not in gtfs_realtime_pb2.Alert.Effect.keys():
+                raise ValueError(f"Unknown GTFS-RT effect {effect} in effect priorities")
+
+        # effects without priority are ranked last
+        self._effect_ranks = MappingProxyType({effect: rank for rank, effect in enumerate(priorities)})
 
-        alert_url = create_url(self._config['app']['adapter']['url'], alertId=entity_id)
-        alert_cause = self._convert_alert_cause(sirixml_get_value(public_transport_situation, 'AlertCause'))
-        alert_effect = self._convert_alert_effect(sirixml_get_elements(public_transport_situation, 'Consequences'))
+    def convert(self, public_transport_situation: PublicTransportSituation, feed_entity: gtfs_realtime_pb2.FeedEntity|None = None) -> tuple[dict|gtfs_realtime_pb2.FeedEntity, bool]:
+        entity_id = get_value(public_transport_situation, _situation_number)
+
+        alert_cause = self._convert_alert_cause(get_value(public_transport_situation, _alert_cause))
+        alert_effect = self._convert_alert_effect(get_element(public_transport_situation, _consequences))
         
-        header_text = sirixml_get_value(public_transport_situation, 'Summary')
-        if header_text is None:
+        summary = get_element(public_transport_situation, _summary)
+        if summary is None or summary.text is None:
             raise ValueError(f"Missing field 'Summary' for situation {entity_id}")
         
-        alert_header_text = create_translated_string(
-            [sirixml_get_attribute(public_transport_situation, 'Summary.{http://www.w3.org/XML/1998/namespace}lang', 'de')],
-            [header_text]
-        )
+        header_text = summary.text
+        header_language = summary.get(_xml_lang, 'de')
 
-        description_text = sirixml_get_value(public_transport_situation, 'Detail')
-        if description_text is None:
+        detail = get_element(public_transport_situation, _detail)
+        if detail is None or detail.text is None:
             raise ValueError(f"Missing field 'Detail' for situation {entity_id}")
         
-        alert_description_text = create_translated_string(
-            [sirixml_get_attribute(public_transport_situation, 'Detail.{http://www.w3.org/XML/1998/namespace}lang', 'de')],
-            [description_text]
-        )
+        description_text = detail.text
+        description_language = detail.get(_xml_lang, 'de')
 
         alert_active_periods = self._convert_active_periods(public_transport_situation)
         alert_informed_entities = self._convert_informed_entities(public_transport_situation)
 
+        progress = get_value(public_transport_situation, _progress, 'published')
+
+        if feed_entity is not None:
+            # fill the protobuf message directly, this is much faster than creating it by ParseDict
+            feed_entity.id = entity_id
+
+            alert = feed_entity.alert
+            create_url(self._config['app']['adapter']['url'], alert.url, alertId=entity_id)
+            alert.cause = gtfs_realtime_pb2.Alert.Cause.Value(alert_cause)
+            alert.effect = gtfs_realtime_pb2.Alert.Effect.Value(alert_effect)
+            create_translated_string([header_language], [header_text], alert.header_text)
+            create_translated_string([description_language], [description_text], alert.description_text)
+
+            for active_period in alert_active_periods:
+                alert.active_period.add(**active_period)
+
+            for informed_entity in alert_informed_entities:
+                alert.informed_entity.add(**informed_entity)
+
+            # mark this element as deleted when the progress is 'closed'
+            if progress == 'closed':
+                feed_entity.is_deleted = True
+
+            return feed_entity, progress == 'closing'
+
         # create result object
         result = {
             'id': entity_id,
             'alert': {
-                'url': alert_url,
+                'url': create_url(self._config['app']['adapter']['url'], alertId=entity_id),
                 'cause': alert_cause,
                 'effect': alert_effect,
-                'header_text': alert_header_text,
-                'description_text': alert_description_text,
+                'header_text': create_translated_string([header_language], [header_text]),
+                'description_text': create_translated_string([description_language], [description_text]),
                 'active_period': alert_active_periods,
                 'informed_entity': alert_informed_entities
             }
         }
 
         # mark this element as deleted when the progress is 'closed'
-        if sirixml_get_value(public_transport_situation, 'Progress', 'published') == 'closed':
+        if progress == 'closed':
             result['is_deleted'] = True
 
         # return result and the boolean indicator whether the event is closing currently or not
-        return result, sirixml_get_value(public_transport_situation, 'Progress', 'published') == 'closing'
+        return result, progress == 'closing'
     
     def _convert_active_periods(self, public_transport_situation: PublicTransportSituation) -> list:
         active_periods = list()
 
-        for validity_period in public_transport_situation.ValidityPeriod:
-            start_time = sirixml_get_value(validity_period, 'StartTime')
-            end_time = sirixml_get_value(validity_period, 'EndTime')
+        for validity_period in get_elements(public_transport_situation, _validity_period):
+            start_time = get_value(validity_period, _start_time)
+            end_time = get_value(validity_period, _end_time)
 
             active_period = dict()
             if start_time is not None:
-                active_period['start'] = iso2unix(start_time)
+                active_period['start'] = iso2unix(start_time, self._timezone)
             
             if end_time is not None and not end_time.startswith('2500'):
-                active_period['end'] = iso2unix(end_time)
+                active_period['end'] = iso2unix(end_time, self._timezone)
 
             if len(active_period.keys()) > 0:
                 active_periods.append(active_period)
@@ -84,39 +160,49 @@ class VdvStandardAdapter(BaseAdapter):
     def _convert_informed_entities(self, public_transport_situation: PublicTransportSituation) -> list:
         informed_entities = list()
         
-        for consequence in sirixml_get_elements(public_transport_situation, 'Consequences.Consequence'):
-            if sirixml_exists(consequence, 'Affects.Networks'):
-                for network in sirixml_get_elements(consequence, 'Affects.Networks.AffectedNetwork'):
-                    for line in sirixml_get_elements(network, 'AffectedLine'):
-                        direction_id = sirixml_get_value(line, 'Direction.DirectionRef', None)
+        for consequence in get_elements(get_element(public_transport_situation, _consequences), _consequence):
+            affects = get_element(consequence, _affects)
+            if affects is None:
+                continue
+
+            networks = get_element(affects, _networks)
+            stop_places = get_element(affects, _stop_places)
+            stop_points = get_element(affects, _stop_points)
+            operators = get_element(affects, _operators)
+
+            if networks is not None:
+                for network in get_elements(networks, _affected_network):
+                    for line in get_elements(network, _affected_line):
+                        direction_id = get_value(line, _direction_ref)
                         if direction_id is not None:
                             direction_id = self._convert_direction_id(direction_id)
                             informed_entities.append({
-                                'route_id': sirixml_get_value(line, 'LineRef', None),
+                                'route_id': get_value(line, _line_ref),
                                 'direction_id': direction_id
                             })
                         else:
                             informed_entities.append({
-                                'route_id': sirixml_get_value(line, 'LineRef', None)
+                                'route_id': get_value(line, _line_ref)
                             })
 
-            elif sirixml_exists(consequence, 'Affects.StopPlaces'):
-                for stop_place in sirixml_get_elements(consequence, 'Affects.StopPlaces.AffectedStopPlace'):
-                    stop_id = sirixml_get_value(stop_place, 'StopPlaceRef', None)
+            elif stop_places is not None:
+                for stop_place in get_elements(stop_places, _affected_stop_place):
+                    stop_id = get_value(stop_place, _stop_place_ref)
 
-                    if sirixml_exists(stop_place, 'Lines.AffectedLine'):
-                        for stop_place_line in sirixml_get_elements(stop_place, 'Lines.AffectedLine'):
-                            direction_id = sirixml_get_value(stop_place_line, 'Direction.DirectionRef', None)
+                    stop_place_lines = get_element(stop_place, _lines_affected_line)
+                    if stop_place_lines is not None:
+                        for stop_place_line in stop_place_lines:
+                            direction_id = get_value(stop_place_line, _direction_ref)
                             if direction_id is not None:
                                 direction_id = self._convert_direction_id(direction_id)
                                 informed_entities.append({
-                                    'route_id': sirixml_get_value(stop_place_line, 'LineRef', None),
+                                    'route_id': get_value(stop_place_line, _line_ref),
                                     'stop_id': stop_id,
                                     'direction_id': direction_id
                                 })
                             else:
                                 informed_entities.append({
-                                    'route_id': sirixml_get_value(stop_place_line, 'LineRef'),
+                                    'route_id': get_value(stop_place_line, _line_ref),
                                     'stop_id': stop_id
                                 })
                     else:
@@ -124,59 +210,57 @@ class VdvStandardAdapter(BaseAdapter):
                             'stop_id': stop_id
                         })
 
-            elif sirixml_exists(consequence, 'Affects.StopPoints'):
-                for stop_point in sirixml_get_elements(consequence, 'Affects.StopPoints.AffectedStopPoint'):
-                    stop_id = sirixml_get_value(stop_place, 'StopPointRef', None)
+            elif stop_points is not None:
+                for stop_point in get_elements(stop_points, _affected_stop_point):
+                    stop_id = get_value(stop_point, _stop_point_ref)
 
-                    if sirixml_exists(stop_point, 'Lines.AffectedLine'):
-                        for stop_place_line in sirixml_get_elements(stop_place, 'Lines.AffectedLine'):
+                    stop_point_lines = get_element(stop_point, _lines_affected_line)
+                    if stop_point_lines is not None:
+                        for stop_point_line in stop_point_lines:
                             informed_entities.append({
-                                'route_id': sirixml_get_value(stop_place_line, 'LineRef'),
+                                'route_id': get_value(stop_point_line, _line_ref),
                                 'stop_id': stop_id
                             })
                     else:
                         informed_entities.append({
                             'stop_id': stop_id
                         })
-            elif sirixml_exists(consequence, 'Affects.Operators'):
-                for operator in sirixml_get_elements(consequence, 'Affects.Operators'):
+            elif operators is not None:
+                for operator in operators:
                     informed_entities.append({
-                        'agency_id': sirixml_get_value(operator, 'OperatorRef')
+                        'agency_id': get_value(operator, _operator_ref)
                     })
 
         return informed_entities
     
-    def _convert_alert_cause(self, cause: str, map: dict|None = None) -> str:
-        if map is not None and len(map) > 0:
-            cause_map = map
-        else:
-            cause_map = causes
-        
-        if cause in cause_map:
-            return cause_map[cause]
-        else:
-            return 'UNKNOWN_CAUSE'
+    def _create_cause_map(self) -> dict:
+        return dict(causes)
+    
+    def _create_condition_map(self) -> dict:
+        return dict(conditions)
+    
+    def _create_lookup_table(self, defaults: dict, overrides: dict|None, values: list[str]) -> dict:
+        lookup_table = dict(defaults)
+        if overrides is not None:
+            lookup_table.update(overrides)
 
-    def _convert_alert_effect(self, consequences, map: dict|None = None) -> str:
-        if map is not None and len(map) > 0:
-            condition_map = map
-        else:
-            condition_map = conditions
+        for key, value in lookup_table.items():
+            if value not in values:
+                raise ValueError(f"Unknown GTFS-RT value {value} for {key}")
+            
+        return lookup_table
+    
+    def _convert_alert_cause(self, cause: str) -> str:
+        return self._causes.get(cause, 'UNKNOWN_CAUSE')
 
+    def _convert_alert_effect(self, consequences) -> str:
         # run through all consequences and convert conditions to effects
-        effects = list()
-        for consequence in consequences.Consequence:
-            if sirixml_exists(consequence, 'Condition') and consequence.Condition in condition_map:
-                effects.append(condition_map[consequence.Condition])
-            else:
-                effects.append('UNKNOWN_EFFECT')
-
-        # define order of effect priorities here
-        prios = effect_priorities
+        effects = [self._conditions.get(get_value(consequence, _condition), 'UNKNOWN_EFFECT') for consequence in get_elements(consequences, _consequence)]
 
         # prioritize effects, as GTFS-RT spec allows only one effect actually
         if len(effects):
-            return sorted(effects, key=lambda x: prios.index(x))[0]
+            num_effect_ranks = len(self._effect_ranks)
+            return min(effects, key=lambda x: self._effect_ranks.get(x, num_effect_ranks))
         else:
             return 'UNKNOWN_EFFECT'
         
@@ -0,0 +1,333 @@
+import asyncio
+import copy
+import glob
+import logging
+import os
+import platform
+import random
+import statistics
+import time
+import yaml
+
+from datetime import datetime, timedelta, timezone
+from google.transit import gtfs_realtime_pb2
+from lxml import etree
+from lxml.objectify import fromstring
+
+from vdv736gtfsrt.adapter.cache import ConversionCache
+from vdv736gtfsrt.config import Configuration
+from vdv736gtfsrt.gtfsrt import create_translated_string, iso2unix
+from vdv736gtfsrt.mqtt import GtfsRealtimePublisher
+from vdv736gtfsrt.server import GtfsRealtimeServer
+
+_siri_namespace = 'http://www.siri.org.uk/siri'
+
+class SyntheticDeliveryGenerator:
+
+    def __init__(self, samples_directory: str, seed: int = 0) -> None:
+        sample_filenames = sorted(glob.glob(os.path.join(samples_directory, 'SampleSituation*.xml')))
+        if len(sample_filenames) == 0:
+            raise ValueError(f"no sample situations found in {samples_directory}")
+
+        self._samples = [etree.parse(f).getroot() for f in sample_filenames]
+        self._seed = seed
+
+    def generate(self, num_situations: int) -> bytes:
+        # the same seed generates the same delivery, so that results of different commits are comparable
+        rng = random.Random(self._seed)
+
+        siri = etree.Element(f"{{{_siri_namespace}}}Siri", nsmap={None: _siri_namespace})
+        siri.set('version', '2.0')
+
+        service_delivery = etree.SubElement(siri, f"{{{_siri_namespace}}}ServiceDelivery")
+        etree.SubElement(service_delivery, f"{{{_siri_namespace}}}ResponseTimestamp").text = '2024-10-25T01:00:14Z'
+        etree.SubElement(service_delivery, f"{{{_siri_namespace}}}ProducerRef").text = 'BENCHMARK'
+
+        situation_exchange_delivery = etree.SubElement(service_delivery, f"{{{_siri_namespace}}}SituationExchangeDelivery")
+        situation_exchange_delivery.set('version', '2.0')
+
+        situations = etree.SubElement(situation_exchange_delivery, f"{{{_siri_namespace}}}Situations")
+        for n in range(num_situations):
+            situations.append(self._create_situation(self._samples[n % len(self._samples)], n, rng))
+
+        return etree.tostring(siri, xml_declaration=True, encoding='UTF-8')
+
+    def situations(self, delivery: bytes) -> list:
+        return list(fromstring(delivery).iterfind(f".//{{{_siri_namespace}}}PtSituationElement"))
+
+    def _create_situation(self, sample: etree._Element, n: int, rng: random.Random) -> etree._Element:
+        situation = copy.deepcopy(sample)
+
+        # shift all timestamps of a situation by the same offset of up to one week
+        offset = timedelta(minutes=rng.randrange(0, 7 * 24 * 60))
+
+        for element in situation.iter():
+            if not isinstance(element.tag, str):
+                continue
+
+            localname = etree.QName(element).localname
+            element.tag = f"{{{_siri_namespace}}}{localname}"
+
+            if localname == 'SituationNumber':
+                element.text = f"{element.text}-{n:05d}"
+            elif localname in ('Summary', 'Description', 'Detail', 'SummaryText', 'DescriptionText', 'DetailText'):
+                # unique texts, otherwise the text normalization would be answered by its cache
+                element.text = f"{element.text} ({n})"
+            elif localname.endswith('Time') and element.text is not None:
+                element.text = self._shift_timestamp(element.text, offset)
+
+        etree.cleanup_namespaces(situation)
+
+        return situation
+
+    def _shift_timestamp(self, timestamp: str, offset: timedelta) -> str:
+        try:
+            shifted = datetime.fromisoformat(timestamp.strip().replace('Z', '+00:00')) + offset
+        except ValueError:
+            return timestamp
+
+        return shifted.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+class _SyntheticSubscriber:
+
+    def __init__(self, situations: list) -> None:
+        self._situations = {str(s.SituationNumber): s for s in situations}
+
+    def get_situations(self) -> dict:
+        return dict(self._situations)
+
+class Benchmark:
+
+    def __init__(self, config_filename: str, samples_directory: str, num_situations: int = 10000, iterations: int = 3, num_requests: int = 2000, concurrency: int = 16, seed: int = 0, num_workers: int|None = None, mqtt_broker: tuple[str, int]|None = None) -> None:
+        self._config_filename = config_filename
+        self._num_situations = num_situations
+        self._iterations = iterations
+        self._num_requests = num_requests
+        self._concurrency = concurrency
+        self._num_workers = num_workers if num_workers is not None else (os.cpu_count() or 1)
+
+        # host and port of the MQTT broker, the publisher is not measured without
+        self._mqtt_broker = mqtt_broker
+
+        with open(config_filename, 'r') as config_file:
+            self._config = Configuration.default_config(yaml.safe_load(config_file))
+
+        self._generator = SyntheticDeliveryGenerator(samples_directory, seed)
+
+        self._delivery = self._generator.generate(num_situations)
+        self._situations = self._generator.situations(self._delivery)
+
+        self._parameters = {
+            'situations': num_situations,
+            'iterations': iterations,
+            'requests': num_requests,
+            'concurrency': concurrency,
+            'workers': self._num_workers,
+            'seed': seed,
+            'delivery_bytes': len(self._delivery)
+        }
+
+    def run(self) -> dict:
+        results = dict()
+
+        server = GtfsRealtimeServer(self._config_filename, _SyntheticSubscriber(self._situations))
+
+        try:
+            results['adapter_convert'] = self._benchmark_adapter_convert(server.adapter)
+            results['conversion_pool'] = self._benchmark_conversion_pool(server)
+            results['create_translated_string'] = self._benchmark_create_translated_string()
+            results['iso2unix'] = self._benchmark_iso2unix()
+            results['feed_serialization'] = self._benchmark_feed_serialization(server)
+            results['endpoint'] = asyncio.run(self._benchmark_endpoint(server))
+        finally:
+            server.close()
+
+        if self._mqtt_broker is not None:
+            results['mqtt_publish'] = self._benchmark_mqtt_publish(*self._mqtt_broker)
+
+        return {
+            'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': self._parameters,
+            'results': results
+        }
+
+    def _benchmark_adapter_convert(self, adapter) -> dict:
+        def convert_all():
+            for situation in self._situations:
+                adapter.convert(situation, gtfs_realtime_pb2.FeedEntity())
+
+        return self._measure(convert_all, len(self._situations))
+
+    def _benchmark_conversion_pool(self, server: GtfsRealtimeServer) -> dict:
+        result = dict()
+
+        # all situations are converted through an empty conversion cache, in process and by one or more workers
+        for num_workers in sorted({0, 1, self._num_workers}):
+            conversion_cache = ConversionCache(server.adapter, self._config, num_workers)
+            try:
+                def convert_all():
+                    conversion_cache.retain([])
+                    conversion_cache.convert_all(self._situations)
+
+                result[f"workers_{num_workers}"] = self._measure(convert_all, len(self._situations))
+
+                # both ways of converting a batch around the minimum number of parallel conversions
+                if num_workers == self._num_workers and num_workers > 0:
+                    threshold = dict()
+                    min_parallel_conversions = ConversionCache.min_parallel_conversions
+                    for batch_size in sorted({min(n, len(self._situations)) for n in (min_parallel_conversions // 2, min_parallel_conversions, min_parallel_conversions * 2)}):
+                        batch = self._situations[:batch_size]
+
+                        local = self._measure(lambda: conversion_cache.convert_uncached(batch, False), batch_size)
+                        parallel = self._measure(lambda: conversion_cache.convert_uncached(batch, True), batch_size)
+
+                        threshold[str(batch_size)] = {
+                            'local_seconds': local['median_seconds'],
+                            'parallel_seconds': parallel['median_seconds']
+                        }
+
+                    result['threshold'] = threshold
+            finally:
+                conversion_cache.close()
+
+        # speedup of the configured number of workers compared to converting in process
+        parallel_median = result[f"workers_{self._num_workers}"]['median_seconds']
+        result['speedup'] = result['workers_0']['median_seconds'] / parallel_median if parallel_median > 0 else 0.0
+        result['min_parallel_conversions'] = ConversionCache.min_parallel_conversions
+
+        return result
+
+    def _benchmark_create_translated_string(self) -> dict:
+        texts = [f"<p>Umleitung &amp; Ersatzverkehr zwischen Haltestelle {n} und Haltestelle {n + 1}</p>" if n % 2 == 0 else f"Haltestelle {n} entfällt" for n in range(self._num_situations)]
+
+        def create_all():
+            for text in texts:
+                create_translated_string(['de'], [text], gtfs_realtime_pb2.TranslatedString())
+
+        return self._measure(create_all, len(texts))
+
+    def _benchmark_iso2unix(self) -> dict:
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        timestamps = [(start + timedelta(minutes=n)).strftime('%Y-%m-%dT%H:%M:%SZ') for n in range(self._num_situations)]
+
+        def convert_all():
+            # measure parsing instead of cache lookups
+            iso2unix.cache_clear()
+            for timestamp in timestamps:
+                iso2unix(timestamp)
+
+        return self._measure(convert_all, len(timestamps))
+
+    def _benchmark_feed_serialization(self, server: GtfsRealtimeServer) -> dict:
+        feed_snapshot = server.update_feed()
+
+        feed_header = gtfs_realtime_pb2.FeedHeader()
+        feed_header.gtfs_realtime_version = '2.0'
+        feed_header.incrementality = gtfs_realtime_pb2.FeedHeader.FULL_DATASET
+        feed_header.timestamp = int(time.time())
+
+        # the feed message is rendered and compressed again out of the already serialized entities
+        result = self._measure(lambda: feed_snapshot.restamp(feed_header), feed_snapshot.num_entities)
+        result['feed_bytes'] = len(feed_snapshot.pbf)
+
+        return result
+
+    async def _benchmark_endpoint(self, server: GtfsRealtimeServer) -> dict:
+        import httpx
+
+        server.update_feed()
+
+        endpoint = self._config['app']['endpoint']
+        transport = httpx.ASGITransport(app=server.create())
+
+        latencies = list()
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+            requests = iter(range(self._num_requests))
+
+            async def worker():
+                for n in requests:
+                    # alternate between plain and compressed responses
+                    headers = {'Accept-Encoding': 'gzip'} if n % 2 == 0 else {'Accept-Encoding': 'identity'}
+
+                    start = time.perf_counter()
+                    response = await client.get(endpoint, headers=headers)
+                    latencies.append(time.perf_counter() - start)
+
+                    if response.status_code != 200:
+                        raise RuntimeError(f"endpoint returned status {response.status_code}")
+
+            start = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(self._concurrency)])
+            duration = time.perf_counter() - start
+
+        latencies.sort()
+
+        return {
+            'requests': len(latencies),
+            'concurrency': self._concurrency,
+            'duration_seconds': duration,
+            'requests_per_second': len(latencies) / duration if duration > 0 else 0.0,
+            'latency_median_seconds': statistics.median(latencies),
+            'latency_p95_seconds': self._percentile(latencies, 0.95),
+            'latency_p99_seconds': self._percentile(latencies, 0.99)
+        }
+
+    def _benchmark_mqtt_publish(self, host: str, port: int) -> dict:
+        root_logger = logging.getLogger()
+
+        durations = list()
+        num_messages = 0
+        for _ in range(self._iterations):
+            publisher = GtfsRealtimePublisher(self._config_filename, host, str(port), None, None, '/benchmark/[alertId]', 'vdv736gtfsrt-benchmark', 300)
+
+            # the publisher logs every single message otherwise
+            log_level = root_logger.level
+            root_logger.setLevel(logging.WARNING)
+
+            try:
+                start = time.perf_counter()
+
+                publisher.process_delivery_stream(self._delivery)
+                if not publisher.flush(60):
+                    raise RuntimeError('messages were not confirmed by the MQTT broker')
+
+                durations.append(time.perf_counter() - start)
+                num_messages += publisher.num_published_messages
+            finally:
+                root_logger.setLevel(log_level)
+
+                publisher.close()
+
+        result = self._summarize(durations, self._num_situations)
+        result['messages'] = num_messages
+
+        return result
+
+    def _measure(self, function, num_items: int) -> dict:
+        # warm up imports and caches which are not part of the measured work
+        function()
+
+        durations = list()
+        for _ in range(self._iterations):
+            start = time.perf_counter()
+            function()
+            durations.append(time.perf_counter() - start)
+
+        return self._summarize(durations, num_items)
+
+    def _summarize(self, durations: list[float], num_items: int) -> dict:
+        median = statistics.median(durations)
+
+        return {
+            'iterations': len(durations),
+            'items': num_items,
+            'median_seconds': median,
+            'min_seconds': min(durations),
+            'max_seconds': max(durations),
+            'items_per_second': num_items / median if median > 0 else 0.0
+        }
+
+    def _percentile(self, values: list[float], percentile: float) -> float:
+        return values[min(len(values) - 1, int(len(values) * percentile))]
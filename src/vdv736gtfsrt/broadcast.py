@@ -0,0 +1,98 @@
+import asyncio
+import base64
+
+from collections import deque
+
+def format_event(event: str, data: bytes, event_id: str|None = None) -> bytes:
+    # serialized feeds are binary, hence they're sent base64 encoded, see HTML living standard section 9.2
+    lines = list()
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+
+    lines.append(f"event: {event}")
+    lines.append(f"data: {base64.b64encode(data).decode('ascii')}")
+
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+class FeedBroadcaster:
+
+    def __init__(self, buffer_size: int, max_clients: int) -> None:
+        self.max_clients: int = max_clients
+        self.num_clients: int = 0
+
+        # version of the latest message, clients only keep the version they have sent last
+        self.version: int = 0
+
+        # version, feed version and serialized differential message, shared by all clients
+        self._messages: deque[tuple[int, str, bytes]] = deque(maxlen=buffer_size)
+
+        self._loop: asyncio.AbstractEventLoop|None = None
+        self._published: asyncio.Future|None = None
+        self._closed: bool = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def start(self, version: int = 0) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._published = self._loop.create_future()
+        self._closed = False
+
+        self.version = version
+
+    def stop(self) -> None:
+        self._closed = True
+        self._notify()
+
+    @property
+    def full(self) -> bool:
+        return self.num_clients >= self.max_clients
+
+    def connect(self) -> None:
+        self.num_clients += 1
+
+    def disconnect(self) -> None:
+        self.num_clients -= 1
+
+    def publish(self, version: int, feed_version: str, message: bytes) -> None:
+        # may be called from any thread, the buffer is only modified within the event loop
+        if self._loop is None:
+            return
+
+        try:
+            self._loop.call_soon_threadsafe(self._append, version, feed_version, message)
+        except RuntimeError:
+            # the event loop is already closed
+            pass
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        # all waiting clients share a single future, hence idle clients cost nothing but their connection
+        if self.version > version or self._closed:
+            return True
+
+        done, _ = await asyncio.wait((self._published,), timeout=timeout)
+        return len(done) > 0
+
+    def messages_since(self, version: int) -> list[tuple[int, str, bytes]]|None:
+        # returns None if the client has fallen behind the buffer, it needs the full dataset then
+        if version >= self.version:
+            return []
+
+        if len(self._messages) == 0 or self._messages[0][0] > version + 1:
+            return None
+
+        return [m for m in self._messages if m[0] > version]
+
+    def _append(self, version: int, feed_version: str, message: bytes) -> None:
+        self._messages.append((version, feed_version, message))
+        self.version = version
+
+        self._notify()
+
+    def _notify(self) -> None:
+        if self._published is not None and not self._published.done():
+            self._published.set_result(None)
+
+        if not self._closed and self._loop is not None:
+            self._published = self._loop.create_future()
@@ -0,0 +1,84 @@
+import secrets
+
+from collections import deque
+from google.transit import gtfs_realtime_pb2
+
+from .gtfsrt import serialize_feed_entity
+
+def _create_deleted_entity(serialized_entity: bytes) -> bytes:
+    # serialized entities are framed as field of a FeedMessage, see serialize_feed_entity
+    feed_entity = gtfs_realtime_pb2.FeedMessage.FromString(serialized_entity).entity[0]
+    feed_entity.is_deleted = True
+
+    return serialize_feed_entity(feed_entity)
+
+class ChangeLog:
+
+    def __init__(self, max_versions: int, epoch: str|None = None) -> None:
+        # versions of another process or an earlier run are not valid anymore, hence
+        # each change log has its own epoch which is part of the feed version
+        self.epoch: str = epoch if epoch is not None else secrets.token_hex(4)
+        self.version: int = 0
+
+        # published entities of the latest version
+        self._entities: dict[str, bytes] = dict()
+
+        # version => alert ID => serialized changed or deleted entity
+        self._changes: deque[tuple[int, dict[str, bytes]]] = deque(maxlen=max_versions)
+
+    @property
+    def feed_version(self) -> str:
+        return self.create_feed_version(self.version)
+
+    def create_feed_version(self, version: int) -> str:
+        return f"{self.epoch}-{version}"
+
+    def restore(self, epoch: str, version: int, entities: dict[str, bytes]) -> None:
+        # continue the versions of an earlier run, so that its clients do not need the full dataset again
+        self.epoch = epoch
+        self.version = version
+
+        self._entities = dict(entities)
+        self._changes.clear()
+
+    def update(self, entities: dict[str, bytes]) -> dict[str, bytes]:
+        changes = dict()
+        for alert_id, serialized_entity in entities.items():
+            previous = self._entities.get(alert_id)
+            if previous is not serialized_entity and previous != serialized_entity:
+                changes[alert_id] = serialized_entity
+
+        for alert_id, serialized_entity in self._entities.items():
+            if alert_id not in entities:
+                changes[alert_id] = _create_deleted_entity(serialized_entity)
+
+        # a new version is only created if there are changes
+        if len(changes) > 0:
+            self.version += 1
+            self._changes.append((self.version, changes))
+
+        self._entities = dict(entities)
+
+        return changes
+
+    def changes_since(self, feed_version: str, until: int) -> list[bytes]|None:
+        # returns None if the version is unknown or already evicted, clients need the full dataset then
+        epoch, _, version = feed_version.rpartition('-')
+        if epoch != self.epoch or not version.isdigit():
+            return None
+
+        version = int(version)
+        if version > until:
+            return None
+
+        # copying the deque is atomic, so that concurrent updates do not interfere with the iteration
+        changes = list(self._changes)
+        if version < until and (len(changes) == 0 or changes[0][0] > version + 1):
+            return None
+
+        merged = dict()
+        for changed_version, changed_entities in changes:
+            if version < changed_version <= until:
+                merged.update(changed_entities)
+
+        return list(merged.values())
@@ -20,13 +20,48 @@ class Configuration:
                 'pattern': 'publish/subscribe',
                 'status_request_interval': 300,
                 'data_update_interval': 60,
+                'stale_feed_max_age': 0,
                 'timezone': 'Europe/Berlin',
-                'caching_enabled': False,
+                'compression_enabled': True,
+                'conversion_workers': 0,
+                'differential_enabled': False,
+                'metrics_enabled': False,
+                'publication_window_enabled': False,
+                'streaming_enabled': False,
+                'warm_start_enabled': False,
                 'datalog_enabled': False
             },
-            'caching': {
-                'caching_server_endpoint': '[YourCachingServerEndpoint]',
-                'caching_server_ttl_seconds': 120
+            'compression': {
+                'compression_brotli_enabled': False
+            },
+            'scheduler': {
+                'scheduler_jitter_seconds': 0,
+                'scheduler_max_backoff_seconds': 900,
+                'scheduler_overlap_policy': 'skip'
+            },
+            'differential': {
+                'differential_endpoint': '/gtfsrt-service-alerts-differential.pbf',
+                'differential_max_versions': 100
+            },
+            'streaming': {
+                'streaming_endpoint': '/gtfsrt-service-alerts-stream',
+                'streaming_buffer_size': 100,
+                'streaming_keepalive_seconds': 15,
+                'streaming_long_poll_max_seconds': 60,
+                'streaming_max_clients': 10000
+            },
+            'warm_start': {
+                'warm_start_filename': './warmstart.bin',
+                'warm_start_max_age_seconds': 86400
+            },
+            'publication_window': {
+                'publication_window_past_seconds': 3600,
+                'publication_window_future_seconds': 604800
+            },
+            'metrics': {
+                'metrics_endpoint': '/metrics',
+                'metrics_listener_host': '0.0.0.0',
+                'metrics_listener_port': 9100
             }
         }
 
@@ -37,4 +72,5 @@ class Configuration:
         if isinstance(defaults, dict) and isinstance(actual, dict):
             return {k: cls._merge_config(defaults.get(k, {}), actual.get(k, {})) for k in set(defaults) | set(actual)}
         
-        return actual if actual else defaults
\ No newline at end of file
+        # explicit falsy values like False or 0 must not be replaced by their defaults
+        return actual if actual is not None and actual != {} else defaults
\ No newline at end of file
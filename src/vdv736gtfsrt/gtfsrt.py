@@ -1,10 +1,21 @@
+import pytz
 import re
+import threading
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from google.transit import gtfs_realtime_pb2
 from io import StringIO
 from html.parser import HTMLParser
 from typing import List
 
+_multiple_spaces = re.compile(' {2,}')
+
+# xs:dateTime with optional fractional seconds and optional timezone
+_xs_datetime = re.compile(r'(\d{4,})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:\d{2})?')
+
+_unix_epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
 class _HtmlTagStripper(HTMLParser):
      
     def __init__(self) -> None:
@@ -21,33 +32,66 @@ class _HtmlTagStripper(HTMLParser):
     def get_stripped_text(self) -> str:
          return self.text.getvalue()
     
+    def strip(self, input: str) -> str:
+         # reset parser state and buffer in order to reuse the same instance for every text
+         self.reset()
+         self.text = StringIO()
+
+         self.feed(input)
+
+         return self.get_stripped_text()
+
+# HTMLParser keeps state while parsing, hence every thread needs its own instance
+_html_tag_strippers = threading.local()
+    
 def _strip_tags(input: str) -> str:
-     s = _HtmlTagStripper()
-     s.feed(input)
+     # texts without markup and character references are not changed by the parser at all
+     if '<' not in input and '&' not in input:
+          return input
+     
+     s = getattr(_html_tag_strippers, 'stripper', None)
+     if s is None:
+          s = _html_tag_strippers.stripper = _HtmlTagStripper()
+
+     return s.strip(input)
 
-     return s.get_stripped_text()
+@lru_cache(maxsize=4096)
+def _normalize_text(input: str) -> str:
+    # most texts are the same in every delivery, hence they're normalized only once
+    text = _strip_tags(input)
+    text = text.replace('\t', '')
+    text = _multiple_spaces.sub(' ', text)
 
-def create_translated_string(languages: List[str], texts: List[str]) -> dict:
-    translated_string = dict()
-    translated_string['translation'] = list()
+    return text
 
+def create_translated_string(languages: List[str], texts: List[str], translated_string: gtfs_realtime_pb2.TranslatedString|None = None) -> dict|gtfs_realtime_pb2.TranslatedString:
     if len(languages) != len(texts):
         raise ValueError('the number of languages must be the same like the number of texts')
     
+    # fill the protobuf message in place if passed, create a dict otherwise
+    if translated_string is None:
+        translated_string = dict()
+        translated_string['translation'] = list()
+
+        translations = translated_string['translation']
+    else:
+        translations = None
+    
     for n in range(0, len(languages)):
         
-        translated_text = _strip_tags(texts[n])
-        translated_text = translated_text.replace('\t', '')
-        translated_text = re.sub(' +', ' ', translated_text)
+        translated_text = _normalize_text(texts[n])
         
-        translated_string['translation'].append({
-            'language': languages[n].lower(),
-            'text': translated_text
-        })
+        if translations is not None:
+            translations.append({
+                'language': languages[n].lower(),
+                'text': translated_text
+            })
+        else:
+            translated_string.translation.add(language=languages[n].lower(), text=translated_text)
 
     return translated_string
 
-def create_url(urldict: dict, **variables) -> dict:
+def create_url(urldict: dict, translated_string: gtfs_realtime_pb2.TranslatedString|None = None, **variables) -> dict|gtfs_realtime_pb2.TranslatedString:
         
     languages = list()
     texts = list()
@@ -60,8 +104,70 @@ def create_url(urldict: dict, **variables) -> dict:
         languages.append(lang)
         texts.append(url)
     
-    return create_translated_string(languages, texts)
+    return create_translated_string(languages, texts, translated_string)
+
+def _encode_varint(value: int) -> bytes:
+    result = bytearray()
+    while value > 0x7F:
+        result.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    result.append(value)
+
+    return bytes(result)
+
+def serialize_feed_header(feed_header: gtfs_realtime_pb2.FeedHeader) -> bytes:
+    # FeedMessage.header is field 1, length-delimited
+    serialized = feed_header.SerializeToString()
+    return b'\x0a' + _encode_varint(len(serialized)) + serialized
+
+def serialize_feed_entity(feed_entity: gtfs_realtime_pb2.FeedEntity) -> bytes:
+    # FeedMessage.entity is field 2, length-delimited
+    serialized = feed_entity.SerializeToString()
+    return b'\x12' + _encode_varint(len(serialized)) + serialized
+
+def serialize_feed_message(serialized_header: bytes, serialized_entities: List[bytes]) -> bytes:
+    # a FeedMessage is just the header followed by the repeated entity fields, so
+    # pre-serialized fields can be concatenated without encoding the whole message again
+    return b''.join([serialized_header, *serialized_entities])
+
+def _parse_xs_datetime(iso_timestamp: str) -> datetime:
+    match = _xs_datetime.fullmatch(iso_timestamp)
+    if match is None:
+        raise ValueError(f"invalid xs:dateTime {iso_timestamp}")
+    
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+
+    if offset is None or offset == 'Z':
+        tzinfo = timezone.utc
+    else:
+        sign = -1 if offset[0] == '-' else 1
+        tzinfo = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6])))
+
+    microsecond = int(fraction[:6].ljust(6, '0')) if fraction is not None else 0
+
+    # xs:dateTime allows 24:00:00 as the end of a day
+    if hour == '24' and minute == '00' and second == '00' and microsecond == 0:
+        return datetime(int(year), int(month), int(day), tzinfo=tzinfo) + timedelta(days=1)
+
+    return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), microsecond, tzinfo=tzinfo)
+
+@lru_cache(maxsize=1024)
+def iso2unix(iso_timestamp: str, tz: str = 'UTC') -> int:
+    iso_timestamp = iso_timestamp.strip()
+
+    # fromisoformat is the fast path, but it does not support 'Z' before Python 3.11, 
+    # fractions other than 3 or 6 digits before Python 3.11 and 24:00:00 at all
+    try:
+        if iso_timestamp.endswith('Z'):
+            dt = datetime.fromisoformat(f"{iso_timestamp[:-1]}+00:00")
+        else:
+            dt = datetime.fromisoformat(iso_timestamp)
+    except ValueError:
+        dt = _parse_xs_datetime(iso_timestamp)
+
+    # timestamps without timezone are considered as local time of the given timezone
+    if dt.tzinfo is None:
+        dt = pytz.timezone(tz).localize(dt)
 
-def iso2unix(iso_timestamp: str) -> int:
-        dt = datetime.strptime(iso_timestamp, '%Y-%m-%dT%H:%M:%SZ')
-        return int((dt - datetime(1970, 1, 1)).total_seconds())
\ No newline at end of file
+    return (dt - _unix_epoch) // timedelta(seconds=1)
\ No newline at end of file
@@ -0,0 +1,281 @@
+from bisect import bisect_left, bisect_right, insort
+from google.transit import gtfs_realtime_pb2
+from math import inf
+from typing import Collection, Iterable
+
+_empty = frozenset()
+
+class _IntervalTree:
+
+    __slots__ = ('_center', '_by_start', '_by_end', '_left', '_right')
+
+    # centered interval tree over (start, end, alert ID) tuples, open periods use infinite bounds
+    def __init__(self, intervals: list[tuple[float, float, str]]) -> None:
+        endpoints = sorted(p for start, end, _ in intervals for p in (start, end) if p not in (-inf, inf))
+
+        # the median is an endpoint of at least one interval, hence every node keeps at least one interval
+        self._center = endpoints[len(endpoints) // 2] if len(endpoints) > 0 else 0
+
+        left = [i for i in intervals if i[1] < self._center]
+        right = [i for i in intervals if i[0] > self._center]
+        overlapping = [i for i in intervals if i[0] <= self._center <= i[1]]
+
+        self._by_start = sorted(overlapping, key=lambda i: i[0])
+        self._by_end = sorted(overlapping, key=lambda i: i[1], reverse=True)
+
+        self._left = _IntervalTree(left) if len(left) > 0 else None
+        self._right = _IntervalTree(right) if len(right) > 0 else None
+
+    def overlapping(self, lower: float, upper: float, result: set[str]) -> set[str]:
+        # collects all intervals with start <= upper and end >= lower
+        if upper < self._center:
+            for start, _, alert_id in self._by_start:
+                if start > upper:
+                    break
+
+                result.add(alert_id)
+        elif lower > self._center:
+            for _, end, alert_id in self._by_end:
+                if end < lower:
+                    break
+
+                result.add(alert_id)
+        else:
+            result.update(alert_id for _, _, alert_id in self._by_start)
+
+        if self._left is not None and lower < self._center:
+            self._left.overlapping(lower, upper, result)
+
+        if self._right is not None and upper > self._center:
+            self._right.overlapping(lower, upper, result)
+
+        return result
+
+class InformedEntityIndex:
+
+    # selector fields of the informed entities which can be queried
+    fields = ('route_id', 'stop_id', 'agency_id')
+
+    def __init__(self) -> None:
+        # alert ID => serialized entity
+        self._entities: dict[str, bytes] = dict()
+
+        # alert ID => informed values per field and active periods, used for removing the alert from the index
+        self._informed_values: dict[str, tuple[tuple[frozenset, ...], tuple[tuple[int|None, int|None], ...]]] = dict()
+
+        # field => value => alert IDs
+        self._index: dict[str, dict[str, frozenset[str]]] = {field: dict() for field in self.fields}
+
+        # active periods, the interval tree is shared between indexes and only rebuilt after many changes,
+        # changed alerts are kept as delta of added intervals and removed alert IDs, see _update_active_periods
+        self._active_periods: _IntervalTree|None = None
+        self._added_periods: list[tuple[float, float, str]] = list()
+        self._removed_alerts: frozenset[str] = _empty
+        self._always_active: frozenset[str] = _empty
+        self._starts: list[int] = list()
+        self._ends: list[int] = list()
+
+        # fields whose values are still shared with the previous index, see _values
+        self._shared_fields: set[str] = set()
+
+    def update(self, entities: Iterable[tuple[gtfs_realtime_pb2.FeedEntity, bytes]]) -> 'InformedEntityIndex':
+        # the index is shared with running requests, hence a new index is created instead of modifying this one,
+        # only the keys of added, changed or removed alerts are touched
+        index = InformedEntityIndex()
+        index._informed_values = dict(self._informed_values)
+        index._index = dict(self._index)
+        index._shared_fields = set(self.fields)
+
+        added = list()
+        removed = list()
+        for alert, serialized_alert in entities:
+            index._entities[alert.id] = serialized_alert
+
+            previous = self._entities.get(alert.id)
+            if previous is serialized_alert or previous == serialized_alert:
+                continue
+
+            if previous is not None:
+                index._remove(alert.id)
+                removed.append(alert.id)
+
+            index._add(alert)
+            added.append(alert.id)
+
+        for alert_id in [a for a in self._entities.keys() if a not in index._entities]:
+            index._remove(alert_id)
+            removed.append(alert_id)
+
+        # keep this index including its active periods if nothing has changed
+        if len(added) == 0 and len(removed) == 0:
+            return self
+
+        index._update_active_periods(self, added, removed)
+
+        return index
+
+    def query(self, filters: dict[str, list[str]], active_at: int|None = None, published: Collection[str]|None = None) -> list[bytes]:
+        # values of the same field are combined with OR, different fields with AND, 
+        # published limits the result to the alerts of the publication window if given
+        candidates: Collection[str]|None = None
+        for field in sorted(filters.keys(), key=lambda f: len(filters[f])):
+            values = self._index[field]
+            matches = frozenset().union(*[values.get(v, _empty) for v in filters[field]])
+
+            candidates = matches if candidates is None else candidates & matches
+            if len(candidates) == 0:
+                return []
+
+        if published is not None:
+            candidates = published if candidates is None else candidates & published
+
+        if active_at is not None:
+            if candidates is None:
+                candidates = self.active_between(active_at, active_at)
+            else:
+                # only the active periods of the remaining candidates are checked instead of all alerts
+                candidates = [a for a in candidates if self._active_at(a, active_at)]
+
+        if candidates is None:
+            candidates = self._entities.keys()
+
+        # sorted for a deterministic order of the same result
+        return [self._entities[a] for a in sorted(candidates)]
+    
+    def active_between(self, lower: int, upper: int) -> set[str]:
+        # alerts with at least one active period overlapping [lower, upper]
+        result = set()
+        if self._active_periods is not None:
+            self._active_periods.overlapping(lower, upper, result)
+
+            if len(self._removed_alerts) > 0:
+                result -= self._removed_alerts
+
+        for start, end, alert_id in self._added_periods:
+            if start <= upper and end >= lower:
+                result.add(alert_id)
+
+        result |= self._always_active
+
+        return result
+    
+    def next_window_change(self, now: int, past: int, future: int) -> int|None:
+        # an alert enters the window [now - past, now + future] when now + future reaches the start 
+        # of an active period and leaves it when now - past exceeds the end of an active period
+        candidates = list()
+
+        index = bisect_right(self._starts, now + future)
+        if index < len(self._starts):
+            candidates.append(self._starts[index] - future)
+
+        index = bisect_left(self._ends, now - past)
+        if index < len(self._ends):
+            candidates.append(self._ends[index] + past + 1)
+
+        return min(candidates) if len(candidates) > 0 else None
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def _active_at(self, alert_id: str, timestamp: int) -> bool:
+        _, active_periods = self._informed_values[alert_id]
+        if len(active_periods) == 0:
+            return True
+
+        return any((start is None or start <= timestamp) and (end is None or end >= timestamp) for start, end in active_periods)
+
+    def _values(self, field: str) -> dict[str, frozenset[str]]:
+        # the values of a field are copied once before they're modified the first time
+        if field in self._shared_fields:
+            self._index[field] = dict(self._index[field])
+            self._shared_fields.discard(field)
+
+        return self._index[field]
+
+    def _add(self, alert: gtfs_realtime_pb2.FeedEntity) -> None:
+        informed_values = list()
+        for field in self.fields:
+            values = frozenset(getattr(e, field) for e in alert.alert.informed_entity if e.HasField(field))
+            for value in values:
+                field_values = self._values(field)
+                field_values[value] = field_values.get(value, _empty) | {alert.id}
+
+            informed_values.append(values)
+
+        active_periods = tuple(
+            (p.start if p.HasField('start') else None, p.end if p.HasField('end') else None)
+            for p in alert.alert.active_period
+        )
+
+        self._informed_values[alert.id] = (tuple(informed_values), active_periods)
+
+    def _remove(self, alert_id: str) -> None:
+        informed_values, _ = self._informed_values.pop(alert_id)
+        for field, values in zip(self.fields, informed_values):
+            for value in values:
+                field_values = self._values(field)
+
+                alert_ids = field_values[value] - {alert_id}
+                if len(alert_ids) > 0:
+                    field_values[value] = alert_ids
+                else:
+                    del field_values[value]
+
+    def _update_active_periods(self, previous: 'InformedEntityIndex', added: list[str], removed: list[str]) -> None:
+        # rebuild the interval tree once the delta has grown too large for scanning it per query
+        num_changes = len(previous._added_periods) + len(previous._removed_alerts) + len(added) + len(removed)
+        if previous._active_periods is None or num_changes > max(64, len(self._informed_values) // 8):
+            self._build_active_periods()
+            return
+
+        removed_alerts = frozenset(removed)
+
+        self._active_periods = previous._active_periods
+        self._removed_alerts = previous._removed_alerts | removed_alerts
+        self._added_periods = [i for i in previous._added_periods if i[2] not in removed_alerts]
+
+        always_active = set(previous._always_active - removed_alerts)
+        starts = list(previous._starts)
+        ends = list(previous._ends)
+
+        for alert_id in removed:
+            for start, end in previous._informed_values[alert_id][1]:
+                if start is not None:
+                    del starts[bisect_left(starts, start)]
+                if end is not None:
+                    del ends[bisect_left(ends, end)]
+
+        for alert_id in added:
+            active_periods = self._informed_values[alert_id][1]
+            if len(active_periods) == 0:
+                always_active.add(alert_id)
+
+            for start, end in active_periods:
+                self._added_periods.append((start if start is not None else -inf, end if end is not None else inf, alert_id))
+
+                if start is not None:
+                    insort(starts, start)
+                if end is not None:
+                    insort(ends, end)
+
+        self._always_active = frozenset(always_active)
+        self._starts = starts
+        self._ends = ends
+
+    def _build_active_periods(self) -> None:
+        intervals = list()
+        always_active = set()
+
+        for alert_id, (_, active_periods) in self._informed_values.items():
+            # alerts without active period are always active, see GTFS-RT reference
+            if len(active_periods) == 0:
+                always_active.add(alert_id)
+
+            for start, end in active_periods:
+                intervals.append((start if start is not None else -inf, end if end is not None else inf, alert_id))
+
+        self._active_periods = _IntervalTree(intervals) if len(intervals) > 0 else None
+        self._always_active = frozenset(always_active)
+
+        self._starts = sorted(start for start, _, _ in intervals if start != -inf)
+        self._ends = sorted(end for _, end, _ in intervals if end != inf)
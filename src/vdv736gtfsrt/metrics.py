@@ -0,0 +1,325 @@
+import logging
+import threading
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_default_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class _ThreadCells:
+
+    # every thread updates its own preallocated cells, hence no lock is required when a value
+    # is updated, the cells of all threads are only summed up when the metrics are rendered
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._local = threading.local()
+
+        self._cells: dict[threading.Thread, list] = dict()
+        self._retired_cells: list = [0] * size
+        self._lock = threading.Lock()
+
+    def get(self) -> list:
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = [0] * self._size
+            with self._lock:
+                self._cells[threading.current_thread()] = cells
+
+            self._local.cells = cells
+            return cells
+
+    def sum(self) -> list:
+        with self._lock:
+            # merge cells of terminated threads, short living timer threads would let them grow otherwise
+            for thread in [t for t in self._cells.keys() if not t.is_alive()]:
+                for index, value in enumerate(self._cells.pop(thread)):
+                    self._retired_cells[index] += value
+
+            result = list(self._retired_cells)
+            for cells in self._cells.values():
+                for index, value in enumerate(cells):
+                    result[index] += value
+
+        return result
+
+class _CounterChild:
+
+    __slots__ = ('_cells',)
+
+    def __init__(self) -> None:
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._cells.get()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._cells.sum()[0]
+
+class _GaugeChild:
+
+    __slots__ = ('_value',)
+
+    def __init__(self) -> None:
+        self._value: float|None = None
+
+    def set(self, value: float) -> None:
+        # a single assignment does not need a lock
+        self._value = value
+
+    @property
+    def value(self) -> float|None:
+        return self._value
+
+class _HistogramChild:
+
+    __slots__ = ('_buckets', '_cells')
+
+    def __init__(self, buckets: tuple[float]) -> None:
+        self._buckets = buckets
+
+        # one cell per bucket, one for values above the largest bucket and one for the sum
+        self._cells = _ThreadCells(len(buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        cells = self._cells.get()
+        cells[bisect_left(self._buckets, value)] += 1
+        cells[-1] += value
+
+    @property
+    def value(self) -> tuple[list[int], int, float]:
+        cells = self._cells.sum()
+
+        # buckets are rendered cumulative
+        counts = list()
+        count = 0
+        for bucket_count in cells[:-1]:
+            count += bucket_count
+            counts.append(count)
+
+        return counts[:-1], count, cells[-1]
+
+class _MetricFamily(ABC):
+
+    type: str = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._children: dict[tuple, object] = dict()
+        self._lock = threading.Lock()
+
+        if len(self.labelnames) == 0:
+            self._unlabeled = self.labels()
+
+    def labels(self, *labelvalues: str):
+        # existing children are looked up without lock, only new label values are added with lock
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"metric {self.name} requires labels {self.labelnames}")
+
+            with self._lock:
+                child = self._children.setdefault(labelvalues, self._create_child())
+
+        return child
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}"
+        ]
+
+        for labelvalues, child in list(self._children.items()):
+            lines.extend(self._render_child(_format_labels(self.labelnames, labelvalues), child))
+
+        return lines
+
+    @abstractmethod
+    def _create_child(self):
+        pass
+
+    @abstractmethod
+    def _render_child(self, labels: str, child) -> list[str]:
+        pass
+
+class Counter(_MetricFamily):
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1) -> None:
+        self._unlabeled.inc(amount)
+
+    def _create_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def _render_child(self, labels: str, child: _CounterChild) -> list[str]:
+        return [f"{self.name}{{{labels}}} {_format_value(child.value)}" if labels != '' else f"{self.name} {_format_value(child.value)}"]
+
+class Gauge(_MetricFamily):
+
+    type = 'gauge'
+
+    def set(self, value: float) -> None:
+        self._unlabeled.set(value)
+
+    def _create_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def _render_child(self, labels: str, child: _GaugeChild) -> list[str]:
+        # gauges which have never been set are not rendered
+        if child.value is None:
+            return []
+
+        return [f"{self.name}{{{labels}}} {_format_value(child.value)}" if labels != '' else f"{self.name} {_format_value(child.value)}"]
+
+class Histogram(_MetricFamily):
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str] = (), buckets: tuple[float] = _default_buckets) -> None:
+        self.buckets = tuple(sorted(buckets))
+
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float) -> None:
+        self._unlabeled.observe(value)
+
+    def _create_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, labels: str, child: _HistogramChild) -> list[str]:
+        counts, count, total = child.value
+        separator = ',' if labels != '' else ''
+
+        lines = list()
+        for bucket, bucket_count in zip(self.buckets, counts):
+            lines.append(f"{self.name}_bucket{{{labels}{separator}le=\"{_format_value(bucket)}\"}} {bucket_count}")
+
+        lines.append(f"{self.name}_bucket{{{labels}{separator}le=\"+Inf\"}} {count}")
+
+        suffix = f"{{{labels}}}" if labels != '' else ''
+        lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+        lines.append(f"{self.name}_count{suffix} {count}")
+
+        return lines
+
+class MetricsRegistry:
+
+    def __init__(self) -> None:
+        self._metrics: list[_MetricFamily] = list()
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str] = (), buckets: tuple[float] = _default_buckets) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> bytes:
+        # Prometheus text exposition format 0.0.4
+        lines = list()
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def _register(self, metric: _MetricFamily) -> _MetricFamily:
+        if any(m.name == metric.name for m in self._metrics):
+            raise ValueError(f"metric {metric.name} is already registered")
+
+        self._metrics.append(metric)
+
+        return metric
+
+class GtfsRealtimeMetrics(MetricsRegistry):
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.conversion_duration = self.histogram('vdv736gtfsrt_conversion_duration_seconds', 'Time to convert a single situation', ('adapter',))
+        self.conversion_errors = self.counter('vdv736gtfsrt_conversion_errors_total', 'Situations which could not be converted', ('exception',))
+        self.conversion_cache_requests = self.counter('vdv736gtfsrt_conversion_cache_requests_total', 'Situations looked up in the conversion cache', ('result',))
+        self.serialization_duration = self.histogram('vdv736gtfsrt_serialization_duration_seconds', 'Time to serialize entities or feeds', ('stage',))
+        self.delivery_duration = self.histogram('vdv736gtfsrt_delivery_processing_seconds', 'Time to process a delivery of situations')
+        self.feed_size = self.gauge('vdv736gtfsrt_feed_size_bytes', 'Size of the current uncompressed feed')
+        self.feed_entities = self.gauge('vdv736gtfsrt_feed_entities', 'Number of entities in the current feed')
+        self.streaming_clients = self.gauge('vdv736gtfsrt_streaming_clients', 'Connected streaming and long-poll clients')
+        self.streaming_evictions = self.counter('vdv736gtfsrt_streaming_evictions_total', 'Streaming clients disconnected for falling behind the buffer')
+        self.mqtt_messages = self.counter('vdv736gtfsrt_mqtt_messages_total', 'MQTT messages by result', ('result',))
+
+class MetricsListener:
+
+    def __init__(self, metrics: MetricsRegistry, host: str, port: int, endpoint: str = '/metrics') -> None:
+        self._metrics = metrics
+        self._endpoint = endpoint
+
+        self._logger = logging.getLogger()
+
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._server.daemon_threads = True
+
+        self._thread: threading.Thread|None = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='vdv736gtfsrt-metrics', daemon=True)
+        self._thread.start()
+
+        self._logger.info(f"Serving metrics at port {self.port}")
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+
+        self._server.server_close()
+
+    def _create_handler(self) -> type:
+        metrics = self._metrics
+        endpoint = self._endpoint
+
+        class _MetricsRequestHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self) -> None:
+                if self.path.split('?')[0] != endpoint:
+                    self.send_error(404)
+                    return
+
+                content = metrics.render()
+
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args) -> None:
+                # scrapes are not logged
+                pass
+
+        return _MetricsRequestHandler
+
+def _format_labels(labelnames: tuple[str], labelvalues: tuple[str]) -> str:
+    return ','.join(f"{name}=\"{_escape_label_value(value)}\"" for name, value in zip(labelnames, labelvalues))
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+
+    return repr(value) if isinstance(value, float) else str(value)
@@ -1,32 +1,209 @@
+import hashlib
 import logging
 import pytz
+import signal
+import threading
 import time
 import yaml
 
+from vdv736gtfsrt.adapter.cache import ConversionCache
 from vdv736gtfsrt.config import Configuration
+from vdv736gtfsrt.gtfsrt import serialize_feed_entity, serialize_feed_header, serialize_feed_message
+from vdv736gtfsrt.metrics import GtfsRealtimeMetrics, MetricsListener
 from vdv736gtfsrt.repeatedtimer import RepeatedTimer
+from vdv736gtfsrt.streaming import iterparse_situations
+from vdv736gtfsrt.warmstart import WarmStartFile, WarmStartRecord
 
 from datetime import datetime
 from google.transit import gtfs_realtime_pb2
 from google.protobuf.message import DecodeError
-from google.protobuf.json_format import ParseDict
 from math import floor
+from lxml.objectify import ObjectifiedElement
 from paho.mqtt import client
 from paho.mqtt.packettypes import PacketTypes
 from paho.mqtt.properties import Properties
+from typing import BinaryIO, Iterable
 from vdv736.sirixml import get_elements as sirixml_get_elements
 from vdv736.sirixml import get_value as sirixml_get_value
 from vdv736.subscriber import Subscriber
 from vdv736.delivery import SiriDelivery
 
+class PublishPipeline:
+
+    def __init__(self, mqtt: client.Client, qos: int, max_inflight_messages: int, timeout: float = 30.0, metrics: GtfsRealtimeMetrics|None = None) -> None:
+        self._mqtt = mqtt
+        self._qos = qos
+        self._max_inflight_messages = max_inflight_messages
+        self._timeout = timeout
+
+        self._logger = logging.getLogger()
+
+        metrics = metrics if metrics is not None else GtfsRealtimeMetrics()
+        self._published_messages = metrics.mqtt_messages.labels('published')
+        self._confirmed_messages = metrics.mqtt_messages.labels('confirmed')
+        self._failed_messages = metrics.mqtt_messages.labels('failed')
+        self._dropped_messages = metrics.mqtt_messages.labels('dropped')
+
+        # message ID => monotonic time of publication
+        self._inflight: dict[int, float] = dict()
+        self._num_reserved: int = 0
+
+        # confirmations which arrive before publish() has returned the message ID
+        self._early_confirmations: dict[int, client.ReasonCode] = dict()
+
+        self._condition = threading.Condition()
+
+        # messages published before the first connection are queued by paho, but not after a lost connection
+        self._connection_lost: bool = False
+
+        self._start_time: float = time.monotonic()
+        self._num_published: int = 0
+        self._num_confirmed: int = 0
+        self._num_failed: int = 0
+        self._num_dropped: int = 0
+
+        self._mqtt.max_inflight_messages_set(max_inflight_messages)
+        self._mqtt.on_publish = self._on_publish
+        self._mqtt.on_connect = self._on_connect
+        self._mqtt.on_disconnect = self._on_disconnect
+
+    def publish(self, topic: str, payload: bytes, retain: bool, properties: Properties) -> bool:
+        # fail fast while the broker is not reachable, dropped messages are published again with the next delivery
+        with self._condition:
+            if self._connection_lost:
+                self._num_dropped += 1
+                self._dropped_messages.inc()
+                return False
+
+        if self._qos == 0:
+            info = self._mqtt.publish(topic, payload, self._qos, retain, properties)
+            with self._condition:
+                if info.rc == client.MQTT_ERR_SUCCESS:
+                    self._num_published += 1
+                    self._published_messages.inc()
+                    return True
+                else:
+                    self._num_dropped += 1
+                    self._dropped_messages.inc()
+                    self._logger.error(f"Dropped message for {topic}: {client.error_string(info.rc)}")
+                    return False
+        
+        # block the publishing thread as long as the in-flight window is full, but not beyond a lost connection
+        with self._condition:
+            if not self._condition.wait_for(lambda: len(self._inflight) + self._num_reserved < self._max_inflight_messages or self._connection_lost, self._timeout):
+                self._num_dropped += 1
+                self._dropped_messages.inc()
+                self._logger.error(f"Dropped message for {topic}: no confirmation of {len(self._inflight)} in-flight messages within {self._timeout} seconds")
+                return False
+            
+            if self._connection_lost:
+                self._num_dropped += 1
+                self._dropped_messages.inc()
+                return False
+
+            self._num_reserved += 1
+
+        info = self._mqtt.publish(topic, payload, self._qos, retain, properties)
+
+        with self._condition:
+            self._num_reserved -= 1
+
+            # messages published while disconnected are sent by paho after reconnecting
+            if info.rc not in (client.MQTT_ERR_SUCCESS, client.MQTT_ERR_NO_CONN):
+                self._num_dropped += 1
+                self._dropped_messages.inc()
+                self._logger.error(f"Dropped message for {topic}: {client.error_string(info.rc)}")
+                self._condition.notify_all()
+
+                return False
+            
+            self._num_published += 1
+            self._published_messages.inc()
+            
+            if info.mid in self._early_confirmations:
+                self._confirm(self._early_confirmations.pop(info.mid))
+                self._condition.notify_all()
+            else:
+                self._inflight[info.mid] = time.monotonic()
+
+            return True
+        
+    def flush(self, timeout: float) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self._inflight) == 0, timeout)
+    
+    @property
+    def statistics(self) -> dict:
+        with self._condition:
+            duration = time.monotonic() - self._start_time
+
+            return {
+                'published': self._num_published,
+                'confirmed': self._num_confirmed,
+                'failed': self._num_failed,
+                'dropped': self._num_dropped,
+                'inflight': len(self._inflight),
+                'throughput': self._num_confirmed / duration if duration > 0 else 0.0
+            }
+
+    def _on_publish(self, mqtt: client.Client, userdata, mid: int, reason_code: client.ReasonCode, properties: Properties) -> None:
+        # QoS 0 messages are not confirmed by the broker
+        if self._qos == 0:
+            return
+        
+        with self._condition:
+            if mid in self._inflight:
+                del self._inflight[mid]
+
+                self._confirm(reason_code)
+                self._condition.notify_all()
+            else:
+                self._early_confirmations[mid] = reason_code
+
+    def _on_connect(self, mqtt: client.Client, userdata, flags: client.ConnectFlags, reason_code: client.ReasonCode, properties: Properties) -> None:
+        if reason_code.is_failure:
+            return
+
+        with self._condition:
+            if self._connection_lost:
+                self._logger.info('Reconnected to broker')
+
+            self._connection_lost = False
+
+    def _on_disconnect(self, mqtt: client.Client, userdata, flags: client.DisconnectFlags, reason_code: client.ReasonCode, properties: Properties) -> None:
+        if reason_code.is_failure:
+            self._logger.error(f"Lost connection to broker: {reason_code}, dropping messages until reconnected")
+
+        # wake up publishing threads waiting for the in-flight window
+        with self._condition:
+            self._connection_lost = True
+            self._condition.notify_all()
+
+    def _confirm(self, reason_code: client.ReasonCode) -> None:
+        if reason_code.is_failure:
+            self._num_failed += 1
+            self._failed_messages.inc()
+            self._logger.error(f"Broker rejected message: {reason_code}")
+        else:
+            self._num_confirmed += 1
+            self._confirmed_messages.inc()
+
 class GtfsRealtimePublisher:
 
-    def __init__(self, config_filename: str, host: str, port: str, username: str, password: str, topic: str, client_id: str, expiration: int) -> None:
+    def __init__(self, config_filename: str, host: str, port: str, username: str, password: str, topic: str, client_id: str, expiration: int, keepalive: int|None = None, qos: int = 1, max_inflight_messages: int = 20) -> None:
         self._expiration: int = expiration
 
-        self._last_processed_index: dict = dict()
+        # unchanged alerts are published again after this interval, it must be shorter
+        # than the message expiration, otherwise retained alerts expire at the broker
+        self._keepalive: int = keepalive if keepalive is not None else expiration // 2
+
+        # alert ID => (topic, alert, digest of the serialized alert, monotonic time of last publication)
+        self._last_processed_index: dict[str, tuple[str, gtfs_realtime_pb2.FeedEntity, bytes, float]] = dict()
 
-        self._run: bool = True
+        self._num_published_messages: int = 0
+        self._num_skipped_messages: int = 0
+
+        self._quit_event: threading.Event = threading.Event()
         
         # create internal logger instance
         logging.basicConfig(format="[%(levelname)s] %(asctime)s %(message)s", level=logging.INFO)
@@ -73,6 +250,25 @@ class GtfsRealtimePublisher:
             self._adapter = EmsAdapter(self._config)
         else:
             raise ValueError(f"unknown adapter type {self._config['app']['adapter']['type']}")
+        
+        # metrics are always collected, but only exposed if enabled
+        self._metrics = GtfsRealtimeMetrics()
+        self._metrics_listener: MetricsListener|None = None
+
+        # changed situations of large deliveries can be converted in multiple processes
+        self._conversion_cache = ConversionCache(self._adapter, self._config, self._config['app']['conversion_workers'], self._metrics)
+
+        # streamed situations are converted one by one, unless there are conversion workers which
+        # need larger batches, see ConversionCache.convert_all for the minimum number of parallel conversions
+        num_conversion_workers = self._config['app']['conversion_workers']
+        self._stream_batch_size: int = 1 if num_conversion_workers == 0 else 64 * num_conversion_workers
+
+        # published alerts are restored on startup, so that alerts removed in the meantime are deleted nevertheless
+        if self._config['app']['warm_start_enabled'] == True:
+            self._warm_start_file = WarmStartFile(self._config['warm_start']['warm_start_filename'])
+            self._restore_warm_start()
+        else:
+            self._warm_start_file = None
 
         # connecto to MQTT broker as defined in config
         topic = topic.replace('+', '_')
@@ -89,6 +285,8 @@ class GtfsRealtimePublisher:
         if username is not None and password is not None:
             self._mqtt.username_pw_set(username=username, password=password)
 
+        self._publish_pipeline = PublishPipeline(self._mqtt, qos, max_inflight_messages, metrics=self._metrics)
+
         self._mqtt.connect(self._mqtt_host, self._mqtt_port)
         self._mqtt.loop_start()
 
@@ -96,56 +294,100 @@ class GtfsRealtimePublisher:
         
         # set datalog directory
         datalog = './datalog' if self._config['app']['datalog_enabled'] else None
+
+        # terminate gracefully on SIGTERM and SIGINT, signal handlers can only be set in the main thread
+        previous_signal_handlers: dict = dict()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                previous_signal_handlers[signum] = signal.signal(signum, self._signal_handler)
+
+        # there's no webserver in MQTT mode, hence metrics are served by a separate listener
+        if self._config['app']['metrics_enabled'] == True:
+            self._metrics_listener = MetricsListener(
+                self._metrics, 
+                self._config['metrics']['metrics_listener_host'], 
+                int(self._config['metrics']['metrics_listener_port']), 
+                self._config['metrics']['metrics_endpoint']
+            )
+
+            self._metrics_listener.start()
         
-        if self._config['app']['pattern'] == 'publish/subscribe':
-            
-            # start subscriber with publish/subscribe mode
-            with Subscriber(self._config['app']['subscriber'], self._config['app']['participants'], datalog_directory=datalog) as subscriber:
-                self._subscriber = subscriber
-                self._subscriber.set_callbacks(self._subscriber_on_delivery)
+        try:
+            if self._config['app']['pattern'] == 'publish/subscribe':
                 
-                self._subscriber_status_timer = RepeatedTimer(self._config['app']['data_update_interval'], self._subscriber_status_request)
-                self._subscriber_status_timer.start()
+                # start subscriber with publish/subscribe mode
+                with Subscriber(self._config['app']['subscriber'], self._config['app']['participants'], datalog_directory=datalog) as subscriber:
+                    self._subscriber = subscriber
+                    self._subscriber.set_callbacks(self._subscriber_on_delivery)
+                    
+                    self._subscriber_status_timer = RepeatedTimer(self._config['app']['data_update_interval'], self._subscriber_status_request)
+                    self._subscriber_status_timer.start()
+                    
+                    # block without consuming CPU until quit() is called
+                    try:
+                        self._quit_event.wait()
+                    finally:
+                        self._subscriber_status_timer.stop()
+
+            elif self._config['app']['pattern'] == 'request/response':
                 
-                try:
-                    while self._run:
-                        pass
-                except KeyboardInterrupt:
-                    pass
+                # start subscriber using request/response mode
+                with Subscriber(self._config['app']['subscriber'], self._config['app']['participants'], publish_subscribe=False, datalog_directory=datalog) as subscriber:
+                    self._subscriber = subscriber
+                    self._subscriber.set_callbacks(self._subscriber_on_delivery)
+
+                    self._data_update_timer = RepeatedTimer(self._config['app']['data_update_interval'], self._subscriber_direct_request)
+                    self._data_update_timer.start_immediately()
+
+                    # block without consuming CPU until quit() is called
+                    try:
+                        self._quit_event.wait()
+                    finally:
+                        self._data_update_timer.stop()
+
+            else:
+                raise ValueError(f"Unknown subscriber pattern {self._config['app']['pattern']}!")
+            
+        finally:
+            for signum, handler in previous_signal_handlers.items():
+                signal.signal(signum, handler)
 
-                self._subscriber_status_timer.stop()
+            self.close()
 
-                # we don't want a re-connection here, so stop the event loop before disconnection
-                self._mqtt.loop_stop()
-                self._mqtt.disconnect()
+            if self._metrics_listener is not None:
+                self._metrics_listener.stop()
+                self._metrics_listener = None
 
-        elif self._config['app']['pattern'] == 'request/response':
-            
-            # start subscriber using request/response mode
-            with Subscriber(self._config['app']['subscriber'], self._config['app']['participants'], publish_subscribe=False, datalog_directory=datalog) as subscriber:
-                self._subscriber = subscriber
-                self._subscriber.set_callbacks(self._subscriber_on_delivery)
+    def quit(self) -> None:
+        self._quit_event.set()
 
-                self._data_update_timer = RepeatedTimer(self._config['app']['data_update_interval'], self._subscriber_direct_request)
-                self._data_update_timer.start_immediately()
+    def flush(self, timeout: float) -> bool:
+        # waits until all published messages have been confirmed by the broker
+        return self._publish_pipeline.flush(timeout)
 
-                try:
-                    while self._run:
-                        pass
-                except KeyboardInterrupt:
-                    pass
+    def close(self, timeout: float = 5) -> None:
+        # wait for outstanding confirmations of the broker
+        if not self.flush(timeout):
+            self._logger.error('Terminating with unconfirmed messages')
 
-                self._data_update_timer.stop()
-                
-                # we don't want a re-connection here, so stop the event loop before disconnection
-                self._mqtt.loop_stop()
-                self._mqtt.disconnect()
+        # disconnect before stopping the event loop, as loop_stop() waits for
+        # unconfirmed messages otherwise, disconnecting also prevents a re-connection
+        self._mqtt.disconnect()
+        self._mqtt.loop_stop()
 
-        else:
-            raise ValueError(f"Unknown subscriber pattern {self._config['app']['pattern']}!")
+        self._conversion_cache.close()
 
-    def quit(self) -> None:
-        self._run = False
+    @property
+    def num_published_messages(self) -> int:
+        return self._num_published_messages
+    
+    @property
+    def num_skipped_messages(self) -> int:
+        return self._num_skipped_messages
+
+    def _signal_handler(self, signum, frame) -> None:
+        self._logger.info(f"Received signal {signal.Signals(signum).name}, shutting down GtfsRealtimePublisher")
+        self.quit()
         
     def _subscriber_status_request(self) -> None:
         if self._subscriber is not None:
@@ -155,85 +397,165 @@ class GtfsRealtimePublisher:
         if self._subscriber is not None:
             self._subscriber.request(self._config['app']['publisher'])
 
+    def process_delivery_stream(self, source: bytes|str|BinaryIO) -> None:
+        # situations of large deliveries are processed while parsing, so that 
+        # only a single batch of situations is kept in memory at the same time
+        batch_size = self._stream_batch_size
+        self._process_situations(iterparse_situations(source, batch_size))
+
     def _subscriber_on_delivery(self, siri_delivery: SiriDelivery) -> None:
+        situations = list(sirixml_get_elements(siri_delivery, 'Siri.ServiceDelivery.SituationExchangeDelivery.Situations.PtSituationElement'))
+        self._process_situations([situations])
+
+    def _process_situations(self, situation_batches: Iterable[list[ObjectifiedElement]]) -> None:
+        start = time.perf_counter()
+
         timestamp = datetime.now().astimezone(pytz.timezone(self._config['app']['timezone'])).timestamp()
         timestamp = floor(timestamp)
+
+        # the header is the same for all alerts of this delivery, hence it is encoded only once
+        feed_header = gtfs_realtime_pb2.FeedHeader()
+        feed_header.gtfs_realtime_version = '2.0'
+        feed_header.incrementality = gtfs_realtime_pb2.FeedHeader.DIFFERENTIAL
+        feed_header.timestamp = timestamp
+
+        serialized_header = serialize_feed_header(feed_header)
         
-        processed_index: list = list()
-        for situation in sirixml_get_elements(siri_delivery, 'Siri.ServiceDelivery.SituationExchangeDelivery.Situations.PtSituationElement'):
-            alert_id = sirixml_get_value(situation, 'SituationNumber')
+        num_published_messages: int = 0
+        num_skipped_messages: int = 0
+        num_failed_messages: int = 0
 
-            # generate MQTT topic from placeholders
-            # remove leading / if present, see #6 for reference
-            topic = self._topic
-            topic = topic.replace('[alertId]', alert_id)
+        processed_index: set = set()
+        for situations in situation_batches:
 
-            if topic.startswith('/'):
-                topic = topic[1:]
-            
-            # generate feed message containing a single alert
-            feed_message = dict()
-            feed_message['header'] = {
-                'gtfs_realtime_version': '2.0',
-                'incrementality': 'DIFFERENTIAL',
-                'timestamp': timestamp
-            }
+            # convert all situations of a batch at once, unchanged situations are not converted again
+            conversions = self._conversion_cache.convert_all(situations)
+
+            for situation, conversion in zip(situations, conversions):
+                alert_id = sirixml_get_value(situation, 'SituationNumber')
 
-            feed_message['entity'] = list()
+                # generate MQTT topic from placeholders
+                # remove leading / if present, see #6 for reference
+                topic = self._topic
+                topic = topic.replace('[alertId]', alert_id)
+
+                if topic.startswith('/'):
+                    topic = topic[1:]
             
-            # convert to PBF message and publish
-            try:
-                conversion: tuple[dict, bool] = self._adapter.convert(situation)
-                alert, is_closing = conversion
-
-                if alert is not None:
-                    feed_message['entity'].append(alert)
-
-                    # special handling for closing situations
-                    # see #26 for more information
-                    if is_closing:                
-                        # set effect to NO_EFFECT and delete end timestamps of active periods in order to make consuming systems
-                        # to show up the final message without affecting the trip planning system
-                        # see #26 for more information
-                        feed_message['entity'][0]['alert']['effect'] = 'NO_EFFECT'
-                        for active_period in feed_message['entity'][0]['alert']['active_period']:
-                            if 'end' in active_period:
-                                del active_period['end']
-                    
-                    # finally publish alert object
-                    self._logger.info(f"Published alert {alert_id}")
-                    self._publish_feed_message(topic, feed_message)
+                # convert to PBF message and publish
+                try:
+                    if isinstance(conversion, Exception):
+                        raise conversion
+                
+                    alert, is_closing = conversion
+
+                    if alert is not None:
+                        serialized_alert = self._conversion_cache.serialized(alert.id)
+                        digest = hashlib.sha256(serialized_alert).digest()
+
+                        processed_index.add(alert_id)
+
+                        # skip alerts which have been published with the same content recently
+                        if alert_id in self._last_processed_index:
+                            _, _, last_digest, last_published = self._last_processed_index[alert_id]
+                            if last_digest == digest and time.monotonic() - last_published < self._keepalive:
+                                num_skipped_messages += 1
+                                continue
+
+                        # generate feed message containing a single alert out of the already serialized entity
+                        serialization_start = time.perf_counter()
+                        feed_message = serialize_feed_message(serialized_header, [serialized_alert])
+                        self._metrics.serialization_duration.labels('message').observe(time.perf_counter() - serialization_start)
                     
-                    self._last_processed_index[alert_id] = (topic, feed_message)
+                        # finally publish alert object, failed alerts are published again with the next delivery
+                        if not self._publish_feed_message(topic, feed_message):
+                            num_failed_messages += 1
+                            continue
 
-                    processed_index.append(alert_id)
+                        self._logger.info(f"Published alert {alert_id}")
+                        self._last_processed_index[alert_id] = (topic, alert, digest, time.monotonic())
 
-            except Exception as ex:
-                self._logger.error(ex)
+                        num_published_messages += 1
+
+                except Exception as ex:
+                    self._logger.error(ex)
 
         # build difference between closing_situation_index and processed_situation_index
         # see #26 for more information
         diff: list = [id for id in self._last_processed_index.keys() if id not in processed_index]
         for id in diff:
-            entry: tuple[str, dict] = self._last_processed_index[id]
-            topic, feed_message = entry
+            topic, alert, _, _ = self._last_processed_index[id]
 
-            feed_message['entity'][0]['is_deleted'] = True
+            # copy the converted alert, as it is shared with the conversion cache
+            deleted_alert = gtfs_realtime_pb2.FeedEntity()
+            deleted_alert.CopyFrom(alert)
+            deleted_alert.is_deleted = True
 
-            self._publish_feed_message(topic, feed_message)
+            # the alert is kept until its deletion has been published
+            if not self._publish_feed_message(topic, serialize_feed_message(serialized_header, [serialize_feed_entity(deleted_alert)])):
+                num_failed_messages += 1
+                continue
+
+            self._logger.info(f"Sent deleted alert {id}")
 
             del self._last_processed_index[id]
-    
-    def _publish_feed_message(self, topic: str, feed_message: dict) -> None:
+            self._conversion_cache.evict(id)
+
+            num_published_messages += 1
+
+        self._num_published_messages += num_published_messages
+        self._num_skipped_messages += num_skipped_messages
 
-        if 'is_deleted' in feed_message['entity'][0] and feed_message['entity'][0]['is_deleted']:
-            self._logger.info(f"Sending deleted alert {feed_message['entity'][0]['id']}")
+        if self._warm_start_file is not None and num_published_messages > 0:
+            self._write_warm_start()
 
-        pbf_object = gtfs_realtime_pb2.FeedMessage()
-        ParseDict(feed_message, pbf_object)
+        self._metrics.mqtt_messages.labels('skipped').inc(num_skipped_messages)
+        self._metrics.feed_entities.set(len(self._last_processed_index))
+        self._metrics.delivery_duration.observe(time.perf_counter() - start)
 
+        self._logger.info(f"Processed delivery with {num_published_messages} published, {num_skipped_messages} unchanged and {num_failed_messages} failed alerts")
+        
+        statistics = self._publish_pipeline.statistics
+        self._logger.info(f"Messages confirmed: {statistics['confirmed']}, failed: {statistics['failed']}, dropped: {statistics['dropped']}, in-flight: {statistics['inflight']}")
+    
+    def _write_warm_start(self) -> None:
+        # the time of the last publication is stored as wall-clock time, as monotonic times are not valid after a restart
+        offset = time.time() - time.monotonic()
+
+        records = list()
+        for alert_id, (topic, alert, _, last_published) in self._last_processed_index.items():
+            records.append(WarmStartRecord(alert_id, serialize_feed_entity(alert), topic.encode('utf-8'), 0, last_published + offset))
+
+        try:
+            self._warm_start_file.write(records)
+        except OSError as ex:
+            self._logger.error(f"Failed to write warm start file {self._warm_start_file.filename}: {ex}")
+
+    def _restore_warm_start(self) -> None:
+        try:
+            warm_start = self._warm_start_file.read()
+        except (OSError, ValueError) as ex:
+            self._logger.error(f"Failed to read warm start file {self._warm_start_file.filename}: {ex}")
+            return
+        
+        if warm_start is None:
+            return
+        
+        offset = time.time() - time.monotonic()
+        for record in warm_start.records:
+            try:
+                alert = gtfs_realtime_pb2.FeedMessage.FromString(record.serialized_entity).entity[0]
+            except DecodeError as ex:
+                self._logger.error(ex)
+                continue
+
+            digest = hashlib.sha256(record.serialized_entity).digest()
+            self._last_processed_index[record.alert_id] = (record.data.decode('utf-8'), alert, digest, record.timestamp - offset)
+
+        self._logger.info(f"Restored {len(self._last_processed_index)} published alerts from warm start file {self._warm_start_file.filename}")
+    
+    def _publish_feed_message(self, topic: str, feed_message: bytes) -> bool:
         properties = Properties(PacketTypes.PUBLISH)
         properties.MessageExpiryInterval = self._expiration
 
-        self._mqtt.publish(topic, pbf_object.SerializeToString(), 0, True, properties)
-                
\ No newline at end of file
+        return self._publish_pipeline.publish(topic, feed_message, True, properties)
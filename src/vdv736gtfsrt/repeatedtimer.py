@@ -26,5 +26,7 @@ class RepeatedTimer(object):
             self.is_running = True
     
     def stop(self):
-        self._timer.cancel()
+        if self._timer is not None:
+            self._timer.cancel()
+            
         self.is_running = False
\ No newline at end of file
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+
+from concurrent.futures import ThreadPoolExecutor
+from math import floor
+from typing import Callable
+
+class ScheduledJob:
+
+    def __init__(self, name: str, interval: float, function: Callable[[], bool|None], immediately: bool, overlap_policy: str, jitter: float, max_backoff: float|None) -> None:
+        self.name = name
+        self.interval = interval
+        self.function = function
+        self.immediately = immediately
+        self.overlap_policy = overlap_policy
+        self.jitter = jitter
+
+        # the backoff is never shorter than the regular interval
+        self.max_backoff = max(max_backoff, interval) if max_backoff is not None else None
+
+        self.num_runs: int = 0
+        self.num_skipped_runs: int = 0
+        self.num_failures: int = 0
+
+        self._task: asyncio.Task|None = None
+
+    @property
+    def backoff(self) -> float:
+        if self.num_failures == 0:
+            return 0.0
+
+        backoff = self.interval * 2 ** self.num_failures
+        if self.max_backoff is not None:
+            backoff = min(backoff, self.max_backoff)
+
+        return backoff
+
+class AsyncScheduler:
+
+    def __init__(self, max_workers: int = 1) -> None:
+        # blocking functions run in a bounded thread pool, so that they can not block the event loop
+        # and slow functions can not create an arbitrary number of threads
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vdv736gtfsrt-scheduler')
+        self._jobs: list[ScheduledJob] = list()
+
+        # one-time runs, see schedule_once
+        self._loop: asyncio.AbstractEventLoop|None = None
+        self._pending_runs: dict[str, asyncio.TimerHandle] = dict()
+        self._running_tasks: set[asyncio.Task] = set()
+
+        self._logger = logging.getLogger('uvicorn')
+
+    def schedule(self, name: str, interval: float, function: Callable[[], bool|None], immediately: bool = False, overlap_policy: str = 'skip', jitter: float = 0.0, max_backoff: float|None = None) -> ScheduledJob:
+        if interval <= 0:
+            raise ValueError(f"invalid interval {interval} for job {name}")
+
+        if overlap_policy not in ['skip', 'queue']:
+            raise ValueError(f"unknown overlap policy {overlap_policy} for job {name}")
+
+        job = ScheduledJob(name, interval, function, immediately, overlap_policy, jitter, max_backoff)
+        self._jobs.append(job)
+
+        return job
+
+    def schedule_once(self, name: str, delay: float, function: Callable[[], bool|None]) -> None:
+        # can be called from any thread, a pending run with the same name is replaced
+        if self._loop is None:
+            return
+        
+        try:
+            self._loop.call_soon_threadsafe(self._schedule_once, name, delay, function)
+        except RuntimeError:
+            # the event loop has been closed already
+            pass
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+
+        for job in self._jobs:
+            if job._task is None:
+                job._task = asyncio.create_task(self._run_job(job), name=job.name)
+
+    async def stop(self) -> None:
+        for handle in self._pending_runs.values():
+            handle.cancel()
+
+        self._pending_runs.clear()
+        self._loop = None
+
+        tasks = [job._task for job in self._jobs if job._task is not None] + list(self._running_tasks)
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for job in self._jobs:
+            job._task = None
+
+        # functions which are running already can not be interrupted, they're finished in background
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_job(self, job: ScheduledJob) -> None:
+        loop = asyncio.get_running_loop()
+
+        # runs are scheduled at fixed ticks from the origin instead of waiting the interval
+        # after each run, so the schedule does not drift by the runtime of the function
+        origin = loop.time()
+        tick = 0 if job.immediately else 1
+
+        while True:
+            delay = origin + tick * job.interval - loop.time()
+
+            # jitter is added to every single run and does not accumulate
+            if job.jitter > 0:
+                delay += random.uniform(0, job.jitter)
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # the next run is not started before this run has finished, so runs never overlap
+            succeeded = await self._execute(job)
+
+            now = loop.time()
+            if not succeeded:
+                job.num_failures += 1
+
+                # restart the schedule after waiting for the backoff
+                self._logger.warning(f"Job {job.name} failed {job.num_failures} time(s), retrying in {job.backoff:.0f} seconds")
+
+                origin = now + job.backoff
+                tick = 0
+
+                continue
+
+            job.num_failures = 0
+
+            # check for ticks which have passed while the function was running
+            next_tick = floor((now - origin) / job.interval) + 1
+            num_missed_ticks = next_tick - tick - 1
+
+            if num_missed_ticks > 0:
+                if job.overlap_policy == 'queue':
+                    # run once again immediately, multiple missed ticks are merged into this run
+                    job.num_skipped_runs += num_missed_ticks - 1
+                    next_tick = next_tick - 1
+                else:
+                    job.num_skipped_runs += num_missed_ticks
+
+                self._logger.warning(f"Job {job.name} took longer than its interval of {job.interval} seconds")
+
+            tick = next_tick
+
+    def _schedule_once(self, name: str, delay: float, function: Callable[[], bool|None]) -> None:
+        if self._loop is None:
+            return
+        
+        handle = self._pending_runs.pop(name, None)
+        if handle is not None:
+            handle.cancel()
+
+        self._pending_runs[name] = self._loop.call_later(max(0.0, delay), self._run_once, name, function)
+
+    def _run_once(self, name: str, function: Callable[[], bool|None]) -> None:
+        del self._pending_runs[name]
+
+        task = self._loop.create_task(self._call(name, function), name=name)
+        
+        self._running_tasks.add(task)
+        task.add_done_callback(self._running_tasks.discard)
+
+    async def _execute(self, job: ScheduledJob) -> bool:
+        try:
+            return await self._call(job.name, job.function)
+        finally:
+            job.num_runs += 1
+
+    async def _call(self, name: str, function: Callable[[], bool|None]) -> bool:
+        loop = asyncio.get_running_loop()
+
+        try:
+            result = await loop.run_in_executor(self._executor, function)
+        except Exception as ex:
+            self._logger.error(f"Job {name} raised an exception: {ex}")
+            result = False
+
+        # functions without return value are considered as successful
+        return result is not False
@@ -1,26 +1,45 @@
-import json
+import importlib.util
 import logging
 import pytz
+import threading
+import time
 import yaml
 
 from contextlib import asynccontextmanager
 from datetime import datetime
+from email.utils import formatdate
+from email.utils import parsedate_to_datetime
 from fastapi import APIRouter
 from fastapi import FastAPI
 from fastapi import Request
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 from google.transit import gtfs_realtime_pb2
-from google.protobuf.message import DecodeError
-from google.protobuf.json_format import ParseDict
+from lxml.etree import tostring
+from lxml.objectify import fromstring
 from math import floor
+from typing import Iterable
+from vdv736.delivery import SiriDelivery
+from vdv736.sirixml import get_value as sirixml_get_value
 from vdv736.subscriber import Subscriber
 
+from .adapter.base import BaseAdapter
+from .adapter.cache import ConversionCache
+from .broadcast import FeedBroadcaster
+from .broadcast import format_event
+from .changelog import ChangeLog
 from .config import Configuration
-from .repeatedtimer import RepeatedTimer
+from .index import InformedEntityIndex
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .metrics import GtfsRealtimeMetrics
+from .scheduler import AsyncScheduler
+from .snapshot import FeedSnapshot
+from .warmstart import WarmStartFile
+from .warmstart import WarmStartRecord
 
 class GtfsRealtimeServer:
 
-    def __init__(self, config_filename: str) -> None:
+    def __init__(self, config_filename: str, subscriber=None) -> None:
     
         # load config and set default values
         with open(config_filename, 'r') as config_file:
@@ -63,6 +82,12 @@ class GtfsRealtimeServer:
         else:
             raise ValueError(f"unknown adapter type {self._config['app']['adapter']['type']}")
 
+        # metrics are always collected, but only exposed if enabled
+        self._metrics = GtfsRealtimeMetrics()
+
+        # changed situations of large deliveries can be converted in multiple processes
+        self._conversion_cache = ConversionCache(self._adapter, self._config, self._config['app']['conversion_workers'], self._metrics)
+
         # create API instance
         self._fastapi = FastAPI(lifespan=self._lifespan)
         self._api_router = APIRouter()
@@ -73,22 +98,81 @@ class GtfsRealtimeServer:
             methods=['GET']
         )
 
-        # enable chaching if configured
-        if 'caching_enabled' in self._config['app'] and self._config['app']['caching_enabled'] == True:
-            import memcache
-
-            self._cache = memcache.Client([self._config['caching']['caching_server_endpoint']], debug=0)
-            self._cache_ttl = self._config['caching']['caching_server_ttl_seconds']
+        if self._config['app']['differential_enabled'] == True:
+            self._api_router.add_api_route(
+                self._config['differential']['differential_endpoint'], 
+                endpoint=self._differential_endpoint, 
+                methods=['GET']
+            )
+
+        if self._config['app']['streaming_enabled'] == True:
+            self._api_router.add_api_route(
+                self._config['streaming']['streaming_endpoint'], 
+                endpoint=self._streaming_endpoint, 
+                methods=['GET']
+            )
+
+        if self._config['app']['metrics_enabled'] == True:
+            self._api_router.add_api_route(
+                self._config['metrics']['metrics_endpoint'], 
+                endpoint=self._metrics_endpoint, 
+                methods=['GET']
+            )
+
+        # enable pre-compressed responses if configured
+        if self._config['app']['compression_enabled'] == True:
+            self._encodings = ['gzip']
+
+            if self._config['compression']['compression_brotli_enabled'] == True:
+                # brotli is an optional dependency, which is only imported when compressing the feed
+                if importlib.util.find_spec('brotli') is None:
+                    raise ImportError("brotli compression requires the package 'brotli'")
+
+                self._encodings.insert(0, 'br')
         else:
-            self._cache = None
+            self._encodings = []
 
         # create logger instance
         self._logger = logging.getLogger('uvicorn')
 
-        # class container for subscriber
-        self._subscriber = None
-        self._subscriber_status_timer = None
-        self._subscriber_data_update_timer = None
+        # responses are served out of the pre-rendered snapshot, a separate response cache is not used anymore
+        if self._config['app'].get('caching_enabled') == True:
+            self._logger.warning('The key app.caching_enabled is obsolete and ignored, responses are served out of the pre-rendered feed snapshot')
+
+        # class container for subscriber, any object providing get_situations() can be passed 
+        # for rendering feeds without lifespan, e.g. in benchmarks, it is replaced when the app starts
+        self._subscriber = subscriber
+        self._scheduler: AsyncScheduler|None = None
+
+        # current pre-rendered feed, replaced as a whole whenever the situations change
+        self._feed_snapshot: FeedSnapshot|None = None
+        self._feed_snapshot_lock = threading.Lock()
+
+        # the last good feed is served while the publisher is unreachable, see _set_feed_state
+        self._feed_refreshed_at: float = time.monotonic()
+        self._feed_stale: bool = False
+
+        # changes of the published alerts for the differential feed
+        self._change_log = ChangeLog(self._config['differential']['differential_max_versions'])
+
+        # changes are pushed to streaming and long-poll clients if enabled
+        if self._config['app']['streaming_enabled'] == True:
+            self._broadcaster = FeedBroadcaster(self._config['streaming']['streaming_buffer_size'], self._config['streaming']['streaming_max_clients'])
+        else:
+            self._broadcaster = None
+
+        # the last known situations and alerts are restored on startup if enabled, see _restore_warm_start
+        if self._config['app']['warm_start_enabled'] == True:
+            self._warm_start_file = WarmStartFile(self._config['warm_start']['warm_start_filename'])
+        else:
+            self._warm_start_file = None
+
+        self._restored_situations: dict|None = None
+
+        # the warm start file is written outside _feed_snapshot_lock, writes of outdated snapshots are skipped
+        self._warm_start_lock = threading.Lock()
+        self._warm_start_sequence: int = 0
+        self._warm_start_written: int = 0
 
     @asynccontextmanager
     async def _lifespan(self, app):
@@ -101,21 +185,33 @@ class GtfsRealtimeServer:
             # start subscriber using publish/subscribe mode
             with Subscriber(self._config['app']['subscriber'], self._config['app']['participants'], datalog_directory=datalog) as subscriber:
                 self._subscriber = subscriber
+                self._subscriber.set_callbacks(self._subscriber_on_delivery)
+
+                # schedule subscriber's status requests, the scheduler runs before the initial 
+                # feed is rendered in order to schedule changes of the publication window
+                self._scheduler = self._create_scheduler()
+                self._schedule(self._scheduler, 'status_request', self._config['app']['status_request_interval'], self._subscriber_status_request, False)
+                self._scheduler.start()
+
+                # render initial feed out of the situations already known or restored from the last run
+                self._restore_warm_start()
+                self._start_broadcaster()
+
+                self._update_feed_snapshot()
 
                 # subscribe at the defined publisher
                 self._subscriber.subscribe(self._config['app']['publisher'])
 
-                # start internal repeated timer for subscriber's status requests
-                self._subscriber_status_timer = RepeatedTimer(self._config['app']['status_request_interval'], self._subscriber_status_request)
-                self._subscriber_status_timer.start()
-
                 # wait here for GtfsRealtimeServer server's termination
                 yield
 
                 self._logger.info('Shutting down GtfsRealtimeServer')
 
-                # terminate subscribers status timer
-                self._subscriber_status_timer.stop()
+                # terminate subscribers status requests and running streams
+                await self._scheduler.stop()
+                self._stop_broadcaster()
+
+                self.close()
 
                 # all subscriptions will terminate while exiting the context of 
                 # the subscriber - no need to do anything else here
@@ -126,97 +222,602 @@ class GtfsRealtimeServer:
             with Subscriber(self._config['app']['subscriber'], self._config['app']['participants'], publish_subscribe=False, datalog_directory=datalog) as subscriber:
                 self._subscriber = subscriber
 
-                # start internal repeated timer for subscriber's data direct request
-                self._subscriber_data_update_timer = RepeatedTimer(self._config['app']['data_update_interval'], self._subscriber_direct_request)
-                self._subscriber_data_update_timer.start_immediately()
+                # schedule subscriber's data direct requests, starting immediately
+                self._scheduler = self._create_scheduler()
+                self._schedule(self._scheduler, 'data_update', self._config['app']['data_update_interval'], self._subscriber_direct_request, True)
+                self._scheduler.start()
+
+                # render initial feed out of the situations already known or restored from the last run
+                self._restore_warm_start()
+                self._start_broadcaster()
+
+                self._update_feed_snapshot()
 
                 # wait here for GtfsRealtimeServer server's termination
                 yield
 
                 self._logger.info('Shutting down GtfsRealtimeServer')
 
-                # terminate subscribers status timer
-                self._subscriber_data_update_timer.stop()
+                # terminate subscribers data direct requests and running streams
+                await self._scheduler.stop()
+                self._stop_broadcaster()
+
+                self.close()
 
         else:
             raise ValueError(f"Unknown subscriber pattern {self._config['app']['pattern']}!")
 
     async def _endpoint(self, request: Request) -> Response:
         
-        # check whether there're cached data
         format = 'json' if 'debug' in request.query_params else 'pbf'
+        mime_type = 'application/json' if format == 'json' else 'application/octet-stream'
+
+        # sub-feeds filtered by informed entities or active time
+        try:
+            filters, active_at, filter_key = self._parse_filters(request)
+        except ValueError as ex:
+            return Response(content=str(ex), status_code=400)
+
+        feed_snapshot = self._feed_snapshot
+
+        # filtered feeds are rendered per request and not pre-compressed
+        if filter_key is None:
+            encoding = self._negotiate_encoding(request.headers.get('accept-encoding', ''), feed_snapshot.encodings)
+        else:
+            encoding = None
+
+        headers = {
+            'ETag': feed_snapshot.etag(format, encoding, filter_key),
+            'Last-Modified': formatdate(feed_snapshot.last_modified, usegmt=True)
+        }
+
+        if not self._check_feed_age(headers):
+            return Response(status_code=503, headers={'Retry-After': str(self._feed_update_interval())})
+
+        if len(feed_snapshot.encodings) > 0 and filter_key is None:
+            headers['Vary'] = 'Accept-Encoding'
+
+        # answer conditional requests without sending the feed again
+        if self._is_not_modified(request, headers['ETag'], feed_snapshot.last_modified):
+            return Response(status_code=304, headers=headers)
+        
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+
+        if filter_key is not None:
+            content = feed_snapshot.filtered_content(format, filters, active_at)
+
+            return Response(content=content, media_type=mime_type, headers=headers)
+
+        # send pre-rendered and pre-compressed response
+        return Response(content=feed_snapshot.content(format, encoding), media_type=mime_type, headers=headers)
+
+    async def _differential_endpoint(self, request: Request) -> Response:
+
+        format = 'json' if 'debug' in request.query_params else 'pbf'
+        mime_type = 'application/json' if format == 'json' else 'application/octet-stream'
+
+        try:
+            wait = self._parse_wait(request)
+        except ValueError as ex:
+            return Response(content=str(ex), status_code=400)
+
+        feed_snapshot = self._feed_snapshot
+
+        # clients pass the feed version they have seen last, the full dataset is returned for unknown or evicted versions
+        feed_version = request.query_params.get('version')
+        if feed_version is not None:
+            changes = self._change_log.changes_since(feed_version, feed_snapshot.version)
+        else:
+            changes = None
+
+        # long-poll clients which are up to date wait for the next change instead of polling again
+        if changes is not None and len(changes) == 0 and wait > 0:
+            if self._broadcaster.full:
+                return Response(status_code=503, headers={'Retry-After': str(self._feed_update_interval())})
+            
+            self._broadcaster.connect()
+            self._metrics.streaming_clients.set(self._broadcaster.num_clients)
+            try:
+                await self._broadcaster.wait(feed_snapshot.version, wait)
+            finally:
+                self._broadcaster.disconnect()
+                self._metrics.streaming_clients.set(self._broadcaster.num_clients)
+
+            feed_snapshot = self._feed_snapshot
+            changes = self._change_log.changes_since(feed_version, feed_snapshot.version)
+
+        headers = {
+            'ETag': feed_snapshot.etag(format, None, f"version={feed_version}" if changes is not None else None),
+            'Last-Modified': formatdate(feed_snapshot.last_modified, usegmt=True)
+        }
+
+        if not self._check_feed_age(headers):
+            return Response(status_code=503, headers={'Retry-After': str(self._feed_update_interval())})
+
+        if self._is_not_modified(request, headers['ETag'], feed_snapshot.last_modified):
+            return Response(status_code=304, headers=headers)
+
+        if changes is not None:
+            content = feed_snapshot.differential_content(format, changes)
+        else:
+            content = feed_snapshot.content(format)
+
+        return Response(content=content, media_type=mime_type, headers=headers)
+    
+    async def _streaming_endpoint(self, request: Request) -> Response:
+
+        headers = {
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+
+        if not self._check_feed_age(headers):
+            return Response(status_code=503, headers={'Retry-After': str(self._feed_update_interval())})
+
+        if self._broadcaster.full:
+            return Response(status_code=503, headers={'Retry-After': str(self._config['streaming']['streaming_keepalive_seconds'])})
+
+        # reconnecting clients send the ID of the last received event, browsers can pass it as parameter initially
+        last_event_id = request.headers.get('last-event-id', request.query_params.get('version'))
+
+        return StreamingResponse(self._stream_events(last_event_id), media_type='text/event-stream', headers=headers)
+    
+    async def _stream_events(self, last_event_id: str|None):
+        # clients are counted while the stream is running, an unstarted stream is never cleaned up
+        self._broadcaster.connect()
+        self._metrics.streaming_clients.set(self._broadcaster.num_clients)
+
+        try:
+            feed_snapshot = self._feed_snapshot
+            feed_version = self._change_log.create_feed_version(feed_snapshot.version)
+
+            # resume with the changes since the last received event or start with the full dataset
+            changes = self._change_log.changes_since(last_event_id, feed_snapshot.version) if last_event_id is not None else None
+            if changes is None:
+                yield format_event('full', feed_snapshot.pbf, feed_version)
+            elif len(changes) > 0:
+                yield format_event('differential', feed_snapshot.differential_content('pbf', changes), feed_version)
+
+            # each client only keeps the version sent last, the messages are shared by all clients
+            version = feed_snapshot.version
+            keepalive = self._config['streaming']['streaming_keepalive_seconds']
+            while True:
+                if not await self._broadcaster.wait(version, keepalive):
+                    yield b': keepalive\n\n'
+                    continue
+
+                if self._broadcaster.closed:
+                    return
+                
+                messages = self._broadcaster.messages_since(version)
+
+                # slow clients which have fallen behind the buffer are disconnected,
+                # they receive the full dataset after reconnecting
+                if messages is None:
+                    self._metrics.streaming_evictions.inc()
+                    self._logger.warning(f"Disconnecting streaming client behind version {version}")
+                    return
+                
+                for version, feed_version, message in messages:
+                    yield format_event('differential', message, feed_version)
+        finally:
+            self._broadcaster.disconnect()
+            self._metrics.streaming_clients.set(self._broadcaster.num_clients)
+
+    def _check_feed_age(self, headers: dict) -> bool:
+        # mark the last good feed as stale while the publisher is unreachable, until it exceeds the maximum age
+        if self._feed_stale:
+            feed_age = floor(time.monotonic() - self._feed_refreshed_at)
+
+            stale_feed_max_age = self._config['app']['stale_feed_max_age']
+            if stale_feed_max_age > 0 and feed_age > stale_feed_max_age:
+                return False
+
+            headers['Age'] = str(feed_age)
+            headers['Warning'] = '110 - "Response is Stale"'
+
+        return True
+
+    def _parse_filters(self, request: Request) -> tuple[dict[str, list[str]], int|None, str|None]:
+        filters = dict()
+        for field in InformedEntityIndex.fields:
+            values = [v for v in request.query_params.getlist(field) if v != '']
+            if len(values) > 0:
+                filters[field] = values
+
+        active_at = None
+        if 'active_at' in request.query_params:
+            try:
+                active_at = int(request.query_params['active_at'])
+            except ValueError:
+                raise ValueError(f"invalid value {request.query_params['active_at']} for active_at, expected POSIX timestamp")
+
+        if len(filters) == 0 and active_at is None:
+            return filters, None, None
+        
+        # the same filters in another order must result in the same ETag
+        filter_key = '&'.join(f"{field}={value}" for field in sorted(filters.keys()) for value in sorted(set(filters[field])))
+        if active_at is not None:
+            filter_key += f"&active_at={active_at}"
+
+        return filters, active_at, filter_key
+
+    def _parse_wait(self, request: Request) -> int:
+        if 'wait' not in request.query_params or self._broadcaster is None:
+            return 0
+
+        try:
+            wait = int(request.query_params['wait'])
+        except ValueError:
+            raise ValueError(f"invalid value {request.query_params['wait']} for wait, expected seconds")
+
+        return max(0, min(wait, self._config['streaming']['streaming_long_poll_max_seconds']))
+
+    async def _metrics_endpoint(self) -> Response:
+        return Response(content=self._metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+    def _negotiate_encoding(self, accept_encoding: str, encodings: list[str]) -> str|None:
+        # parse quality values of the Accept-Encoding header, see RFC 9110 section 12.5.3
+        qualities = dict()
+        for candidate in accept_encoding.split(','):
+            coding, _, params = candidate.strip().partition(';')
+            coding = coding.strip().lower()
+
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+
+            if coding != '':
+                qualities[coding] = quality
+
+        # choose the accepted encoding with the highest quality, encodings are ordered by preference
+        result = None
+        result_quality = 0.0
+        for encoding in encodings:
+            quality = qualities.get(encoding, qualities.get('*', 0.0))
+            if quality > result_quality:
+                result = encoding
+                result_quality = quality
+
+        return result
+
+    def _is_not_modified(self, request: Request, etag: str, last_modified: int) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since, see RFC 9110 section 13.2.2
+        if 'if-none-match' in request.headers:
+            for candidate in request.headers['if-none-match'].split(','):
+                candidate = candidate.strip()
+                if candidate == '*' or candidate.removeprefix('W/') == etag.removeprefix('W/'):
+                    return True
+                
+            return False
+        
+        if 'if-modified-since' in request.headers:
+            try:
+                if_modified_since = parsedate_to_datetime(request.headers['if-modified-since'])
+                return last_modified <= if_modified_since.timestamp()
+            except (TypeError, ValueError):
+                return False
+
+        return False
+
+    def _start_broadcaster(self) -> None:
+        if self._broadcaster is not None:
+            self._broadcaster.start(self._change_log.version)
+
+    def _stop_broadcaster(self) -> None:
+        if self._broadcaster is not None:
+            self._broadcaster.stop()
+
+    def _create_scheduler(self) -> AsyncScheduler:
+        # a single worker serializes all blocking subscriber calls
+        return AsyncScheduler(1)
+    
+    def _schedule(self, scheduler: AsyncScheduler, name: str, interval: int, function, immediately: bool) -> None:
+        scheduler.schedule(
+            name, 
+            interval, 
+            function, 
+            immediately=immediately, 
+            overlap_policy=self._config['scheduler']['scheduler_overlap_policy'], 
+            jitter=self._config['scheduler']['scheduler_jitter_seconds'], 
+            max_backoff=self._config['scheduler']['scheduler_max_backoff_seconds']
+        )
 
-        if self._cache is not None:
-            cached_response = self._cache.get(f"{request.url.path}-{format}")
-            if cached_response is not None:
-                if format == 'json':
-                    mime_type = 'application/json'
-                else:
-                    mime_type = 'application/octet-stream'
+    def _subscriber_status_request(self) -> bool:
+        if self._subscriber is not None:
+            succeeded = False
+            try:
+                # the publisher is reachable but has not sent a delivery, hence the situations are still up to date
+                if self._subscriber.status():
+                    self._restamp_feed_snapshot()
+
+                    succeeded = True
+            finally:
+                self._set_feed_state(succeeded)
+
+            return succeeded
+        
+        return True
+
+    def _subscriber_direct_request(self) -> bool:
+        if self._subscriber is not None:
+            succeeded = False
+            try:
+                # the subscriber updates its situations after running the delivery callback, 
+                # hence the feed is rendered after the request has been processed completely
+                if self._subscriber.request(self._config['app']['publisher']):
+                    self._restored_situations = None
+
+                    start = time.perf_counter()
+                    self._update_feed_snapshot()
+                    self._metrics.delivery_duration.observe(time.perf_counter() - start)
 
-                return Response(content=cached_response, media_type=mime_type)
+                    succeeded = True
+            finally:
+                self._set_feed_state(succeeded)
+
+            return succeeded
             
-        # render objects out of current messages
-        objects = []
-        for situation_id, situation in self._subscriber.get_situations().items():
+        return True
+    
+    def _set_feed_state(self, refreshed: bool) -> None:
+        # the feed is rebuilt before it is marked as refreshed, hence requests never see a fresh state with outdated data
+        if refreshed:
+            self._feed_refreshed_at = time.monotonic()
+            self._feed_stale = False
+
+            self._confirm_warm_start()
+        else:
+            self._feed_stale = True
+
+    def _feed_update_interval(self) -> int:
+        if self._config['app']['pattern'] == 'request/response':
+            return self._config['app']['data_update_interval']
+        
+        return self._config['app']['status_request_interval']
+
+    def _subscriber_on_delivery(self, siri_delivery: SiriDelivery) -> None:
+        # only used in publish/subscribe mode, where the situations are
+        # updated before the delivery callback is run
+        if self._config['app']['pattern'] == 'publish/subscribe':
+            self._restored_situations = None
+
+            start = time.perf_counter()
+            self._update_feed_snapshot()
+            self._metrics.delivery_duration.observe(time.perf_counter() - start)
+
+            self._set_feed_state(True)
+
+    def _restamp_feed_snapshot(self) -> None:
+        # only the header is stamped again, so that consumers know that the feed is up to date
+        with self._feed_snapshot_lock:
+            if self._feed_snapshot is not None:
+                feed_header = self._create_feed_header()
+                feed_header.feed_version = self._change_log.feed_version
+
+                self._feed_snapshot = self._feed_snapshot.restamp(feed_header)
+
+    def _update_feed_snapshot(self) -> None:
+        with self._feed_snapshot_lock:
+            warm_start = self._render_feed_snapshot()
+
+        # the situations are serialized and written outside the lock, hence requests and deliveries never wait for the disk
+        if warm_start is not None:
+            self._write_warm_start(*warm_start)
+
+    def _render_feed_snapshot(self) -> tuple|None:
+        # must be called while holding _feed_snapshot_lock, returns the data of the warm start file if it needs to be written
+        situations = self._subscriber.get_situations()
+
+        # restored situations are used until the first delivery has been received
+        if self._restored_situations is not None:
+            situations = self._restored_situations
+
+        # drop conversions of situations which are not present anymore
+        self._conversion_cache.retain(situations.keys())
+
+        # render objects out of current messages, only new or changed situations are converted again
+        serialized_entities = []
+        indexed_entities = []
+        warm_start_entities = []
+        for situation, conversion in zip(situations.values(), self._conversion_cache.convert_all(list(situations.values()))):
             try:
-                conversion: tuple[dict, bool] = self._adapter.convert(situation)
+                if isinstance(conversion, Exception):
+                    raise conversion
+                
                 alert, is_closing = conversion
 
                 if alert is not None:
-                    # special handling for closing situations
-                    # see #26 for more information
-                    if is_closing:                
-                        # set effect to NO_EFFECT and delete end timestamps of active periods in order to make consuming systems
-                        # to show up the final message without affecting the trip planning system
-                        # see #26 for more information
-                        alert['effect'] = 'NO_EFFECT'
-                        for active_period in alert['active_period']:
-                            if 'end' in active_period:
-                                del active_period['end']
-
-                    objects.append(alert)
+                    serialized_alert = self._conversion_cache.serialized(alert.id)
+
+                    serialized_entities.append(serialized_alert)
+                    indexed_entities.append((alert, serialized_alert))
+                    warm_start_entities.append((situation, alert, serialized_alert, is_closing))
                     
             except Exception as ex:
                 self._logger.error(ex)
 
-        # send response
-        feed_message = self._create_feed_message(objects)
-        if format  == 'json':
-            json_result = json.dumps(feed_message, indent=4, ensure_ascii=False)
+        # the index is updated for changed alerts only, running requests keep the index of their snapshot
+        index = self._feed_snapshot.index if self._feed_snapshot is not None else InformedEntityIndex()
+        index = index.update(indexed_entities)
 
-            if self._cache is not None:
-                self._cache.set(f"{request.url.path}-{format}", json_result, self._config['caching']['caching_service_alerts_ttl_seconds'])
+        published_entities = {alert.id: s for alert, s in indexed_entities}
 
-            return Response(content=json_result, media_type='application/json')
-        else:
-            pbf_result = ParseDict(feed_message, gtfs_realtime_pb2.FeedMessage()).SerializeToString()
+        # alerts which are not active within the publication window are not published
+        window = None
+        published_alerts = None
+        if self._config['app']['publication_window_enabled'] == True:
+            now = floor(time.time())
+            window = (
+                now - self._config['publication_window']['publication_window_past_seconds'], 
+                now + self._config['publication_window']['publication_window_future_seconds']
+            )
 
-            if self._cache is not None:
-                self._cache.set(f"{request.url.path}-{format}", pbf_result, self._config['caching']['caching_service_alerts_ttl_seconds'])
+            published_alerts = frozenset(index.active_between(*window))
+            published_entities = {a: s for a, s in published_entities.items() if a in published_alerts}
 
-            return Response(content=pbf_result, media_type='application/octet-stream')
+            self._schedule_publication_window_change(index, now)
 
-    def _subscriber_status_request(self):
-        if self._subscriber is not None:
-            self._subscriber.status()
+        serialized_entities = list(published_entities.values())
 
-    def _subscriber_direct_request(self):
-        if self._subscriber is not None:
-            self._subscriber.request(self._config['app']['publisher'])
+        # keep the entities of the current snapshot if nothing has changed, so that ETag and Last-Modified remain 
+        # valid, only the header is stamped again in order to let consumers know that the feed is up to date
+        content_hash = FeedSnapshot.create_content_hash(serialized_entities)
+        if self._feed_snapshot is not None and self._feed_snapshot.content_hash == content_hash and self._feed_snapshot.index is index:
+            feed_header = self._create_feed_header()
+            feed_header.feed_version = self._change_log.feed_version
+
+            self._feed_snapshot = self._feed_snapshot.restamp(feed_header)
+
+            return None
+        
+        # record added, changed and removed alerts for the differential feed
+        changes = self._change_log.update(published_entities)
+
+        feed_header = self._create_feed_header()
+        feed_header.feed_version = self._change_log.feed_version
+
+        # swap the complete snapshot at once, running requests keep the previous one
+        start = time.perf_counter()
+        self._feed_snapshot = FeedSnapshot(feed_header, serialized_entities, content_hash, self._encodings, index, window, self._change_log.version, published_alerts=published_alerts)
+        self._metrics.serialization_duration.labels('feed').observe(time.perf_counter() - start)
+
+        self._metrics.feed_size.set(len(self._feed_snapshot.pbf))
+        self._metrics.feed_entities.set(self._feed_snapshot.num_entities)
+
+        # push the changes to streaming clients, the message is serialized once for all clients
+        if self._broadcaster is not None and len(changes) > 0:
+            message = self._feed_snapshot.differential_content('pbf', list(changes.values()))
+            self._broadcaster.publish(self._change_log.version, self._change_log.feed_version, message)
+
+        if self._warm_start_file is None:
+            return None
+
+        self._warm_start_sequence += 1
+
+        return (self._warm_start_sequence, warm_start_entities, published_entities.keys(), self._change_log.epoch, self._change_log.version)
+
+    def _write_warm_start(self, sequence: int, entities: list[tuple], published_alerts: Iterable[str], epoch: str, version: int) -> None:
+        with self._warm_start_lock:
+            # a later snapshot has been written meanwhile
+            if sequence <= self._warm_start_written:
+                return
+
+            records = list()
+            for situation, alert, serialized_alert, is_closing in entities:
+                flags = WarmStartRecord.CLOSING if is_closing else 0
+                if alert.id in published_alerts:
+                    flags |= WarmStartRecord.PUBLISHED
+
+                records.append(WarmStartRecord(alert.id, serialized_alert, tostring(situation), flags))
+
+            try:
+                self._warm_start_file.write(records, epoch, version)
+                self._warm_start_written = sequence
+            except OSError as ex:
+                self._logger.error(f"Failed to write warm start file {self._warm_start_file.filename}: {ex}")
+
+    def _confirm_warm_start(self) -> None:
+        # restored situations are not confirmed by the publisher, hence the file keeps its age until the first delivery
+        if self._warm_start_file is None or self._restored_situations is not None:
+            return
+
+        with self._warm_start_lock:
+            try:
+                self._warm_start_file.confirm()
+            except OSError as ex:
+                self._logger.error(f"Failed to confirm warm start file {self._warm_start_file.filename}: {ex}")
+
+    def _restore_warm_start(self) -> None:
+        if self._warm_start_file is None:
+            return
+        
+        try:
+            warm_start = self._warm_start_file.read()
+        except (OSError, ValueError) as ex:
+            self._logger.error(f"Failed to read warm start file {self._warm_start_file.filename}: {ex}")
+            return
+        
+        if warm_start is None:
+            return
+        
+        # the file is only written when the situations change, but confirmed by each successful delivery
+        age = max(0.0, time.time() - warm_start.confirmed)
+        if age > self._config['warm_start']['warm_start_max_age_seconds']:
+            self._logger.warning(f"Ignoring warm start file {self._warm_start_file.filename} older than {floor(age)}s")
+            return
+
+        # converted alerts are restored without converting the situations again
+        situations = dict()
+        published_entities = dict()
+        for record in warm_start.records:
+            try:
+                situation = fromstring(record.data)
+                alert = self._conversion_cache.restore(situation, record.serialized_entity, record.flags & WarmStartRecord.CLOSING != 0)
+            except Exception as ex:
+                self._logger.error(ex)
+                continue
+
+            situations[sirixml_get_value(situation, 'SituationNumber')] = situation
+            if record.flags & WarmStartRecord.PUBLISHED:
+                published_entities[alert.id] = record.serialized_entity
+
+        # differential clients of the last run continue with their versions
+        self._change_log.restore(warm_start.epoch, warm_start.version, published_entities)
+        self._restored_situations = situations
+
+        # the restored feed is served as stale until the first delivery has been received
+        self._feed_refreshed_at = time.monotonic() - age
+        self._feed_stale = True
+
+        self._logger.info(f"Restored {len(situations)} situations from warm start file {self._warm_start_file.filename}")
     
-    def _create_feed_message(self, entities):
+    def _schedule_publication_window_change(self, index: InformedEntityIndex, now: int) -> None:
+        # the feed is rendered again exactly when the next alert enters or leaves the publication window
+        if self._scheduler is None:
+            return
+        
+        next_change = index.next_window_change(
+            now, 
+            self._config['publication_window']['publication_window_past_seconds'], 
+            self._config['publication_window']['publication_window_future_seconds']
+        )
+
+        if next_change is not None:
+            self._scheduler.schedule_once('publication_window', next_change - time.time(), self._update_feed_snapshot)
+    
+    def _create_feed_header(self) -> gtfs_realtime_pb2.FeedHeader:
         timestamp = datetime.now().astimezone(pytz.timezone(self._config['app']['timezone'])).timestamp()
         timestamp = floor(timestamp)
         
-        return {
-            'header': {
-                'gtfs_realtime_version': '2.0',
-                'incrementality': 'FULL_DATASET',
-                'timestamp': timestamp
-            },
-            'entity': entities
-        }
+        feed_header = gtfs_realtime_pb2.FeedHeader()
+        feed_header.gtfs_realtime_version = '2.0'
+        feed_header.incrementality = gtfs_realtime_pb2.FeedHeader.FULL_DATASET
+        feed_header.timestamp = timestamp
+
+        return feed_header
+
+    @property
+    def adapter(self) -> BaseAdapter:
+        return self._adapter
+
+    @property
+    def feed_snapshot(self) -> FeedSnapshot|None:
+        return self._feed_snapshot
+
+    def update_feed(self) -> FeedSnapshot:
+        # renders the feed out of the subscriber's situations at once
+        self._update_feed_snapshot()
+
+        return self._feed_snapshot
+
+    def close(self) -> None:
+        self._conversion_cache.close()
 
     def create(self) -> FastAPI:
         self._fastapi.include_router(self._api_router)
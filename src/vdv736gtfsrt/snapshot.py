@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+import json
+
+from google.transit import gtfs_realtime_pb2
+from google.protobuf.json_format import MessageToDict
+
+from .gtfsrt import serialize_feed_header, serialize_feed_message
+from .index import InformedEntityIndex
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        # fixed mtime in order to generate the same bytes for the same content
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    elif encoding == 'br':
+        import brotli
+        return brotli.compress(data)
+    else:
+        raise ValueError(f"unknown content encoding {encoding}")
+    
+def _render_json(pbf: bytes) -> bytes:
+    feed_message = gtfs_realtime_pb2.FeedMessage.FromString(pbf)
+    return json.dumps(MessageToDict(feed_message, preserving_proto_field_name=True), indent=4, ensure_ascii=False).encode('utf-8')
+
+class FeedSnapshot:
+
+    @classmethod
+    def create_content_hash(cls, serialized_entities: list[bytes]) -> str:
+        # the header is not part of the hash, as its timestamp changes with every rendering
+        content_hash = hashlib.sha256()
+        for serialized_entity in serialized_entities:
+            content_hash.update(serialized_entity)
+
+        return content_hash.hexdigest()
+
+    def __init__(self, feed_header: gtfs_realtime_pb2.FeedHeader, serialized_entities: list[bytes], content_hash: str|None = None, encodings: list[str] = [], index: InformedEntityIndex|None = None, window: tuple[int, int]|None = None, version: int = 0, last_modified: int|None = None, published_alerts: frozenset[str]|None = None) -> None:
+        self.timestamp: int = feed_header.timestamp
+        
+        # time of the last change of the entities, which is kept when only the header is stamped again, see restamp
+        self.last_modified: int = last_modified if last_modified is not None else feed_header.timestamp
+        self.num_entities: int = len(serialized_entities)
+
+        # version of the change log the feed has been rendered with, see differential_content
+        self.version: int = version
+
+        # index of the informed entities for filtered feeds, see filtered_content
+        self.index: InformedEntityIndex|None = index
+
+        # publication window the feed has been rendered with and the IDs of the alerts within, determined once per rebuild
+        self.window: tuple[int, int]|None = window
+        self.published_alerts: frozenset[str]|None = published_alerts
+
+        self.content_hash: str = content_hash if content_hash is not None else self.create_content_hash(serialized_entities)
+        self.encodings: list[str] = list(encodings)
+
+        # render PBF once out of the already serialized entities, requests only return the stored bytes afterwards
+        self._feed_header: gtfs_realtime_pb2.FeedHeader = feed_header
+        self._serialized_header: bytes = serialize_feed_header(feed_header)
+        self._serialized_differential_header: bytes|None = None
+        self._serialized_entities: list[bytes] = serialized_entities
+        self.pbf: bytes = serialize_feed_message(self._serialized_header, serialized_entities)
+
+        self._contents: dict[tuple[str, str|None], bytes] = dict()
+        self._contents[('pbf', None)] = self.pbf
+
+        # compress the PBF feed once per feed version instead of once per request
+        for encoding in self.encodings:
+            self.content('pbf', encoding)
+
+    def restamp(self, feed_header: gtfs_realtime_pb2.FeedHeader) -> 'FeedSnapshot':
+        # renders the same entities with a new header, e.g. a current timestamp for consumers detecting outdated feeds
+        return FeedSnapshot(feed_header, self._serialized_entities, self.content_hash, self.encodings, self.index, self.window, self.version, self.last_modified, self.published_alerts)
+
+    @property
+    def json(self) -> bytes:
+        return self.content('json')
+
+    def content(self, format: str, encoding: str|None = None) -> bytes:
+        key = (format, encoding)
+        if key not in self._contents:
+            if encoding is not None:
+                self._contents[key] = _compress(self.content(format), encoding)
+            elif format == 'json':
+                # the JSON debug view is only rendered when it is requested at least once
+                self._contents[key] = _render_json(self.pbf)
+            else:
+                raise ValueError(f"unknown format {format}")
+
+        return self._contents[key]
+
+    def filtered_content(self, format: str, filters: dict[str, list[str]], active_at: int|None = None) -> bytes:
+        # filtered feeds are rendered per request out of the matching serialized entities only,
+        # alerts outside the publication window are only returned when asking for a certain time
+        published = self.published_alerts if active_at is None else None
+
+        pbf = serialize_feed_message(self._serialized_header, self.index.query(filters, active_at, published))
+        return _render_json(pbf) if format == 'json' else pbf
+
+    def differential_content(self, format: str, serialized_entities: list[bytes]) -> bytes:
+        if self._serialized_differential_header is None:
+            feed_header = gtfs_realtime_pb2.FeedHeader()
+            feed_header.CopyFrom(self._feed_header)
+            feed_header.incrementality = gtfs_realtime_pb2.FeedHeader.DIFFERENTIAL
+
+            self._serialized_differential_header = serialize_feed_header(feed_header)
+
+        pbf = serialize_feed_message(self._serialized_differential_header, serialized_entities)
+        return _render_json(pbf) if format == 'json' else pbf
+
+    def etag(self, format: str, encoding: str|None = None, filter_key: str|None = None) -> str:
+        # weak ETag depending on the entities only, as the header timestamp changes with every delivery, 
+        # every format, encoding and filter has its own representation
+        suffix = ''.join(f"-{s}" for s in (format, encoding) if s is not None and s != 'pbf')
+        if filter_key is not None:
+            suffix += f"-{hashlib.sha256(filter_key.encode('utf-8')).hexdigest()[:16]}"
+
+        return f'W/"{self.content_hash}{suffix}"'
@@ -0,0 +1,46 @@
+from io import BytesIO
+from lxml.etree import iterparse
+from lxml.objectify import ObjectifyElementClassLookup, ObjectifiedElement
+from typing import BinaryIO, Iterator
+
+def iterparse_situations(source: bytes|str|BinaryIO, batch_size: int = 1) -> Iterator[list[ObjectifiedElement]]:
+    # raw XML content is wrapped, file names and file objects are parsed directly
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    # the namespace wildcard matches situations with and without SIRI namespace
+    context = iterparse(source, events=('end',), tag='{*}PtSituationElement', resolve_entities=False)
+
+    # situations must be objectified elements in order to be processed like situations of a parsed delivery,
+    # iterparse creates the element when its start tag is parsed, so it must not be classified as empty string element
+    context.set_element_class_lookup(ObjectifyElementClassLookup(empty_data_class=ObjectifiedElement))
+
+    batch = list()
+    for _, situation in context:
+        batch.append(situation)
+
+        if len(batch) >= batch_size:
+            yield batch
+
+            _clear_situations(batch)
+            batch = list()
+
+    if len(batch) > 0:
+        yield batch
+
+        _clear_situations(batch)
+
+def _clear_situations(situations: list[ObjectifiedElement]) -> None:
+    # release processed situations and all of their preceding siblings, so
+    # that the partially parsed tree does not grow with the size of the delivery
+    for situation in situations:
+        situation.clear()
+
+        parent = situation.getparent()
+        if parent is not None:
+            previous = situation.getprevious()
+            while previous is not None:
+                parent.remove(previous)
+                previous = situation.getprevious()
+
+            parent.remove(situation)
@@ -68,7 +68,7 @@ causes = {
     'objectOnTheLine': 'OTHER_CAUSE',
     'vehicleOnTheLine': 'OTHER_CAUSE',
     'animalOnTheLine': 'OTHER_CAUSE',
-    'fallenTreeOnTheLine': 'WHEATHER',
+    'fallenTreeOnTheLine': 'WEATHER',
     'vegetation': 'OTHER_CAUSE',
     'speedRestrictions': 'OTHER_CAUSE',
     'precedingVehicle': 'OTHER_CAUSE',
@@ -0,0 +1,139 @@
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+from typing import Iterable
+
+# all numbers are little-endian, the file consists of
+#   header: magic, format version, flags, number of records, epoch, version, creation time, CRC32 of table and data
+#   table:  offset, lengths, flags and timestamp of each record, fixed size for accessing records without parsing others
+#   data:   alert ID, serialized entity and additional data of each record
+_magic = b'VDV736WS'
+_format_version = 1
+
+_header = struct.Struct('<8sHHI8sQdI')
+_record = struct.Struct('<QIIIId')
+
+class WarmStartRecord:
+
+    __slots__ = ('alert_id', 'serialized_entity', 'data', 'flags', 'timestamp')
+
+    # flags of each record
+    CLOSING = 1
+    PUBLISHED = 2
+
+    def __init__(self, alert_id: str, serialized_entity: bytes, data: bytes = b'', flags: int = 0, timestamp: float = 0.0) -> None:
+        self.alert_id = alert_id
+        self.serialized_entity = serialized_entity
+        self.data = data
+        self.flags = flags
+        self.timestamp = timestamp
+
+class WarmStart:
+
+    __slots__ = ('epoch', 'version', 'created', 'confirmed', 'records')
+
+    def __init__(self, epoch: str, version: int, created: float, records: list[WarmStartRecord], confirmed: float|None = None) -> None:
+        self.epoch = epoch
+        self.version = version
+        self.created = created
+        self.records = records
+
+        # time the content was confirmed to be up to date last, the file is not written again if nothing has changed
+        self.confirmed = confirmed if confirmed is not None else created
+
+class WarmStartFile:
+
+    def __init__(self, filename: str) -> None:
+        self._filename = filename
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    def write(self, records: Iterable[WarmStartRecord], epoch: str = '', version: int = 0) -> None:
+        records = list(records)
+        encoded_ids = [r.alert_id.encode('utf-8') for r in records]
+
+        table = bytearray()
+        data = bytearray()
+
+        offset = _header.size + _record.size * len(records)
+        for record, encoded_id in zip(records, encoded_ids):
+            table += _record.pack(offset + len(data), len(encoded_id), len(record.serialized_entity), len(record.data), record.flags, record.timestamp)
+
+            data += encoded_id
+            data += record.serialized_entity
+            data += record.data
+
+        checksum = zlib.crc32(data, zlib.crc32(table))
+        header = _header.pack(_magic, _format_version, 0, len(records), epoch.encode('ascii'), version, time.time(), checksum)
+
+        # the file is replaced at once, hence a crash while writing never leaves a partial file behind
+        directory = os.path.dirname(os.path.abspath(self._filename))
+        os.makedirs(directory, exist_ok=True)
+
+        file_descriptor, temp_filename = tempfile.mkstemp(prefix='.warmstart-', dir=directory)
+        try:
+            with os.fdopen(file_descriptor, 'wb') as temp_file:
+                temp_file.write(header)
+                temp_file.write(table)
+                temp_file.write(data)
+
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+
+            os.replace(temp_filename, self._filename)
+        except BaseException:
+            os.unlink(temp_filename)
+            raise
+
+    def confirm(self) -> None:
+        # the modification time is updated only, see WarmStart.confirmed
+        if os.path.isfile(self._filename):
+            os.utime(self._filename)
+
+    def read(self) -> WarmStart|None:
+        # returns None if there's no file, raises ValueError for invalid files
+        if not os.path.isfile(self._filename) or os.path.getsize(self._filename) == 0:
+            return None
+
+        with open(self._filename, 'rb') as warm_start_file:
+            modified = os.fstat(warm_start_file.fileno()).st_mtime
+
+            with mmap.mmap(warm_start_file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                if len(content) < _header.size:
+                    raise ValueError(f"invalid warm start file {self._filename}, file is truncated")
+
+                magic, format_version, _, num_records, epoch, version, created, checksum = _header.unpack_from(content, 0)
+                if magic != _magic:
+                    raise ValueError(f"invalid warm start file {self._filename}")
+
+                if format_version != _format_version:
+                    raise ValueError(f"unsupported warm start file format version {format_version}")
+
+                with memoryview(content) as view, view[_header.size:] as body:
+                    valid = zlib.crc32(body) == checksum
+
+                if not valid:
+                    raise ValueError(f"invalid warm start file {self._filename}, checksum mismatch")
+
+                records = list()
+                for index in range(num_records):
+                    offset, id_length, entity_length, data_length, flags, timestamp = _record.unpack_from(content, _header.size + _record.size * index)
+
+                    entity_offset = offset + id_length
+                    data_offset = entity_offset + entity_length
+
+                    records.append(WarmStartRecord(
+                        content[offset:entity_offset].decode('utf-8'),
+                        content[entity_offset:data_offset],
+                        content[data_offset:data_offset + data_length],
+                        flags,
+                        timestamp
+                    ))
+
+        return WarmStart(epoch.rstrip(b'\x00').decode('ascii'), version, created, records, max(created, modified))
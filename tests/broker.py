@@ -0,0 +1,116 @@
+import socketserver
+import threading
+
+class MqttBrokerStandIn(socketserver.ThreadingTCPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # minimal local MQTT v5 broker for tests and benchmarks, messages are confirmed but not routed
+    def __init__(self, acknowledge: bool = True, record_messages: bool = True) -> None:
+        super().__init__(('127.0.0.1', 0), _MqttBrokerStandInHandler)
+
+        self.acknowledge = acknowledge
+        self.record_messages = record_messages
+
+        # topic, payload, QoS and retain flag of each received message if recorded
+        self.messages: list[tuple[str, bytes, int, bool]] = list()
+        self.num_messages: int = 0
+        self.message_received = threading.Condition()
+
+        self.port: int = self.server_address[1]
+
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def wait_for_messages(self, num_messages: int, timeout: float) -> bool:
+        with self.message_received:
+            return self.message_received.wait_for(lambda: self.num_messages >= num_messages, timeout)
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+class _MqttBrokerStandInHandler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        try:
+            while True:
+                header = self._read(1)[0]
+                packet = self._read(self._read_varint())
+
+                packet_type = header >> 4
+                if packet_type == 1:
+                    # CONNECT => CONNACK without properties
+                    self._write(bytes([0x20, 0x03, 0x00, 0x00, 0x00]))
+                elif packet_type == 3:
+                    # PUBLISH => PUBACK for QoS 1, PUBREC for QoS 2
+                    qos = (header >> 1) & 0x03
+                    retain = bool(header & 0x01)
+
+                    topic_length = int.from_bytes(packet[0:2], 'big')
+                    offset = 2 + topic_length
+
+                    mid = b''
+                    if qos > 0:
+                        mid = packet[offset:offset + 2]
+                        offset += 2
+
+                    with self.server.message_received:
+                        if self.server.record_messages:
+                            properties_length, offset = _decode_varint(packet, offset)
+                            topic = packet[2:2 + topic_length].decode('utf-8')
+
+                            self.server.messages.append((topic, packet[offset + properties_length:], qos, retain))
+
+                        self.server.num_messages += 1
+                        self.server.message_received.notify_all()
+
+                    if self.server.acknowledge:
+                        if qos == 1:
+                            self._write(bytes([0x40, 0x02]) + mid)
+                        elif qos == 2:
+                            self._write(bytes([0x50, 0x02]) + mid)
+                elif packet_type == 6:
+                    # PUBREL => PUBCOMP
+                    self._write(bytes([0x70, 0x02]) + packet[0:2])
+                elif packet_type == 12:
+                    # PINGREQ => PINGRESP
+                    self._write(bytes([0xD0, 0x00]))
+                elif packet_type == 14:
+                    break
+        except (ConnectionError, OSError):
+            pass
+
+    def _read(self, length: int) -> bytes:
+        data = self.rfile.read(length)
+        if len(data) < length:
+            raise ConnectionError('connection closed')
+
+        return data
+
+    def _write(self, data: bytes) -> None:
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def _read_varint(self) -> int:
+        value, shift = 0, 0
+        while True:
+            byte = self._read(1)[0]
+            value |= (byte & 0x7F) << shift
+            shift += 7
+
+            if byte & 0x80 == 0:
+                return value
+
+def _decode_varint(data: bytes, offset: int) -> tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+
+        value |= (byte & 0x7F) << shift
+        shift += 7
+
+        if byte & 0x80 == 0:
+            return value, offset
@@ -0,0 +1,127 @@
+import os
+import unittest
+
+from google.transit import gtfs_realtime_pb2
+from lxml.objectify import fromstring
+from unittest.mock import patch
+
+from vdv736gtfsrt.adapter.cache import ConversionCache
+from vdv736gtfsrt.adapter.vdv import VdvStandardAdapter
+
+class ConversionCache_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            'app': {
+                'adapter': {
+                    'url': {
+                        'de': 'https://yourdomain.com/alerts/de/[alertId]'
+                    }
+                }
+            }
+        }
+
+        self.adapter = VdvStandardAdapter(self.config)
+        self.cache = ConversionCache(self.adapter)
+
+    def _load_situation(self, name: str):
+        xml_filename = os.path.join(os.path.dirname(__file__), f"data/xml/{name}.xml")
+        with open(xml_filename, 'r') as xml_file:
+            return fromstring(xml_file.read())
+
+    def test_UnchangedSituation(self):
+        with patch.object(self.adapter, 'convert', wraps=self.adapter.convert) as convert:
+            first_result, _ = self.cache.convert(self._load_situation('SampleSituation1'))
+            second_result, _ = self.cache.convert(self._load_situation('SampleSituation1'))
+
+            self.assertEqual(1, convert.call_count)
+            self.assertIs(first_result, second_result)
+
+    def test_ChangedSituation(self):
+        with patch.object(self.adapter, 'convert', wraps=self.adapter.convert) as convert:
+            situation = self._load_situation('SampleSituation1')
+            first_result, _ = self.cache.convert(situation)
+
+            situation.Version = 2
+            situation.Summary._setText('Vogesenstrasse wieder in Betrieb')
+
+            second_result, _ = self.cache.convert(situation)
+
+            self.assertEqual(2, convert.call_count)
+            self.assertEqual('Vogesenstrasse wieder in Betrieb', second_result.alert.header_text.translation[0].text)
+
+    def test_ClosingSituation(self):
+        result, is_closing = self.cache.convert(self._load_situation('SampleSituation4'))
+
+        self.assertTrue(is_closing)
+        self.assertEqual(gtfs_realtime_pb2.Alert.NO_EFFECT, result.alert.effect)
+        for active_period in result.alert.active_period:
+            self.assertFalse(active_period.HasField('end'))
+
+    def test_Eviction(self):
+        self.cache.convert(self._load_situation('SampleSituation1'))
+        self.cache.convert(self._load_situation('SampleSituation2'))
+        self.cache.convert(self._load_situation('SampleSituation3'))
+
+        self.cache.retain(['ef478576-d1a8-527e-8820-5164ca986128', '18acba15-9669-58af-91f1-7a0a3a9c3b98'])
+        self.assertEqual(2, len(self.cache))
+
+        self.cache.evict('ef478576-d1a8-527e-8820-5164ca986128')
+        self.assertEqual(1, len(self.cache))
+
+    def _create_situations(self, num_situations: int) -> list:
+        situations = list()
+        for n in range(0, num_situations):
+            situation = self._load_situation(f"SampleSituation{n % 4 + 1}")
+            situation.SituationNumber = f"situation-{n}"
+
+            situations.append(situation)
+
+        # situation without Summary fails to convert
+        del situations[num_situations // 2].Summary
+
+        return situations
+
+    def test_ConvertAll(self):
+        situations = self._create_situations(8)
+
+        with patch.object(self.adapter, 'convert', wraps=self.adapter.convert) as convert:
+            results = self.cache.convert_all(situations)
+            self.cache.convert_all(situations)
+
+            # failed conversions are tried again with the next delivery
+            self.assertEqual(8 + 1, convert.call_count)
+
+        self.assertEqual(8, len(results))
+        self.assertIsInstance(results[4], ValueError)
+
+        for n, result in enumerate(results):
+            if n != 4:
+                alert, _ = result
+                self.assertEqual(f"situation-{n}", alert.id)
+
+        self.assertEqual(7, len(self.cache))
+
+    def test_ParallelConversion(self):
+        situations = self._create_situations(100)
+
+        cache = ConversionCache(self.adapter, self.config, 2)
+        try:
+            with patch.object(self.adapter, 'convert', wraps=self.adapter.convert) as convert:
+                results = cache.convert_all(situations)
+
+                # all situations are converted by the worker processes
+                self.assertEqual(0, convert.call_count)
+        finally:
+            cache.close()
+
+        expected_results = self.cache.convert_all(situations)
+
+        self.assertEqual(100, len(results))
+        self.assertIsInstance(results[50], RuntimeError)
+        self.assertIn('Summary', str(results[50]))
+
+        for n, (result, expected_result) in enumerate(zip(results, expected_results)):
+            if n != 50:
+                self.assertEqual(expected_result[0].SerializeToString(), result[0].SerializeToString())
+                self.assertEqual(expected_result[1], result[1])
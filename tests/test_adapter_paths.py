@@ -0,0 +1,24 @@
+import unittest
+
+from lxml.objectify import fromstring
+
+from vdv736gtfsrt.adapter.paths import compile_path, get_element, get_elements, get_value
+
+class Paths_Test(unittest.TestCase):
+
+    def test_Namespaces(self):
+        path = compile_path('Consequences.Consequence')
+        condition = compile_path('Condition')
+
+        for namespace in ['', ' xmlns="http://www.siri.org.uk/siri"']:
+            situation = fromstring(f"<PtSituationElement{namespace}><Consequences><Consequence><Condition>stopMoved</Condition></Consequence><Consequence><Condition>unknown</Condition></Consequence></Consequences></PtSituationElement>")
+
+            self.assertEqual(['stopMoved', 'unknown'], [get_value(c, condition) for c in get_elements(situation, path)])
+
+    def test_MissingElements(self):
+        situation = fromstring('<PtSituationElement><Summary xml:lang="EN">Summary</Summary></PtSituationElement>')
+
+        self.assertIsNone(get_element(situation, compile_path('Detail')))
+        self.assertIsNone(get_element(None, compile_path('Detail')))
+        self.assertEqual('default', get_value(situation, compile_path('Affects.Networks'), 'default'))
+        self.assertEqual(0, len(get_elements(situation, compile_path('Consequences.Consequence'))))
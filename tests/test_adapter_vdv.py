@@ -1,9 +1,13 @@
 import os
 import unittest
 
+from google.protobuf.json_format import ParseDict
+from google.transit import gtfs_realtime_pb2
 from lxml.objectify import fromstring
 
+from vdv736gtfsrt.adapter.nvbw.ems import EmsAdapter
 from vdv736gtfsrt.adapter.vdv import VdvStandardAdapter
+from vdv736gtfsrt.vdvdef import conditions
 
 class VdvStandardAdapter_Test(unittest.TestCase):
 
@@ -120,4 +124,102 @@ class VdvStandardAdapter_Test(unittest.TestCase):
             self.assertEqual('7901106', result['alert']['informed_entity'][0]['stop_id'])
 
             self.assertTrue(is_closing)
-            
\ No newline at end of file
+
+    def test_ProtobufConversion(self):
+
+        for n in range(1, 5):
+            xml_filename = os.path.join(os.path.dirname(__file__), f"data/xml/SampleSituation{n}.xml")
+            with open(xml_filename, 'r') as xml_file:
+                situation = fromstring(xml_file.read())
+
+                dict_result, dict_is_closing = self.adapter.convert(situation)
+                pbf_result, pbf_is_closing = self.adapter.convert(situation, gtfs_realtime_pb2.FeedEntity())
+
+                self.assertIsInstance(pbf_result, gtfs_realtime_pb2.FeedEntity)
+                self.assertEqual(
+                    ParseDict(dict_result, gtfs_realtime_pb2.FeedEntity()).SerializeToString(), 
+                    pbf_result.SerializeToString()
+                )
+
+                self.assertEqual(dict_is_closing, pbf_is_closing)
+
+    def test_AffectedStopPoints(self):
+
+        xml_filename = os.path.join(os.path.dirname(__file__), 'data/xml/SampleSituation1.xml')
+        with open(xml_filename, 'r') as xml_file:
+            xml_content = xml_file.read() \
+                .replace('StopPlaces>', 'StopPoints>') \
+                .replace('AffectedStopPlace>', 'AffectedStopPoint>') \
+                .replace('StopPlaceRef>', 'StopPointRef>')
+            
+            situation = fromstring(xml_content)
+
+            result, _ = self.adapter.convert(situation)
+
+            self.assertEqual(1, len(result['alert']['informed_entity']))
+            self.assertEqual('8588794', result['alert']['informed_entity'][0]['stop_id'])
+            self.assertEqual('85:37:62', result['alert']['informed_entity'][0]['route_id'])
+
+    def test_IndependentLookupTables(self):
+
+        xml_filename = os.path.join(os.path.dirname(__file__), 'data/xml/SampleSituation1.xml')
+        with open(xml_filename, 'r') as xml_file:
+            situation = fromstring(xml_file.read().replace('<Condition>unknown</Condition>', '<Condition>noService</Condition>'))
+
+        ems_adapter = EmsAdapter(self.adapter._config)
+        ems_result, _ = ems_adapter.convert(situation)
+
+        # noService is only known by the EMS adapter
+        result, _ = self.adapter.convert(situation)
+        vdv_result, _ = VdvStandardAdapter(self.adapter._config).convert(situation)
+        
+        self.assertEqual('NO_SERVICE', ems_result['alert']['effect'])
+        self.assertEqual('UNKNOWN_EFFECT', result['alert']['effect'])
+        self.assertEqual('UNKNOWN_EFFECT', vdv_result['alert']['effect'])
+        self.assertNotIn('noService', conditions)
+
+        with self.assertRaises(TypeError):
+            ems_adapter._conditions['stopMoved'] = 'NO_SERVICE'
+
+    def test_ConfiguredLookupTables(self):
+
+        adapter = VdvStandardAdapter({
+            'app': {
+                'adapter': {
+                    'url': {
+                        'de': 'https://yourdomain.com/alerts/de/[alertId]'
+                    },
+                    'causes': {
+                        'constructionWork': 'MAINTENANCE'
+                    },
+                    'conditions': {
+                        'unknown': 'OTHER_EFFECT'
+                    },
+                    'effect_priorities': [
+                        'OTHER_EFFECT',
+                        'STOP_MOVED'
+                    ]
+                }
+            }
+        })
+
+        xml_filename = os.path.join(os.path.dirname(__file__), 'data/xml/SampleSituation1.xml')
+        with open(xml_filename, 'r') as xml_file:
+            situation = fromstring(xml_file.read().replace(
+                '<Condition>unknown</Condition>', 
+                '<Condition>stopMoved</Condition></Consequence><Consequence><Condition>unknown</Condition>'
+            ))
+
+        result, _ = adapter.convert(situation)
+
+        self.assertEqual('MAINTENANCE', result['alert']['cause'])
+        self.assertEqual('OTHER_EFFECT', result['alert']['effect'])
+
+        # the default adapter is not affected by the configuration above
+        result, _ = self.adapter.convert(situation)
+
+        self.assertEqual('CONSTRUCTION', result['alert']['cause'])
+        self.assertEqual('STOP_MOVED', result['alert']['effect'])
+
+        with self.assertRaises(ValueError):
+            VdvStandardAdapter({'app': {'adapter': {'url': {}, 'conditions': {'unknown': 'NO_SUCH_EFFECT'}}}})
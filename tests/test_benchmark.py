@@ -0,0 +1,55 @@
+import json
+import unittest
+
+from google.transit import gtfs_realtime_pb2
+
+from vdv736gtfsrt.adapter.vdv import VdvStandardAdapter
+from vdv736gtfsrt.benchmark import Benchmark
+from vdv736gtfsrt.benchmark import SyntheticDeliveryGenerator
+from vdv736gtfsrt.config import Configuration
+
+from tests.broker import MqttBrokerStandIn
+
+class SyntheticDeliveryGenerator_Test(unittest.TestCase):
+
+    def test_Generate(self):
+        generator = SyntheticDeliveryGenerator('./tests/data/xml')
+
+        delivery = generator.generate(10)
+        situations = generator.situations(delivery)
+
+        self.assertEqual(10, len(situations))
+        self.assertEqual(10, len(set(str(s.SituationNumber) for s in situations)))
+
+        # the same seed generates the same delivery
+        self.assertEqual(delivery, SyntheticDeliveryGenerator('./tests/data/xml').generate(10))
+
+        adapter = VdvStandardAdapter(Configuration.default_config({'app': {'adapter': {'url': {'de': 'https://yourdomain.dev/[alertId]'}}}}))
+        for situation in situations:
+            alert, _ = adapter.convert(situation, gtfs_realtime_pb2.FeedEntity())
+
+            self.assertEqual(str(situation.SituationNumber), alert.id)
+
+class Benchmark_Test(unittest.TestCase):
+
+    def test_Run(self):
+        broker = MqttBrokerStandIn(record_messages=False)
+
+        benchmark = Benchmark('./tests/data/yaml/test.yaml', './tests/data/xml', num_situations=8, iterations=1, num_requests=20, concurrency=4, num_workers=2, mqtt_broker=('127.0.0.1', broker.port))
+        try:
+            results = benchmark.run()
+        finally:
+            broker.stop()
+
+        for name in ['adapter_convert', 'conversion_pool', 'create_translated_string', 'iso2unix', 'feed_serialization', 'endpoint', 'mqtt_publish']:
+            self.assertIn(name, results['results'])
+
+        self.assertEqual(20, results['results']['endpoint']['requests'])
+        self.assertEqual(8, results['results']['mqtt_publish']['messages'])
+
+        # the speedup of the process pool is measured against converting in process
+        for name in ['workers_0', 'workers_1', 'workers_2', 'threshold', 'speedup']:
+            self.assertIn(name, results['results']['conversion_pool'])
+
+        # results must be serializable for comparing them between commits
+        json.dumps(results)
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import unittest
+
+from vdv736gtfsrt.broadcast import FeedBroadcaster
+from vdv736gtfsrt.broadcast import format_event
+
+class FeedBroadcaster_Test(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.broadcaster = FeedBroadcaster(3, 2)
+        self.broadcaster.start()
+
+    async def test_Wait(self):
+        self.assertFalse(await self.broadcaster.wait(0, 0.05))
+
+        # messages are published by the thread rendering the feed
+        threading.Timer(0.05, self.broadcaster.publish, (1, 'epoch-1', b'first')).start()
+
+        self.assertTrue(await self.broadcaster.wait(0, 1))
+        self.assertEqual(1, self.broadcaster.version)
+        self.assertEqual([(1, 'epoch-1', b'first')], self.broadcaster.messages_since(0))
+        self.assertEqual([], self.broadcaster.messages_since(1))
+
+        # clients behind the current version do not wait at all
+        self.assertTrue(await self.broadcaster.wait(0, 0))
+
+    async def test_SharedWait(self):
+        waiters = [asyncio.create_task(self.broadcaster.wait(0, 1)) for _ in range(100)]
+        await asyncio.sleep(0)
+
+        self.broadcaster.publish(1, 'epoch-1', b'first')
+
+        self.assertEqual([True] * 100, await asyncio.gather(*waiters))
+
+    async def test_SlowClient(self):
+        for version in range(1, 5):
+            self.broadcaster.publish(version, f"epoch-{version}", b'message')
+
+        await asyncio.sleep(0)
+
+        # the first message is evicted from the buffer already
+        self.assertIsNone(self.broadcaster.messages_since(0))
+        self.assertEqual([2, 3, 4], [m[0] for m in self.broadcaster.messages_since(1)])
+
+    async def test_Stop(self):
+        waiter = asyncio.create_task(self.broadcaster.wait(0, 10))
+        await asyncio.sleep(0)
+
+        self.broadcaster.stop()
+
+        self.assertTrue(await waiter)
+        self.assertTrue(self.broadcaster.closed)
+
+    def test_FormatEvent(self):
+        event = format_event('differential', b'\x00\x01', 'epoch-1')
+
+        self.assertEqual(b'id: epoch-1\nevent: differential\ndata: AAE=\n\n', event)
@@ -0,0 +1,72 @@
+import unittest
+
+from google.transit import gtfs_realtime_pb2
+
+from vdv736gtfsrt.changelog import ChangeLog
+from vdv736gtfsrt.gtfsrt import serialize_feed_entity
+
+def _create_entity(alert_id: str, header_text: str) -> bytes:
+    feed_entity = gtfs_realtime_pb2.FeedEntity()
+    feed_entity.id = alert_id
+    feed_entity.alert.header_text.translation.add(text=header_text)
+
+    return serialize_feed_entity(feed_entity)
+
+def _parse_entities(serialized_entities: list[bytes]) -> dict[str, gtfs_realtime_pb2.FeedEntity]:
+    feed_message = gtfs_realtime_pb2.FeedMessage.FromString(b''.join(serialized_entities))
+    return {e.id: e for e in feed_message.entity}
+
+class ChangeLog_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.change_log = ChangeLog(3, 'test')
+
+        self.change_log.update({'1': _create_entity('1', 'A'), '2': _create_entity('2', 'B')})
+        self.first_version = self.change_log.feed_version
+
+        self.change_log.update({'1': _create_entity('1', 'A'), '3': _create_entity('3', 'C')})
+
+    def test_ChangesSince(self):
+        changes = _parse_entities(self.change_log.changes_since(self.first_version, self.change_log.version))
+
+        self.assertEqual({'2', '3'}, set(changes.keys()))
+        self.assertTrue(changes['2'].is_deleted)
+        self.assertFalse(changes['3'].is_deleted)
+
+        self.assertEqual([], self.change_log.changes_since(self.change_log.feed_version, self.change_log.version))
+
+        # changes of later versions are not part of a snapshot with an earlier version
+        self.assertEqual([], self.change_log.changes_since(self.first_version, 1))
+
+    def test_UnchangedEntities(self):
+        version = self.change_log.version
+        changes = self.change_log.update({'1': _create_entity('1', 'A'), '3': _create_entity('3', 'C')})
+
+        self.assertEqual(0, len(changes))
+        self.assertEqual(version, self.change_log.version)
+
+    def test_UnknownVersion(self):
+        self.assertIsNone(self.change_log.changes_since('other-1', self.change_log.version))
+        self.assertIsNone(self.change_log.changes_since('test-99', self.change_log.version))
+        self.assertIsNone(self.change_log.changes_since('test', self.change_log.version))
+
+    def test_EvictedVersion(self):
+        for n in range(3):
+            self.change_log.update({'1': _create_entity('1', str(n))})
+
+        # the first two versions are evicted, only three versions are kept
+        self.assertIsNone(self.change_log.changes_since(self.first_version, self.change_log.version))
+        self.assertEqual(2, len(self.change_log.changes_since(self.change_log.create_feed_version(2), self.change_log.version)))
+
+    def test_Restore(self):
+        change_log = ChangeLog(3)
+        change_log.restore('test', self.change_log.version, {'1': _create_entity('1', 'A'), '3': _create_entity('3', 'C')})
+
+        # clients of the earlier run are up to date, later changes continue its versions
+        self.assertEqual([], change_log.changes_since(self.change_log.feed_version, change_log.version))
+
+        change_log.update({'1': _create_entity('1', 'A')})
+
+        changes = _parse_entities(change_log.changes_since(self.change_log.feed_version, change_log.version))
+        self.assertEqual(['3'], list(changes.keys()))
+        self.assertTrue(changes['3'].is_deleted)
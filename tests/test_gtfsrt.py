@@ -0,0 +1,110 @@
+import os
+import unittest
+
+from google.transit import gtfs_realtime_pb2
+from lxml.objectify import fromstring
+
+from vdv736gtfsrt.adapter.vdv import VdvStandardAdapter
+from vdv736gtfsrt.gtfsrt import create_translated_string, iso2unix, serialize_feed_entity, serialize_feed_header, serialize_feed_message
+from vdv736gtfsrt.gtfsrt import _parse_xs_datetime
+
+class GtfsRealtime_Test(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.adapter = VdvStandardAdapter({
+            'app': {
+                'adapter': {
+                    'url': {
+                        'de': 'https://yourdomain.com/alerts/de/[alertId]'
+                    }
+                }
+            }
+        })
+
+    def test_SerializeFeedMessage(self):
+
+        feed_message = gtfs_realtime_pb2.FeedMessage()
+        feed_message.header.gtfs_realtime_version = '2.0'
+        feed_message.header.incrementality = gtfs_realtime_pb2.FeedHeader.FULL_DATASET
+        feed_message.header.timestamp = 1729818014
+
+        serialized_entities = list()
+        for n in range(1, 5):
+            xml_filename = os.path.join(os.path.dirname(__file__), f"data/xml/SampleSituation{n}.xml")
+            with open(xml_filename, 'r') as xml_file:
+                situation = fromstring(xml_file.read())
+
+                feed_entity, _ = self.adapter.convert(situation, feed_message.entity.add())
+                serialized_entities.append(serialize_feed_entity(feed_entity))
+
+        self.assertEqual(
+            feed_message.SerializeToString(),
+            serialize_feed_message(serialize_feed_header(feed_message.header), serialized_entities)
+        )
+
+    def test_SerializeEmptyFeedMessage(self):
+
+        feed_message = gtfs_realtime_pb2.FeedMessage()
+        feed_message.header.gtfs_realtime_version = '2.0'
+        feed_message.header.timestamp = 1729818014
+
+        self.assertEqual(
+            feed_message.SerializeToString(),
+            serialize_feed_message(serialize_feed_header(feed_message.header), [])
+        )
+
+    def test_CreateTranslatedString(self):
+
+        texts = [
+            'Plain text without markup',
+            'Multiple   spaces\tand\ttabs',
+            '<b>Bold</b> text<br/>with  markup',
+            'Character &amp; entity references &lt;br&gt;'
+        ]
+
+        expected = [
+            'Plain text without markup',
+            'Multiple spacesandtabs',
+            'Bold textwith markup',
+            'Character & entity references <br>'
+        ]
+
+        # run twice, the second time the memoized texts are returned
+        for _ in range(0, 2):
+            result = create_translated_string(['DE'] * len(texts), texts)
+            self.assertEqual(expected, [t['text'] for t in result['translation']])
+            self.assertEqual(['de'] * len(texts), [t['language'] for t in result['translation']])
+
+        # the reused tag stripper must not keep any state of the previous texts
+        self.assertEqual('Text', create_translated_string(['de'], ['<p>Text'])['translation'][0]['text'])
+        self.assertEqual('Next', create_translated_string(['de'], ['Next</p>'])['translation'][0]['text'])
+
+    def test_Iso2Unix(self):
+
+        timestamps = {
+            '2024-06-10T02:00:00Z': 1717984800,
+            '2024-06-10T02:00:00.000Z': 1717984800,
+            '2024-06-10T02:00:00.9999999Z': 1717984800,
+            '2024-06-10T04:00:00+02:00': 1717984800,
+            '2024-06-09T23:30:00-02:30': 1717984800,
+            '2024-06-10T02:00:00': 1717984800,
+            '2024-06-09T24:00:00Z': 1717977600,
+            ' 2024-06-10T02:00:00Z\n': 1717984800,
+            '2500-12-31T00:00:00Z': 16756675200
+        }
+
+        for iso_timestamp, unix_timestamp in timestamps.items():
+            self.assertEqual(unix_timestamp, iso2unix(iso_timestamp), iso_timestamp)
+
+            # fallback parser used by older Python versions
+            if iso_timestamp.strip() != '2024-06-09T24:00:00Z':
+                self.assertEqual(unix_timestamp, int(_parse_xs_datetime(iso_timestamp.strip()).timestamp()), iso_timestamp)
+
+        # timestamps without timezone are local time of the configured timezone
+        self.assertEqual(1717977600, iso2unix('2024-06-10T02:00:00', 'Europe/Berlin'))
+        self.assertEqual(1704070800, iso2unix('2024-01-01T02:00:00', 'Europe/Berlin'))
+        self.assertEqual(1717984800, iso2unix('2024-06-10T02:00:00Z', 'Europe/Berlin'))
+
+        with self.assertRaises(ValueError):
+            iso2unix('10.06.2024 02:00')
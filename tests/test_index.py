@@ -0,0 +1,145 @@
+import random
+import unittest
+
+from google.transit import gtfs_realtime_pb2
+
+from vdv736gtfsrt.index import InformedEntityIndex
+
+def _create_alert(alert_id: str, informed_entities: list[dict], active_periods: list[dict] = []) -> tuple[gtfs_realtime_pb2.FeedEntity, bytes]:
+    alert = gtfs_realtime_pb2.FeedEntity()
+    alert.id = alert_id
+
+    for informed_entity in informed_entities:
+        alert.alert.informed_entity.add(**informed_entity)
+
+    for active_period in active_periods:
+        alert.alert.active_period.add(**active_period)
+
+    return alert, alert.SerializeToString()
+
+class InformedEntityIndex_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.alert1 = _create_alert('1', [{'route_id': 'R1', 'stop_id': 'S1'}, {'agency_id': 'A1'}], [{'start': 100, 'end': 200}])
+        self.alert2 = _create_alert('2', [{'route_id': 'R1'}, {'route_id': 'R2'}], [{'start': 300}])
+        self.alert3 = _create_alert('3', [{'stop_id': 'S1'}])
+
+        self.index = InformedEntityIndex().update([self.alert1, self.alert2, self.alert3])
+
+    def test_Query(self):
+        self.assertEqual([self.alert1[1], self.alert2[1]], self.index.query({'route_id': ['R1']}))
+        self.assertEqual([self.alert1[1], self.alert2[1]], self.index.query({'route_id': ['R1', 'R2']}))
+        self.assertEqual([self.alert1[1]], self.index.query({'route_id': ['R1'], 'stop_id': ['S1']}))
+        self.assertEqual([self.alert1[1]], self.index.query({'agency_id': ['A1']}))
+        self.assertEqual([], self.index.query({'route_id': ['R3']}))
+
+    def test_ActiveAt(self):
+        self.assertEqual([self.alert1[1], self.alert3[1]], self.index.query({}, 150))
+        self.assertEqual([self.alert2[1], self.alert3[1]], self.index.query({}, 400))
+        self.assertEqual([self.alert2[1]], self.index.query({'route_id': ['R1']}, 400))
+        self.assertEqual([], self.index.query({'route_id': ['R2']}, 150))
+
+    def test_Published(self):
+        self.assertEqual([self.alert1[1], self.alert3[1]], self.index.query({}, published=frozenset({'1', '3'})))
+        self.assertEqual([self.alert1[1]], self.index.query({'route_id': ['R1']}, published=frozenset({'1', '3'})))
+        self.assertEqual([self.alert3[1]], self.index.query({'stop_id': ['S1']}, 250, frozenset({'2', '3'})))
+
+    def test_Update(self):
+        changed_alert2 = _create_alert('2', [{'route_id': 'R3'}])
+        index = self.index.update([self.alert1, changed_alert2])
+
+        self.assertEqual([self.alert1[1]], index.query({'route_id': ['R1']}))
+        self.assertEqual([changed_alert2[1]], index.query({'route_id': ['R3']}))
+        self.assertEqual([self.alert1[1]], index.query({'stop_id': ['S1']}))
+        self.assertEqual(2, len(index))
+
+        # removed values are not kept as empty keys
+        self.assertNotIn('R2', index._index['route_id'])
+
+        # the previous index is not modified
+        self.assertEqual([self.alert1[1], self.alert2[1]], self.index.query({'route_id': ['R1']}))
+        self.assertEqual([self.alert1[1], self.alert3[1]], self.index.query({'stop_id': ['S1']}))
+
+    def test_ActiveBetween(self):
+        rng = random.Random(0)
+
+        alerts = list()
+        for n in range(200):
+            active_periods = list()
+            for _ in range(rng.randrange(0, 3)):
+                active_period = dict()
+                if rng.random() < 0.9:
+                    active_period['start'] = rng.randrange(0, 1000)
+                if rng.random() < 0.8:
+                    active_period['end'] = active_period.get('start', 0) + rng.randrange(0, 200)
+
+                active_periods.append(active_period)
+
+            alerts.append(_create_alert(str(n), [], active_periods))
+
+        index = InformedEntityIndex().update(alerts)
+
+        # compare the interval index with checking each active period
+        for _ in range(100):
+            lower = rng.randrange(-100, 1300)
+            upper = lower + rng.randrange(0, 100)
+
+            expected = set()
+            for alert, _ in alerts:
+                if len(alert.alert.active_period) == 0:
+                    expected.add(alert.id)
+
+                for p in alert.alert.active_period:
+                    if (not p.HasField('start') or p.start <= upper) and (not p.HasField('end') or p.end >= lower):
+                        expected.add(alert.id)
+
+            self.assertEqual(expected, index.active_between(lower, upper))
+
+    def test_IncrementalUpdate(self):
+        rng = random.Random(0)
+
+        def create_alerts(n: int) -> list:
+            active_periods = [{'start': rng.randrange(0, 1000), 'end': rng.randrange(1000, 2000)} for _ in range(rng.randrange(0, 3))]
+            return _create_alert(str(n), [{'route_id': f"R{rng.randrange(0, 10)}"}], active_periods)
+
+        alerts = {n: create_alerts(n) for n in range(500)}
+        index = InformedEntityIndex().update(alerts.values())
+
+        # small changes keep the interval tree and are applied as delta until it is rebuilt
+        num_rebuilds = 0
+        for _ in range(20):
+            for n in rng.sample(range(600), 5):
+                if n in alerts and rng.random() < 0.5:
+                    del alerts[n]
+                else:
+                    alerts[n] = create_alerts(n)
+
+            updated_index = index.update(alerts.values())
+            if updated_index._active_periods is not index._active_periods:
+                num_rebuilds += 1
+
+            index = updated_index
+            expected_index = InformedEntityIndex().update(alerts.values())
+
+            for _ in range(20):
+                lower = rng.randrange(-100, 2100)
+                upper = lower + rng.randrange(0, 100)
+
+                self.assertEqual(expected_index.active_between(lower, upper), index.active_between(lower, upper))
+                self.assertEqual(expected_index.next_window_change(lower, 10, 50), index.next_window_change(lower, 10, 50))
+
+            self.assertEqual(expected_index.query({'route_id': ['R1']}), index.query({'route_id': ['R1']}))
+
+        self.assertLess(num_rebuilds, 5)
+
+    def test_NextWindowChange(self):
+        # alert 1 enters the window [now - 10, now + 50] at 50 and leaves it at 211
+        self.assertEqual(50, self.index.next_window_change(0, 10, 50))
+        self.assertEqual(211, self.index.next_window_change(50, 10, 50))
+
+        # alert 2 enters the window at 250 and never leaves it
+        self.assertEqual(250, self.index.next_window_change(211, 10, 50))
+        self.assertIsNone(self.index.next_window_change(250, 10, 50))
+
+    def test_UnchangedIndex(self):
+        self.assertIs(self.index, self.index.update([self.alert1, self.alert2, self.alert3]))
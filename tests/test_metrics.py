@@ -0,0 +1,104 @@
+import threading
+import unittest
+
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from vdv736gtfsrt.metrics import MetricsListener
+from vdv736gtfsrt.metrics import MetricsRegistry
+
+class MetricsRegistry_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_Counter(self):
+        counter = self.registry.counter('test_requests_total', 'Requests', ('result',))
+
+        counter.labels('hit').inc()
+        counter.labels('hit').inc(2)
+        counter.labels('miss').inc()
+
+        content = self.registry.render().decode('utf-8')
+
+        self.assertIn('# TYPE test_requests_total counter', content)
+        self.assertIn('test_requests_total{result="hit"} 3', content)
+        self.assertIn('test_requests_total{result="miss"} 1', content)
+
+    def test_CounterThreads(self):
+        counter = self.registry.counter('test_increments_total', 'Increments')
+
+        def increment():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # values of terminated threads are retained
+        self.assertIn('test_increments_total 8000', self.registry.render().decode('utf-8'))
+        self.assertIn('test_increments_total 8000', self.registry.render().decode('utf-8'))
+
+    def test_Histogram(self):
+        histogram = self.registry.histogram('test_duration_seconds', 'Duration', buckets=(0.1, 1.0))
+
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(0.5)
+        histogram.observe(2.5)
+
+        content = self.registry.render().decode('utf-8')
+
+        self.assertIn('test_duration_seconds_bucket{le="0.1"} 2', content)
+        self.assertIn('test_duration_seconds_bucket{le="1"} 3', content)
+        self.assertIn('test_duration_seconds_bucket{le="+Inf"} 4', content)
+        self.assertIn('test_duration_seconds_sum 3.15', content)
+        self.assertIn('test_duration_seconds_count 4', content)
+
+    def test_Gauge(self):
+        gauge = self.registry.gauge('test_size_bytes', 'Size')
+
+        # gauges are only rendered after being set
+        self.assertNotIn('\ntest_size_bytes ', self.registry.render().decode('utf-8'))
+
+        gauge.set(1024)
+        self.assertIn('test_size_bytes 1024', self.registry.render().decode('utf-8'))
+
+    def test_LabelEscaping(self):
+        counter = self.registry.counter('test_errors_total', 'Errors', ('exception',))
+        counter.labels('Invalid "value"\\').inc()
+
+        self.assertIn('test_errors_total{exception="Invalid \\"value\\"\\\\"} 1', self.registry.render().decode('utf-8'))
+
+    def test_InvalidLabels(self):
+        counter = self.registry.counter('test_errors_total', 'Errors', ('exception',))
+
+        with self.assertRaises(ValueError):
+            counter.labels('ValueError', 'additional')
+
+        with self.assertRaises(ValueError):
+            self.registry.counter('test_errors_total', 'Errors')
+
+class MetricsListener_Test(unittest.TestCase):
+
+    def test_Scrape(self):
+        registry = MetricsRegistry()
+        registry.counter('test_requests_total', 'Requests').inc()
+
+        listener = MetricsListener(registry, '127.0.0.1', 0)
+        listener.start()
+
+        try:
+            with urlopen(f"http://127.0.0.1:{listener.port}/metrics") as response:
+                self.assertEqual(200, response.status)
+                self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+                self.assertIn(b'test_requests_total 1', response.read())
+
+            with self.assertRaises(HTTPError):
+                urlopen(f"http://127.0.0.1:{listener.port}/other")
+        finally:
+            listener.stop()
@@ -1,12 +1,22 @@
 import logging
 import os
 import responses
+import tempfile
 import threading
+import time
 import unittest
+import yaml
 
+from google.transit import gtfs_realtime_pb2
+from paho.mqtt import client
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.reasoncodes import ReasonCode
 from unittest.mock import patch
+from vdv736.delivery import xml2siri_delivery
 
+from tests.broker import MqttBrokerStandIn
 from vdv736gtfsrt.mqtt import GtfsRealtimePublisher
+from vdv736gtfsrt.mqtt import PublishPipeline
 
 class GtfsRealtimePublisher_Test(unittest.TestCase):
     
@@ -52,6 +62,9 @@ class GtfsRealtimePublisher_Test(unittest.TestCase):
         # disable logging output
         logging.basicConfig(handlers=[logging.NullHandler()])
 
+        # local broker instead of a public test broker
+        self.broker = MqttBrokerStandIn()
+
         return super().setUp()
     
     def test_ClosingSituation(self):
@@ -60,20 +73,23 @@ class GtfsRealtimePublisher_Test(unittest.TestCase):
         publish_feed_message_called: threading.Event = threading.Event()
 
         def publish_feed_message_patch(*args, **kws):
-            feed_message: dict = args[1]
+            feed_message: gtfs_realtime_pb2.FeedMessage = gtfs_realtime_pb2.FeedMessage.FromString(args[1])
 
-            if 'is_deleted' in feed_message['entity'][0] and feed_message['entity'][0]['is_deleted']:
+            if feed_message.entity[0].is_deleted:
                 publish_feed_message_called.set()
                 raise SystemExit()
 
+            return True
+
         # create instance of GtfsRealtimePublisher and mock it up for testing
         publisher: GtfsRealtimePublisher = GtfsRealtimePublisher(
             './tests/data/yaml/test.yaml',
-            'test.mosquitto.org',
-            '1883',
+            '127.0.0.1',
+            str(self.broker.port),
             None,
             None,
             '/gtfs/realtime/servicealerts',
+            'vdv736gtfsrt',
             300
         )
 
@@ -91,4 +107,348 @@ class GtfsRealtimePublisher_Test(unittest.TestCase):
         self.responder.stop()
         self.responder.reset()
 
-        return super().tearDown()
\ No newline at end of file
+        self.broker.stop()
+
+        return super().tearDown()
+
+class GtfsRealtimePublisherLifecycle_Test(unittest.TestCase):
+
+    def setUp(self):
+
+        self.responder = responses.RequestsMock(assert_all_requests_are_fired=False)
+        self.responder.start()
+
+        xml_filename = os.path.join(os.path.dirname(__file__), 'data/xml/SampleServiceDeliveryWithClosingSituation.xml')
+        with open(xml_filename, 'r') as xml_file:
+            xml_content = xml_file.read()
+
+        self.responder.add(
+            responses.POST,
+            'http://127.0.0.1:9091/request',
+            body=xml_content,
+            content_type='application/xml',
+            status=200
+        )
+
+        # disable logging output
+        logging.basicConfig(handlers=[logging.NullHandler()])
+
+        return super().setUp()
+
+    def test_Quit(self):
+
+        with patch('vdv736gtfsrt.mqtt.client.Client') as mqtt_client:
+            publisher: GtfsRealtimePublisher = GtfsRealtimePublisher(
+                './tests/data/yaml/test.yaml',
+                '127.0.0.1',
+                '1883',
+                None,
+                None,
+                '/gtfs/realtime/servicealerts/[alertId]',
+                'vdv736gtfsrt',
+                300
+            )
+
+            thread: threading.Thread = threading.Thread(target=publisher.run)
+            thread.start()
+
+            # the publisher must not spin while waiting for termination
+            process_time = time.process_time()
+            time.sleep(0.5)
+            self.assertLess(time.process_time() - process_time, 0.25)
+
+            publisher.quit()
+            thread.join(timeout=5)
+
+            self.assertFalse(thread.is_alive())
+
+            mqtt_client.return_value.publish.assert_called()
+            mqtt_client.return_value.loop_stop.assert_called_once()
+            mqtt_client.return_value.disconnect.assert_called_once()
+
+    def tearDown(self):
+        self.responder.stop()
+        self.responder.reset()
+
+        return super().tearDown()
+
+
+class GtfsRealtimePublisherDelivery_Test(unittest.TestCase):
+
+    def setUp(self):
+
+        # disable logging output
+        logging.basicConfig(handlers=[logging.NullHandler()])
+
+        self.mqtt_client_patch = patch('vdv736gtfsrt.mqtt.client.Client')
+        self.mqtt_client = self.mqtt_client_patch.start()
+        self.mqtt_client.return_value.publish.return_value.rc = client.MQTT_ERR_SUCCESS
+
+        self.deliveries = dict()
+        for name in ['SampleServiceDeliveryWithClosingSituation', 'SampleServiceDeliveryWithChangedSituationId']:
+            xml_filename = os.path.join(os.path.dirname(__file__), f"data/xml/{name}.xml")
+            with open(xml_filename, 'rb') as xml_file:
+                self.deliveries[name] = xml_file.read()
+
+        return super().setUp()
+    
+    def _create_publisher(self, keepalive: int|None = None, config_filename: str = './tests/data/yaml/test.yaml') -> GtfsRealtimePublisher:
+        return GtfsRealtimePublisher(
+            config_filename,
+            '127.0.0.1',
+            '1883',
+            None,
+            None,
+            '/gtfs/realtime/servicealerts/[alertId]',
+            'vdv736gtfsrt',
+            300,
+            keepalive
+        )
+    
+    def _published_feed_messages(self) -> list[gtfs_realtime_pb2.FeedMessage]:
+        return [gtfs_realtime_pb2.FeedMessage.FromString(c.args[1]) for c in self.mqtt_client.return_value.publish.call_args_list]
+
+    def test_UnchangedAlerts(self):
+        publisher = self._create_publisher()
+
+        publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithClosingSituation']))
+        publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithClosingSituation']))
+
+        self.assertEqual(1, len(self._published_feed_messages()))
+        self.assertEqual(1, publisher.num_published_messages)
+        self.assertEqual(1, publisher.num_skipped_messages)
+
+        # the closing situation disappears and is sent as deleted alert
+        publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithChangedSituationId']))
+
+        feed_messages = self._published_feed_messages()
+        
+        self.assertEqual(3, len(feed_messages))
+        self.assertFalse(feed_messages[1].entity[0].is_deleted)
+        self.assertTrue(feed_messages[2].entity[0].is_deleted)
+        self.assertEqual(feed_messages[0].entity[0].id, feed_messages[2].entity[0].id)
+
+    def test_DeliveryStream(self):
+        publisher = self._create_publisher()
+
+        # streamed and parsed deliveries share the same index of published alerts
+        publisher.process_delivery_stream(self.deliveries['SampleServiceDeliveryWithClosingSituation'])
+        publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithClosingSituation']))
+        publisher.process_delivery_stream(self.deliveries['SampleServiceDeliveryWithChangedSituationId'])
+
+        feed_messages = self._published_feed_messages()
+
+        self.assertEqual(3, len(feed_messages))
+        self.assertEqual(1, publisher.num_skipped_messages)
+        self.assertTrue(feed_messages[2].entity[0].is_deleted)
+        self.assertEqual(feed_messages[0].entity[0].id, feed_messages[2].entity[0].id)
+
+    def test_Keepalive(self):
+        publisher = self._create_publisher(0)
+
+        publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithClosingSituation']))
+        publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithClosingSituation']))
+
+        self.assertEqual(2, len(self._published_feed_messages()))
+        self.assertEqual(0, publisher.num_skipped_messages)
+
+    def test_FailedMessages(self):
+        publisher = self._create_publisher()
+        publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithClosingSituation']))
+
+        # messages are dropped after losing the connection, neither the alert nor its deletion is recorded as published
+        mqtt = self.mqtt_client.return_value
+        mqtt.on_disconnect(mqtt, None, client.DisconnectFlags(False), ReasonCode(PacketTypes.DISCONNECT, 'Unspecified error'), None)
+
+        publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithChangedSituationId']))
+
+        self.assertEqual(1, len(self._published_feed_messages()))
+        self.assertEqual(1, publisher.num_published_messages)
+        self.assertEqual(2, publisher._publish_pipeline.statistics['dropped'])
+        self.assertIn('ef478576-d1a8-527e-8820-5164ca986128', publisher._last_processed_index)
+
+        # both are published with the next delivery after reconnecting
+        mqtt.on_connect(mqtt, None, client.ConnectFlags(False), ReasonCode(PacketTypes.CONNACK, 'Success'), None)
+
+        publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithChangedSituationId']))
+
+        feed_messages = self._published_feed_messages()
+
+        self.assertEqual(3, len(feed_messages))
+        self.assertEqual(3, publisher.num_published_messages)
+        self.assertTrue(feed_messages[2].entity[0].is_deleted)
+        self.assertNotIn('ef478576-d1a8-527e-8820-5164ca986128', publisher._last_processed_index)
+
+    def test_WarmStart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open('./tests/data/yaml/test.yaml', 'r') as config_file:
+                config = yaml.safe_load(config_file)
+
+            config['app']['warm_start_enabled'] = True
+            config['warm_start'] = {'warm_start_filename': os.path.join(directory, 'warmstart.bin')}
+
+            config_filename = os.path.join(directory, 'config.yaml')
+            with open(config_filename, 'w') as config_file:
+                yaml.safe_dump(config, config_file)
+
+            publisher = self._create_publisher(config_filename=config_filename)
+            publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithClosingSituation']))
+
+            # the restarted publisher knows the published alerts and deletes them if they have disappeared meanwhile
+            restarted_publisher = self._create_publisher(config_filename=config_filename)
+
+            restarted_publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithClosingSituation']))
+            self.assertEqual(1, restarted_publisher.num_skipped_messages)
+
+            restarted_publisher._subscriber_on_delivery(xml2siri_delivery(self.deliveries['SampleServiceDeliveryWithChangedSituationId']))
+
+            feed_messages = self._published_feed_messages()
+
+            self.assertEqual(3, len(feed_messages))
+            self.assertTrue(feed_messages[2].entity[0].is_deleted)
+            self.assertEqual(feed_messages[0].entity[0].id, feed_messages[2].entity[0].id)
+
+    def tearDown(self):
+        self.mqtt_client_patch.stop()
+
+        return super().tearDown()
+
+
+class PublishPipeline_Test(unittest.TestCase):
+
+    def _connect(self, broker: MqttBrokerStandIn, max_inflight_messages: int, timeout: float = 30.0) -> tuple[client.Client, PublishPipeline]:
+        mqtt = client.Client(client.CallbackAPIVersion.VERSION2, protocol=client.MQTTv5, client_id='vdv736gtfsrt')
+
+        # the in-flight window can only be set before connecting
+        pipeline = PublishPipeline(mqtt, 1, max_inflight_messages, timeout)
+
+        mqtt.connect('127.0.0.1', broker.port)
+        mqtt.loop_start()
+
+        return mqtt, pipeline
+
+    def _disconnect(self, mqtt: client.Client, broker: MqttBrokerStandIn) -> None:
+        mqtt.disconnect()
+        mqtt.loop_stop()
+
+        broker.stop()
+
+    def test_ConfirmedMessages(self):
+        broker = MqttBrokerStandIn()
+        mqtt, pipeline = self._connect(broker, 5)
+        for n in range(0, 50):
+            self.assertTrue(pipeline.publish(f"gtfs/realtime/servicealerts/{n}", b'payload', True, None))
+
+        self.assertTrue(pipeline.flush(5))
+
+        statistics = pipeline.statistics
+        self.assertEqual(50, statistics['published'])
+        self.assertEqual(50, statistics['confirmed'])
+        self.assertEqual(0, statistics['dropped'])
+        self.assertEqual(0, statistics['inflight'])
+
+        self.assertEqual(50, len(broker.messages))
+        self.assertTrue(all(qos == 1 and retain for _, _, qos, retain in broker.messages))
+
+        self._disconnect(mqtt, broker)
+
+    def test_Backpressure(self):
+        broker = MqttBrokerStandIn(acknowledge=False)
+        mqtt, pipeline = self._connect(broker, 2, 0.5)
+
+        with self.assertLogs(level='ERROR'):
+            results = [pipeline.publish(f"gtfs/realtime/servicealerts/{n}", b'payload', True, None) for n in range(0, 3)]
+
+        self.assertEqual([True, True, False], results)
+
+        statistics = pipeline.statistics
+        self.assertEqual(2, statistics['published'])
+        self.assertEqual(0, statistics['confirmed'])
+        self.assertEqual(1, statistics['dropped'])
+        self.assertEqual(2, statistics['inflight'])
+
+        self.assertFalse(pipeline.flush(0.1))
+
+        self._disconnect(mqtt, broker)
+
+    def test_ConnectionLost(self):
+        broker = MqttBrokerStandIn()
+        mqtt, pipeline = self._connect(broker, 5)
+
+        self.assertTrue(pipeline.publish('gtfs/realtime/servicealerts/0', b'payload', True, None))
+        self.assertTrue(pipeline.flush(5))
+
+        self._disconnect(mqtt, broker)
+
+        # messages are dropped at once instead of waiting for the timeout
+        start = time.monotonic()
+        self.assertFalse(pipeline.publish('gtfs/realtime/servicealerts/1', b'payload', True, None))
+        self.assertLess(time.monotonic() - start, 1.0)
+
+        statistics = pipeline.statistics
+        self.assertEqual(1, statistics['published'])
+        self.assertEqual(1, statistics['dropped'])
+
+
+class GtfsRealtimePublisherBroker_Test(unittest.TestCase):
+
+    def test_PublishDelivery(self):
+        broker = MqttBrokerStandIn()
+
+        publisher = GtfsRealtimePublisher(
+            './tests/data/yaml/test.yaml',
+            '127.0.0.1',
+            str(broker.port),
+            None,
+            None,
+            '/gtfs/realtime/servicealerts/[alertId]',
+            'vdv736gtfsrt',
+            300
+        )
+
+        xml_filename = os.path.join(os.path.dirname(__file__), 'data/xml/SampleServiceDeliveryWithClosingSituation.xml')
+        with open(xml_filename, 'rb') as xml_file:
+            publisher._subscriber_on_delivery(xml2siri_delivery(xml_file.read()))
+
+        self.assertTrue(broker.wait_for_messages(1, 5))
+        self.assertTrue(publisher.flush(5))
+
+        topic, payload, qos, retain = broker.messages[0]
+        feed_message = gtfs_realtime_pb2.FeedMessage.FromString(payload)
+
+        self.assertEqual('gtfs/realtime/servicealerts/ef478576-d1a8-527e-8820-5164ca986128', topic)
+        self.assertEqual(1, qos)
+        self.assertTrue(retain)
+        self.assertEqual(gtfs_realtime_pb2.FeedHeader.DIFFERENTIAL, feed_message.header.incrementality)
+
+        publisher.close()
+
+        broker.stop()
+
+    def test_ReplayDeliveries(self):
+        broker = MqttBrokerStandIn()
+
+        publisher = GtfsRealtimePublisher(
+            './tests/data/yaml/test.yaml',
+            '127.0.0.1',
+            str(broker.port),
+            None,
+            None,
+            '/gtfs/realtime/servicealerts/[alertId]',
+            'vdv736gtfsrt',
+            300
+        )
+
+        # recorded deliveries are streamed from their files as complete deliveries
+        for name in ['SampleServiceDeliveryWithClosingSituation', 'SampleServiceDeliveryWithChangedSituationId']:
+            publisher.process_delivery_stream(os.path.join(os.path.dirname(__file__), f"data/xml/{name}.xml"))
+
+        publisher.close()
+
+        self.assertEqual(3, len(broker.messages))
+
+        feed_messages = [gtfs_realtime_pb2.FeedMessage.FromString(payload) for _, payload, _, _ in broker.messages]
+        self.assertTrue(feed_messages[2].entity[0].is_deleted)
+        self.assertEqual(feed_messages[0].entity[0].id, feed_messages[2].entity[0].id)
+
+        broker.stop()
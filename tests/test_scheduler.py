@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from vdv736gtfsrt.scheduler import AsyncScheduler
+
+class _RecordingFunction:
+
+    def __init__(self, duration: float = 0.0, results: list = None) -> None:
+        self.duration = duration
+        self.results = results if results is not None else list()
+
+        self.started: list[float] = list()
+        self.num_active: int = 0
+        self.max_active: int = 0
+
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.started.append(time.monotonic())
+            self.num_active += 1
+            self.max_active = max(self.max_active, self.num_active)
+
+            index = len(self.started) - 1
+
+        time.sleep(self.duration)
+
+        with self._lock:
+            self.num_active -= 1
+
+        if index < len(self.results):
+            result = self.results[index]
+            if isinstance(result, Exception):
+                raise result
+
+            return result
+
+        return True
+
+class AsyncScheduler_Test(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.scheduler = AsyncScheduler()
+
+    async def asyncTearDown(self):
+        await self.scheduler.stop()
+
+    async def test_FixedRate(self):
+        function = _RecordingFunction(0.05)
+        self.scheduler.schedule('fixed_rate', 0.1, function, immediately=True)
+
+        self.scheduler.start()
+        await asyncio.sleep(0.75)
+        await self.scheduler.stop()
+
+        # the runtime of the function must not delay subsequent runs
+        self.assertGreaterEqual(len(function.started), 7)
+        offsets = [started - function.started[0] for started in function.started]
+        for tick, offset in enumerate(offsets):
+            self.assertAlmostEqual(tick * 0.1, offset, delta=0.04)
+
+    async def test_SkipOverlappingRuns(self):
+        function = _RecordingFunction(0.25)
+        job = self.scheduler.schedule('skip', 0.1, function, immediately=True, overlap_policy='skip')
+
+        self.scheduler.start()
+        await asyncio.sleep(0.6)
+        await self.scheduler.stop()
+
+        self.assertEqual(1, function.max_active)
+        self.assertGreater(job.num_skipped_runs, 0)
+
+        # the next run starts at the next tick after the previous run has finished
+        self.assertAlmostEqual(0.3, function.started[1] - function.started[0], delta=0.04)
+
+    async def test_QueueOverlappingRuns(self):
+        function = _RecordingFunction(0.25)
+        job = self.scheduler.schedule('queue', 0.1, function, immediately=True, overlap_policy='queue')
+
+        self.scheduler.start()
+        await asyncio.sleep(0.6)
+        await self.scheduler.stop()
+
+        self.assertEqual(1, function.max_active)
+        self.assertGreater(job.num_skipped_runs, 0)
+
+        # the missed run is started directly after the previous run has finished
+        self.assertAlmostEqual(0.25, function.started[1] - function.started[0], delta=0.04)
+
+    async def test_ExponentialBackoff(self):
+        function = _RecordingFunction(results=[False, False, False, False, True])
+        job = self.scheduler.schedule('backoff', 0.05, function, immediately=True, max_backoff=0.3)
+
+        self.scheduler.start()
+        await asyncio.sleep(1.2)
+        await self.scheduler.stop()
+
+        self.assertGreaterEqual(len(function.started), 6)
+
+        # the delays are doubled after each failure and capped by the maximum backoff,
+        # the successful run restores the regular interval
+        gaps = [function.started[i + 1] - function.started[i] for i in range(5)]
+        for expected, gap in zip([0.1, 0.2, 0.3, 0.3, 0.05], gaps):
+            self.assertAlmostEqual(expected, gap, delta=0.04)
+
+        self.assertEqual(0, job.num_failures)
+
+    async def test_FailingFunction(self):
+        function = _RecordingFunction(results=[RuntimeError('request failed')])
+        job = self.scheduler.schedule('failure', 10, function, immediately=True)
+
+        with self.assertLogs('uvicorn', level='ERROR'):
+            self.scheduler.start()
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(1, job.num_runs)
+        self.assertEqual(1, job.num_failures)
+
+    async def test_ScheduleOnce(self):
+        function = _RecordingFunction()
+
+        self.scheduler.start()
+
+        # a pending run with the same name is replaced
+        self.scheduler.schedule_once('once', 0.5, function)
+        self.scheduler.schedule_once('once', 0.1, function)
+
+        await asyncio.sleep(0.8)
+
+        self.assertEqual(1, len(function.started))
+
+    def test_InvalidOverlapPolicy(self):
+        with self.assertRaises(ValueError):
+            self.scheduler.schedule('invalid', 1, lambda: True, overlap_policy='parallel')
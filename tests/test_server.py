@@ -0,0 +1,576 @@
+import asyncio
+import base64
+import httpx
+import os
+import tempfile
+import time
+import unittest
+import yaml
+
+from fastapi.testclient import TestClient
+from google.transit import gtfs_realtime_pb2
+from lxml.objectify import fromstring
+from unittest.mock import patch
+
+from vdv736gtfsrt.server import GtfsRealtimeServer
+
+class _SubscriberStub:
+
+    def __init__(self, situations: dict) -> None:
+        self.situations = situations
+        self.available = True
+
+    def get_situations(self) -> dict:
+        return dict(self.situations)
+    
+    def request(self, publisher_id: str) -> bool:
+        return self.available
+    
+    def status(self) -> bool:
+        return self.available
+
+class _SchedulerStub:
+
+    def __init__(self) -> None:
+        self.runs: dict[str, float] = dict()
+
+    def schedule_once(self, name: str, delay: float, function) -> None:
+        self.runs[name] = delay
+
+def _load_situations() -> dict:
+    situations = dict()
+    for n in range(1, 5):
+        xml_filename = os.path.join(os.path.dirname(__file__), f"data/xml/SampleSituation{n}.xml")
+        with open(xml_filename, 'r') as xml_file:
+            situation = fromstring(xml_file.read())
+            situations[str(situation.SituationNumber)] = situation
+
+    return situations
+
+def _create_server(situations: dict, app_config: dict, sections: dict = {}) -> GtfsRealtimeServer:
+    with open('./tests/data/yaml/test.yaml', 'r') as config_file:
+        config = yaml.safe_load(config_file)
+
+    config['app'].update(app_config)
+    config.update(sections)
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_filename = os.path.join(directory, 'config.yaml')
+        with open(config_filename, 'w') as config_file:
+            yaml.safe_dump(config, config_file)
+
+        server = GtfsRealtimeServer(config_filename)
+    
+    server._subscriber = _SubscriberStub(situations)
+
+    return server
+
+class GtfsRealtimeServer_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.situations = _load_situations()
+
+        self.server = GtfsRealtimeServer('./tests/data/yaml/test.yaml')
+        self.server._subscriber = _SubscriberStub(self.situations)
+
+        # lifespan is not run by the TestClient unless used as context manager
+        self.client = TestClient(self.server.create())
+
+    def _create_server(self, app_config: dict, sections: dict = {}) -> GtfsRealtimeServer:
+        return _create_server(self.situations, app_config, sections)
+
+    def test_SnapshotIsRenderedOnce(self):
+        self.server._update_feed_snapshot()
+
+        with patch.object(self.server._adapter, 'convert', wraps=self.server._adapter.convert) as convert:
+            for _ in range(3):
+                response = self.client.get('/gtfsrt-service-alerts.pbf')
+                self.assertEqual(200, response.status_code)
+
+            convert.assert_not_called()
+
+        feed_message = gtfs_realtime_pb2.FeedMessage()
+        feed_message.ParseFromString(response.content)
+
+        self.assertEqual(4, len(feed_message.entity))
+
+    def test_SnapshotIsUpdated(self):
+        self.server._update_feed_snapshot()
+
+        first_snapshot = self.server._feed_snapshot
+        del self.situations['ef478576-d1a8-527e-8820-5164ca986128']
+
+        self.server._update_feed_snapshot()
+
+        self.assertIsNot(first_snapshot, self.server._feed_snapshot)
+        self.assertEqual(3, self.server._feed_snapshot.num_entities)
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf?debug')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/json', response.headers['content-type'])
+        self.assertEqual(3, len(response.json()['entity']))
+
+    def test_ClosingSituation(self):
+        self.server._update_feed_snapshot()
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf?debug')
+        closing_alert = [e for e in response.json()['entity'] if e['id'] == '4386282e-9cfd-56a3-863b-27026c59d34f_____NVBW-EMS'][0]
+
+        self.assertEqual('NO_EFFECT', closing_alert['alert']['effect'])
+        for active_period in closing_alert['alert']['active_period']:
+            self.assertNotIn('end', active_period)
+
+    def test_ConditionalRequest(self):
+        self.server._update_feed_snapshot()
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf')
+        etag = response.headers['etag']
+        last_modified = response.headers['last-modified']
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf', headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf', headers={'If-Modified-Since': last_modified})
+        self.assertEqual(304, response.status_code)
+
+        # the JSON view is a different representation with its own ETag
+        response = self.client.get('/gtfsrt-service-alerts.pbf?debug', headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_code)
+
+        # unchanged situations keep the snapshot and its ETag
+        self.server._update_feed_snapshot()
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf', headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_code)
+
+        del self.situations['ef478576-d1a8-527e-8820-5164ca986128']
+        self.server._update_feed_snapshot()
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf', headers={'If-None-Match': etag})
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers['etag'])
+
+    def test_HeaderIsRestamped(self):
+        self.server._update_feed_snapshot()
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf')
+        timestamp = gtfs_realtime_pb2.FeedMessage.FromString(response.content).header.timestamp
+
+        create_feed_header = self.server._create_feed_header
+        def create_later_feed_header():
+            feed_header = create_feed_header()
+            feed_header.timestamp += 60
+
+            return feed_header
+
+        # unchanged situations are delivered again a minute later
+        with patch.object(self.server, '_create_feed_header', side_effect=create_later_feed_header):
+            self.server._update_feed_snapshot()
+
+        later_response = self.client.get('/gtfsrt-service-alerts.pbf')
+        feed_message = gtfs_realtime_pb2.FeedMessage.FromString(later_response.content)
+
+        self.assertGreaterEqual(feed_message.header.timestamp, timestamp + 60)
+        self.assertEqual(4, len(feed_message.entity))
+        self.assertEqual(response.headers['etag'], later_response.headers['etag'])
+        self.assertEqual(response.headers['last-modified'], later_response.headers['last-modified'])
+
+    def test_HeaderIsRestampedByStatusRequest(self):
+        self.server._update_feed_snapshot()
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf')
+        timestamp = gtfs_realtime_pb2.FeedMessage.FromString(response.content).header.timestamp
+
+        create_feed_header = self.server._create_feed_header
+        def create_later_feed_header():
+            feed_header = create_feed_header()
+            feed_header.timestamp += 60
+
+            return feed_header
+
+        # the publisher is reachable a minute later, but has not sent a delivery
+        with patch.object(self.server, '_create_feed_header', side_effect=create_later_feed_header):
+            self.assertTrue(self.server._subscriber_status_request())
+
+        later_response = self.client.get('/gtfsrt-service-alerts.pbf')
+        feed_message = gtfs_realtime_pb2.FeedMessage.FromString(later_response.content)
+
+        self.assertGreaterEqual(feed_message.header.timestamp, timestamp + 60)
+        self.assertEqual(4, len(feed_message.entity))
+        self.assertEqual(response.headers['etag'], later_response.headers['etag'])
+
+        # the header is not stamped again while the publisher is unreachable
+        self.server._subscriber.available = False
+        self.assertFalse(self.server._subscriber_status_request())
+
+        self.assertEqual(feed_message.header.timestamp, gtfs_realtime_pb2.FeedMessage.FromString(self.client.get('/gtfsrt-service-alerts.pbf').content).header.timestamp)
+
+    def test_CompressedResponse(self):
+        self.server._update_feed_snapshot()
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('content-encoding', response.headers)
+        self.assertEqual('Accept-Encoding', response.headers['vary'])
+
+        identity_etag = response.headers['etag']
+        identity_content = response.content
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual('gzip', response.headers['content-encoding'])
+        self.assertNotEqual(identity_etag, response.headers['etag'])
+        self.assertEqual(identity_content, response.content)
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf?debug', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual('gzip', response.headers['content-encoding'])
+        self.assertEqual(4, len(response.json()['entity']))
+
+    def test_NegotiateEncoding(self):
+        self.assertEqual('gzip', self.server._negotiate_encoding('gzip, deflate', ['br', 'gzip']))
+        self.assertEqual('br', self.server._negotiate_encoding('gzip, deflate, br', ['br', 'gzip']))
+        self.assertEqual('gzip', self.server._negotiate_encoding('gzip;q=1.0, br;q=0.5', ['br', 'gzip']))
+        self.assertEqual('br', self.server._negotiate_encoding('*', ['br', 'gzip']))
+        self.assertIsNone(self.server._negotiate_encoding('gzip;q=0', ['br', 'gzip']))
+        self.assertIsNone(self.server._negotiate_encoding('', ['br', 'gzip']))
+        self.assertIsNone(self.server._negotiate_encoding('gzip', []))
+
+    def test_Metrics(self):
+        # second update converts no situation again
+        self.server._update_feed_snapshot()
+        self.server._update_feed_snapshot()
+
+        for _ in range(2):
+            self.client.get('/gtfsrt-service-alerts.pbf')
+
+        content = self.server._metrics.render().decode('utf-8')
+
+        self.assertIn('vdv736gtfsrt_conversion_duration_seconds_count{adapter="VdvStandardAdapter"} 4', content)
+        self.assertIn('vdv736gtfsrt_conversion_cache_requests_total{result="hit"} 4', content)
+        self.assertIn('vdv736gtfsrt_conversion_cache_requests_total{result="miss"} 4', content)
+        self.assertIn('vdv736gtfsrt_feed_entities 4', content)
+        self.assertIn(f"vdv736gtfsrt_feed_size_bytes {len(self.server._feed_snapshot.pbf)}", content)
+
+        # metrics are not exposed unless enabled
+        self.assertEqual(404, self.client.get('/metrics').status_code)
+
+    def test_MetricsEndpoint(self):
+        server = self._create_server({'metrics_enabled': True})
+        server._update_feed_snapshot()
+
+        response = TestClient(server.create()).get('/metrics')
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.headers['content-type'].startswith('text/plain'))
+        self.assertIn('vdv736gtfsrt_feed_entities 4', response.text)
+
+    def test_StaleFeed(self):
+        self.server._config['app']['stale_feed_max_age'] = 60
+
+        self.assertTrue(self.server._subscriber_direct_request())
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf')
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn('warning', response.headers)
+
+        # the last good feed is served while the publisher is unreachable
+        self.server._subscriber.available = False
+        del self.situations['ef478576-d1a8-527e-8820-5164ca986128']
+
+        self.assertFalse(self.server._subscriber_direct_request())
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('110 - "Response is Stale"', response.headers['warning'])
+        self.assertIn('age', response.headers)
+        self.assertEqual(4, len(gtfs_realtime_pb2.FeedMessage.FromString(response.content).entity))
+
+        # the feed is not served anymore after exceeding the maximum age
+        self.server._feed_refreshed_at -= 120
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf')
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('5', response.headers['retry-after'])
+
+        self.server._subscriber.available = True
+        self.assertTrue(self.server._subscriber_direct_request())
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf')
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn('warning', response.headers)
+        self.assertEqual(3, len(gtfs_realtime_pb2.FeedMessage.FromString(response.content).entity))
+
+    def test_FilteredFeed(self):
+        self.server._update_feed_snapshot()
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf?route_id=85:823:15')
+        self.assertEqual(200, response.status_code)
+
+        feed_message = gtfs_realtime_pb2.FeedMessage.FromString(response.content)
+        self.assertEqual(['18acba15-9669-58af-91f1-7a0a3a9c3b98'], [e.id for e in feed_message.entity])
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf?stop_id=8588794&stop_id=7901106&debug')
+        self.assertEqual(2, len(response.json()['entity']))
+
+        # same filters result in the same ETag, conditional requests are supported
+        etag = response.headers['etag']
+        response = self.client.get('/gtfsrt-service-alerts.pbf?stop_id=7901106&stop_id=8588794&debug', headers={'If-None-Match': etag})
+        self.assertEqual(304, response.status_code)
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf?active_at=1728900000', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('content-encoding', response.headers)
+        self.assertEqual(2, len(gtfs_realtime_pb2.FeedMessage.FromString(response.content).entity))
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf?active_at=tomorrow')
+        self.assertEqual(400, response.status_code)
+
+    def test_PublicationWindow(self):
+        self.server._config['app']['publication_window_enabled'] = True
+        self.server._scheduler = _SchedulerStub()
+
+        # situation 1 is active since 2024-06-10, situation 2 from 1728874800 to 1730077200,
+        # situations 3 and 4 are active in 2025
+        with patch('vdv736gtfsrt.server.time.time', return_value=1728000000):
+            self.server._update_feed_snapshot()
+
+        self.assertEqual(1, self.server._feed_snapshot.num_entities)
+
+        # the feed is rendered again when situation 2 enters the publication window
+        self.assertAlmostEqual(1728874800 - 604800 - 1728000000, self.server._scheduler.runs['publication_window'], delta=1)
+
+        with patch('vdv736gtfsrt.server.time.time', return_value=1728874800 - 604800):
+            self.server._update_feed_snapshot()
+
+        self.assertEqual(2, self.server._feed_snapshot.num_entities)
+
+        # filtered feeds are limited to the publication window unless asking for a certain time
+        response = self.client.get('/gtfsrt-service-alerts.pbf?route_id=vpe:04734:_:H:j25')
+        self.assertEqual(0, len(gtfs_realtime_pb2.FeedMessage.FromString(response.content).entity))
+
+        response = self.client.get('/gtfsrt-service-alerts.pbf?route_id=vpe:04734:_:H:j25&active_at=1748780000')
+        self.assertEqual(1, len(gtfs_realtime_pb2.FeedMessage.FromString(response.content).entity))
+
+        # situation 2 leaves the publication window one hour after its end
+        with patch('vdv736gtfsrt.server.time.time', return_value=1730077200 + 3600 + 1):
+            self.server._update_feed_snapshot()
+
+        self.assertEqual(1, self.server._feed_snapshot.num_entities)
+
+    def test_DifferentialFeed(self):
+        server = self._create_server({'differential_enabled': True})
+        server._update_feed_snapshot()
+
+        client = TestClient(server.create())
+
+        # clients without version receive the full dataset including the current version
+        response = client.get('/gtfsrt-service-alerts-differential.pbf')
+        feed_message = gtfs_realtime_pb2.FeedMessage.FromString(response.content)
+        feed_version = feed_message.header.feed_version
+
+        self.assertEqual(gtfs_realtime_pb2.FeedHeader.FULL_DATASET, feed_message.header.incrementality)
+        self.assertEqual(4, len(feed_message.entity))
+
+        response = client.get(f"/gtfsrt-service-alerts-differential.pbf?version={feed_version}")
+        feed_message = gtfs_realtime_pb2.FeedMessage.FromString(response.content)
+
+        self.assertEqual(gtfs_realtime_pb2.FeedHeader.DIFFERENTIAL, feed_message.header.incrementality)
+        self.assertEqual(0, len(feed_message.entity))
+
+        # removed situations are sent as deleted entities
+        del self.situations['ef478576-d1a8-527e-8820-5164ca986128']
+        server._update_feed_snapshot()
+
+        response = client.get(f"/gtfsrt-service-alerts-differential.pbf?version={feed_version}")
+        feed_message = gtfs_realtime_pb2.FeedMessage.FromString(response.content)
+
+        self.assertEqual(gtfs_realtime_pb2.FeedHeader.DIFFERENTIAL, feed_message.header.incrementality)
+        self.assertNotEqual(feed_version, feed_message.header.feed_version)
+        self.assertEqual(['ef478576-d1a8-527e-8820-5164ca986128'], [e.id for e in feed_message.entity])
+        self.assertTrue(feed_message.entity[0].is_deleted)
+
+        # unknown versions receive the full dataset
+        response = client.get('/gtfsrt-service-alerts-differential.pbf?version=unknown-1')
+        feed_message = gtfs_realtime_pb2.FeedMessage.FromString(response.content)
+
+        self.assertEqual(gtfs_realtime_pb2.FeedHeader.FULL_DATASET, feed_message.header.incrementality)
+        self.assertEqual(3, len(feed_message.entity))
+
+    def test_WarmStart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sections = {'warm_start': {'warm_start_filename': os.path.join(directory, 'warmstart.bin')}}
+
+            server = self._create_server({'warm_start_enabled': True, 'differential_enabled': True}, sections)
+            server._update_feed_snapshot()
+
+            feed_version = server._change_log.feed_version
+
+            # the restarted server serves the last known alerts before the first delivery
+            restarted_server = self._create_server({'warm_start_enabled': True, 'differential_enabled': True}, sections)
+            restarted_server._subscriber = _SubscriberStub(dict())
+            restarted_server._restore_warm_start()
+
+            with patch.object(restarted_server._adapter, 'convert', wraps=restarted_server._adapter.convert) as convert:
+                restarted_server._update_feed_snapshot()
+                convert.assert_not_called()
+
+            client = TestClient(restarted_server.create())
+
+            response = client.get('/gtfsrt-service-alerts.pbf')
+            feed_message = gtfs_realtime_pb2.FeedMessage.FromString(response.content)
+
+            self.assertEqual(200, response.status_code)
+            self.assertIn('Warning', response.headers)
+            self.assertEqual(4, len(feed_message.entity))
+            self.assertEqual(feed_version, feed_message.header.feed_version)
+
+            # the first delivery replaces the restored situations
+            situations = dict(self.situations)
+            del situations['ef478576-d1a8-527e-8820-5164ca986128']
+
+            restarted_server._subscriber = _SubscriberStub(situations)
+            restarted_server._subscriber_direct_request()
+
+            response = client.get(f"/gtfsrt-service-alerts-differential.pbf?version={feed_version}")
+            feed_message = gtfs_realtime_pb2.FeedMessage.FromString(response.content)
+
+            self.assertNotIn('Warning', response.headers)
+            self.assertEqual(['ef478576-d1a8-527e-8820-5164ca986128'], [e.id for e in feed_message.entity])
+            self.assertTrue(feed_message.entity[0].is_deleted)
+
+    def test_WarmStartConfirmedByDelivery(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'warmstart.bin')
+            sections = {'warm_start': {'warm_start_filename': filename}}
+
+            # the file has been written two days ago, but the situations have not changed since then
+            written = time.time() - 172800
+            with patch('vdv736gtfsrt.warmstart.time.time', return_value=written):
+                server = self._create_server({'warm_start_enabled': True}, sections)
+                server._update_feed_snapshot()
+
+            os.utime(filename, (written, written))
+
+            restarted_server = self._create_server({'warm_start_enabled': True}, sections)
+            with self.assertLogs('uvicorn', level='WARNING'):
+                restarted_server._restore_warm_start()
+
+            self.assertIsNone(restarted_server._restored_situations)
+
+            # an unchanged delivery confirms the file without writing it again
+            with patch.object(server._warm_start_file, 'write') as write:
+                server._subscriber_direct_request()
+                write.assert_not_called()
+
+            restarted_server = self._create_server({'warm_start_enabled': True}, sections)
+            restarted_server._restore_warm_start()
+
+            self.assertEqual(4, len(restarted_server._restored_situations))
+
+    def test_InvalidWarmStartFile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'warmstart.bin')
+            with open(filename, 'wb') as warm_start_file:
+                warm_start_file.write(b'invalid')
+
+            server = self._create_server({'warm_start_enabled': True}, {'warm_start': {'warm_start_filename': filename}})
+
+            with self.assertLogs('uvicorn', level='ERROR'):
+                server._restore_warm_start()
+
+            server._update_feed_snapshot()
+            self.assertEqual(4, server._feed_snapshot.num_entities)
+
+class GtfsRealtimeServerStreaming_Test(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.situations = _load_situations()
+
+        self.server = _create_server(self.situations, {'differential_enabled': True, 'streaming_enabled': True})
+        self.server._broadcaster.start()
+        self.server._update_feed_snapshot()
+
+    async def _read_event(self, events) -> tuple[str, gtfs_realtime_pb2.FeedMessage]:
+        event = dict(line.split(': ', 1) for line in (await anext(events)).decode('utf-8').strip().split('\n'))
+        return event['event'], gtfs_realtime_pb2.FeedMessage.FromString(base64.b64decode(event['data']))
+
+    async def test_StreamEvents(self):
+        events = self.server._stream_events(None)
+
+        # new clients receive the full dataset first
+        event, feed_message = await self._read_event(events)
+        self.assertEqual('full', event)
+        self.assertEqual(4, len(feed_message.entity))
+        self.assertEqual(1, self.server._broadcaster.num_clients)
+
+        # changes are pushed as soon as the feed is rendered again
+        del self.situations['ef478576-d1a8-527e-8820-5164ca986128']
+        await asyncio.to_thread(self.server._update_feed_snapshot)
+
+        event, feed_message = await self._read_event(events)
+        self.assertEqual('differential', event)
+        self.assertEqual(gtfs_realtime_pb2.FeedHeader.DIFFERENTIAL, feed_message.header.incrementality)
+        self.assertEqual(self.server._change_log.feed_version, feed_message.header.feed_version)
+        self.assertEqual(['ef478576-d1a8-527e-8820-5164ca986128'], [e.id for e in feed_message.entity])
+        self.assertTrue(feed_message.entity[0].is_deleted)
+
+        await events.aclose()
+        self.assertEqual(0, self.server._broadcaster.num_clients)
+
+    async def test_ResumeStream(self):
+        feed_version = self.server._change_log.feed_version
+
+        del self.situations['ef478576-d1a8-527e-8820-5164ca986128']
+        self.server._update_feed_snapshot()
+
+        # reconnecting clients only receive the changes since their last event
+        events = self.server._stream_events(feed_version)
+
+        event, feed_message = await self._read_event(events)
+        self.assertEqual('differential', event)
+        self.assertEqual(['ef478576-d1a8-527e-8820-5164ca986128'], [e.id for e in feed_message.entity])
+
+        await events.aclose()
+
+    async def test_SlowClient(self):
+        events = self.server._stream_events(None)
+        await self._read_event(events)
+
+        # the client does not read while more changes than the buffer size are published
+        situation = self.situations.pop('ef478576-d1a8-527e-8820-5164ca986128')
+        for _ in range(60):
+            self.server._update_feed_snapshot()
+            self.situations['ef478576-d1a8-527e-8820-5164ca986128'] = situation
+            self.server._update_feed_snapshot()
+            del self.situations['ef478576-d1a8-527e-8820-5164ca986128']
+
+        await asyncio.sleep(0)
+
+        with self.assertLogs('uvicorn', level='WARNING'):
+            with self.assertRaises(StopAsyncIteration):
+                await anext(events)
+
+        self.assertEqual(0, self.server._broadcaster.num_clients)
+        self.assertIn('vdv736gtfsrt_streaming_evictions_total 1', self.server._metrics.render().decode('utf-8'))
+
+    async def test_LongPoll(self):
+        feed_version = self.server._change_log.feed_version
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=self.server.create()), base_url='http://test') as client:
+            request = asyncio.create_task(client.get(f"/gtfsrt-service-alerts-differential.pbf?version={feed_version}&wait=5"))
+            await asyncio.sleep(0.1)
+
+            self.assertFalse(request.done())
+
+            del self.situations['ef478576-d1a8-527e-8820-5164ca986128']
+            await asyncio.to_thread(self.server._update_feed_snapshot)
+
+            response = await asyncio.wait_for(request, 1)
+            feed_message = gtfs_realtime_pb2.FeedMessage.FromString(response.content)
+
+            self.assertEqual(['ef478576-d1a8-527e-8820-5164ca986128'], [e.id for e in feed_message.entity])
+
+            # long-poll requests without changes return after the timeout
+            response = await client.get(f"/gtfsrt-service-alerts-differential.pbf?version={feed_message.header.feed_version}&wait=0")
+            self.assertEqual(0, len(gtfs_realtime_pb2.FeedMessage.FromString(response.content).entity))
+
+            response = await client.get(f"/gtfsrt-service-alerts-differential.pbf?version={feed_version}&wait=soon")
+            self.assertEqual(400, response.status_code)
@@ -0,0 +1,62 @@
+import os
+import unittest
+
+from lxml.objectify import ObjectifiedElement
+
+from vdv736gtfsrt.adapter.vdv import VdvStandardAdapter
+from vdv736gtfsrt.streaming import iterparse_situations
+
+class Streaming_Test(unittest.TestCase):
+
+    def setUp(self):
+        xml_filename = os.path.join(os.path.dirname(__file__), 'data/xml/SampleSituation1.xml')
+        with open(xml_filename, 'r') as xml_file:
+            situation = xml_file.read()
+
+        situations = ''.join(situation.replace('ef478576-d1a8-527e-8820-5164ca986128', f"situation-{n}") for n in range(0, 5))
+        self.delivery = f"<Siri xmlns=\"http://www.siri.org.uk/siri\" version=\"2.1\"><ServiceDelivery><SituationExchangeDelivery><Situations>{situations}</Situations></SituationExchangeDelivery></ServiceDelivery></Siri>".encode('utf-8')
+
+    def test_Batches(self):
+        batches = list()
+        for batch in iterparse_situations(self.delivery, 2):
+            batches.append([s.SituationNumber.text for s in batch])
+
+            for situation in batch:
+                self.assertIsInstance(situation, ObjectifiedElement)
+
+        self.assertEqual([['situation-0', 'situation-1'], ['situation-2', 'situation-3'], ['situation-4']], batches)
+
+    def test_ClearProcessedSituations(self):
+        previous_batch = None
+        for batch in iterparse_situations(self.delivery):
+            if previous_batch is not None:
+                # processed situations are cleared and removed from the parsed tree
+                self.assertEqual(0, len(previous_batch[0].getchildren()))
+                self.assertIsNone(batch[0].getprevious())
+
+            previous_batch = batch
+
+    def test_AdapterConversion(self):
+        adapter = VdvStandardAdapter({
+            'app': {
+                'adapter': {
+                    'url': {
+                        'de': 'https://yourdomain.com/alerts/de/[alertId]'
+                    }
+                }
+            }
+        })
+
+        xml_filename = os.path.join(os.path.dirname(__file__), 'data/xml/SampleSituation1.xml')
+        # a single situation without namespace and without parent
+        results = list()
+        with open(xml_filename, 'rb') as xml_file:
+            for batch in iterparse_situations(xml_file):
+                results.extend([adapter.convert(s)[0] for s in batch])
+
+        self.assertEqual(1, len(results))
+
+        result = results[0]
+
+        self.assertEqual('ef478576-d1a8-527e-8820-5164ca986128', result['id'])
+        self.assertEqual('8588794', result['alert']['informed_entity'][0]['stop_id'])
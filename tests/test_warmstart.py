@@ -0,0 +1,92 @@
+import os
+import struct
+import tempfile
+import time
+import unittest
+
+from unittest.mock import patch
+
+from vdv736gtfsrt.warmstart import WarmStartFile
+from vdv736gtfsrt.warmstart import WarmStartRecord
+
+class WarmStartFile_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'warmstart', 'vdv736gtfsrt.bin')
+
+        self.warm_start_file = WarmStartFile(self.filename)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_WriteAndRead(self):
+        self.assertIsNone(self.warm_start_file.read())
+
+        self.warm_start_file.write([
+            WarmStartRecord('first', b'\x0a\x01\x00', b'<Situation/>', WarmStartRecord.PUBLISHED, 1728874800.5),
+            WarmStartRecord('zweite-Meldung-ä', b'', b'', WarmStartRecord.CLOSING)
+        ], 'a1b2c3d4', 42)
+
+        warm_start = self.warm_start_file.read()
+
+        self.assertEqual('a1b2c3d4', warm_start.epoch)
+        self.assertEqual(42, warm_start.version)
+        self.assertEqual(2, len(warm_start.records))
+
+        record = warm_start.records[0]
+        self.assertEqual('first', record.alert_id)
+        self.assertEqual(b'\x0a\x01\x00', record.serialized_entity)
+        self.assertEqual(b'<Situation/>', record.data)
+        self.assertEqual(WarmStartRecord.PUBLISHED, record.flags)
+        self.assertEqual(1728874800.5, record.timestamp)
+
+        self.assertEqual('zweite-Meldung-ä', warm_start.records[1].alert_id)
+        self.assertEqual(WarmStartRecord.CLOSING, warm_start.records[1].flags)
+
+        # temporary files are replaced by the warm start file
+        self.assertEqual(['vdv736gtfsrt.bin'], os.listdir(os.path.dirname(self.filename)))
+
+    def test_Confirm(self):
+        with patch('vdv736gtfsrt.warmstart.time.time', return_value=1728874800.0):
+            self.warm_start_file.write([WarmStartRecord('first', b'\x0a\x01\x00')], 'a1b2c3d4', 1)
+
+        os.utime(self.filename, (1728874800.0, 1728874800.0))
+
+        warm_start = self.warm_start_file.read()
+        self.assertEqual(1728874800.0, warm_start.created)
+        self.assertEqual(1728874800.0, warm_start.confirmed)
+
+        # confirmed files keep their content and creation time
+        self.warm_start_file.confirm()
+
+        warm_start = self.warm_start_file.read()
+        self.assertEqual(1728874800.0, warm_start.created)
+        self.assertAlmostEqual(time.time(), warm_start.confirmed, delta=60)
+        self.assertEqual('first', warm_start.records[0].alert_id)
+
+    def test_InvalidFile(self):
+        self.warm_start_file.write([WarmStartRecord('first', b'\x0a\x01\x00')], 'a1b2c3d4', 1)
+
+        with open(self.filename, 'r+b') as warm_start_file:
+            warm_start_file.seek(-1, os.SEEK_END)
+            warm_start_file.write(b'\xff')
+
+        with self.assertRaises(ValueError):
+            self.warm_start_file.read()
+
+        with open(self.filename, 'wb') as warm_start_file:
+            warm_start_file.write(b'<Siri/>')
+
+        with self.assertRaises(ValueError):
+            self.warm_start_file.read()
+
+    def test_UnsupportedFormatVersion(self):
+        self.warm_start_file.write([], 'a1b2c3d4', 1)
+
+        with open(self.filename, 'r+b') as warm_start_file:
+            warm_start_file.seek(8)
+            warm_start_file.write(struct.pack('<H', 99))
+
+        with self.assertRaises(ValueError):
+            self.warm_start_file.read()